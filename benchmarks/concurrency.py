@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Concurrency benchmark of the connection pool.
+
+Reader threads scan the whole flights table over and over, like export
+does, while a writer thread adds one flight at a time. Measures the
+latency of the writes in WAL mode and, for comparison, with the
+rollback journal, where every write has to wait for the running scans.
+
+Fails if a write in WAL mode takes longer than its budget.
+
+usage: python benchmarks/concurrency.py [--flights N] [--readers N]
+                                        [--seconds S] [--budget MS]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from pyflightlog import connections  # noqa: E402
+from pyflightlog import logbook  # noqa: E402
+
+INSERT_FLIGHT = (
+    "insert into flights (flightdate, type, registration, departureId, "
+    "destinationId, offblock, onblock, startTime, landingTime, "
+    "landingsDay, landingsNight, picName, pilotFunction, flightTimeClass) "
+    "values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+FLIGHT = ("2024-05-01", "C172", "DEABC", "EDFM", "EDFM", "10:00", "11:10",
+          "10:05", "11:05", 1, 0, "Pilot", "PIC", "SEP")
+
+
+def create_logbook(filename, flights):
+    """Creates a logbook with the given number of flights."""
+    with logbook.FlightLog(filename, logbook.AirportDB(":memory:")) as log:
+        log.con.executemany(INSERT_FLIGHT, [FLIGHT] * flights)
+        log.con.commit()
+
+
+def run(filename, journal_mode, readers, seconds):
+    """Returns the latencies of the writes in seconds, the number of
+    failed writes and the number of completed scans."""
+    pool = connections.ConnectionPool(filename, readers,
+                                      journal_mode=journal_mode)
+    stop = threading.Event()
+    scans = [0] * readers
+
+    def scan(index):
+        while not stop.is_set():
+            with pool.reader() as cn:
+                for _ in cn.execute("select * from flights"):
+                    pass
+            scans[index] += 1
+
+    threads = [threading.Thread(target=scan, args=(i,))
+               for i in range(readers)]
+    for thread in threads:
+        thread.start()
+
+    latencies = []
+    failed = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        try:
+            with pool.write() as cn:
+                cn.execute(INSERT_FLIGHT, FLIGHT)
+        except sqlite3.OperationalError:
+            failed += 1
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.01)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    pool.close()
+    return latencies, failed, sum(scans)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--flights", type=int, default=50000,
+                        help="number of flights in the logbook")
+    parser.add_argument("--readers", type=int, default=4,
+                        help="number of reader threads")
+    parser.add_argument("--seconds", type=float, default=3,
+                        help="duration of every run")
+    parser.add_argument("--budget", type=float, default=100,
+                        help="budget of a write in WAL mode in ms")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "logbook.db")
+        create_logbook(filename, args.flights)
+        for mode in ("delete", "wal"):
+            results[mode] = run(filename, mode, args.readers, args.seconds)
+
+    for mode, (latencies, failed, scans) in results.items():
+        print(f"{mode:>6}: {len(latencies):4d} writes, median "
+              f"{statistics.median(latencies) * 1000:7.1f} ms, max "
+              f"{max(latencies) * 1000:7.1f} ms, {failed} failed, "
+              f"{scans} scans")
+
+    latencies, failed, _ = results["wal"]
+    if failed or max(latencies) * 1000 > args.budget:
+        print(f"writes in WAL mode exceed the budget of {args.budget:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
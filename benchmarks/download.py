@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the airport refresh against a local stand-in server.
+
+The stand-in server of tests/standin.py sends a generated airports.csv
+with ETag and Last-Modified and answers conditional requests with 304
+and range requests with 206.
+Runs a first refresh, a refresh of the unchanged file, a refresh of the
+same content under a new ETag, a refresh of a changed file that is
+interrupted halfway and then resumed and a refresh of a file with a
+few airports added, renamed and removed. Measures the time, the bytes
+sent and the size of the pages of the airport database that changed.
+
+Fails if the unchanged file is sent or imported again, the resumed
+download starts over or the few changes write more than their budget.
+
+usage: python benchmarks/download.py [--airports N] [--budget KIB]
+"""
+
+import argparse
+import filecmp
+import http.server
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from pyflightlog import logbook  # noqa: E402
+from tests.standin import StandIn  # noqa: E402
+from tests.standin import airports_csv  # noqa: E402
+from tests.standin import make_handler  # noqa: E402
+
+
+def changed_pages(old_file, new_file, page_size=4096):
+    """Returns the number of pages that differ between two files."""
+    count = 0
+    with open(old_file, "rb") as old, open(new_file, "rb") as new:
+        while True:
+            old_page = old.read(page_size)
+            new_page = new.read(page_size)
+            if not old_page and not new_page:
+                return count
+            count += old_page != new_page
+
+
+def refresh(airport_db, url, state):
+    """Returns the result of a refresh, the time in seconds, the bytes
+    and statuses sent, the airport data version and the KiB of the
+    database that changed."""
+    state.reset()
+    copy = airport_db.filename + ".copy"
+    # the changes are written to the main file only at a checkpoint
+    airport_db.con.execute("pragma wal_checkpoint(truncate)")
+    shutil.copyfile(airport_db.filename, copy)
+    start = time.perf_counter()
+    try:
+        changes = airport_db.refresh({"airports": url})["airports"]
+    except Exception as err:
+        changes = err
+    elapsed = time.perf_counter() - start
+    airport_db.con.execute("pragma wal_checkpoint(truncate)")
+    written = (0 if filecmp.cmp(copy, airport_db.filename, shallow=False)
+               else changed_pages(copy, airport_db.filename) * 4)
+    os.remove(copy)
+    return (changes, elapsed, state.sent, state.statuses,
+            airport_db.version(), written)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--airports", type=int, default=80000,
+                        help="number of airports in the file")
+    parser.add_argument("--budget", type=float, default=256,
+                        help="budget of the changed pages of a refresh of "
+                        "a few changes in KiB")
+    args = parser.parse_args()
+
+    numbers = range(args.airports)
+    renamed = set(range(0, args.airports, 1000))
+    state = StandIn(airports_csv(numbers))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0),
+                                             make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/airports.csv"
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        with logbook.AirportDB(os.path.join(directory, "airports.db")) as db:
+            results["first"] = refresh(db, url, state)
+            results["unchanged"] = refresh(db, url, state)
+            state.set_file(state.body, 2)
+            results["new etag"] = refresh(db, url, state)
+            state.set_file(airports_csv(numbers, renamed), 3)
+            state.cut_after = len(state.body) // 2
+            results["interrupted"] = refresh(db, url, state)
+            results["resumed"] = refresh(db, url, state)
+            size = len(state.body)
+            # five airports removed, five added, five more renamed
+            state.set_file(airports_csv(
+                range(5, args.airports + 5), renamed | {7, 8, 9, 10, 11}
+            ), 4)
+            results["few changes"] = refresh(db, url, state)
+    server.shutdown()
+
+    for name, result in results.items():
+        changes, elapsed, sent, statuses, version, written = result
+        if isinstance(changes, Exception):
+            changes = type(changes).__name__
+        print(f"{name:>11}: {elapsed * 1000:8.1f} ms, {sent:9d} bytes sent "
+              f"{statuses}, {written:6d} KiB changed, data version "
+              f"{version}, {changes}")
+
+    expected = {
+        "first": lambda r: r[0].inserted == args.airports,
+        "unchanged": lambda r: r[0] is None and r[3] == [304],
+        "new etag": lambda r: r[0] is None and r[4] == 2,
+        "interrupted": lambda r: isinstance(r[0], Exception),
+        # the chunk read when the connection dropped is sent again
+        "resumed": lambda r: (r[0].updated == len(renamed) and r[3] == [206]
+                              and r[2] < size and r[4] == 3),
+        "few changes": lambda r: (r[0][:3] == (5, 5, 5)
+                                  and r[5] <= args.budget),
+    }
+    failed = [name for name, check in expected.items()
+              if not check(results[name])]
+    if failed:
+        print("unexpected results: " + ", ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
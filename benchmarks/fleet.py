@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the fleet reports over many logbooks.
+
+Creates a number of logbooks with random flights in a temporary
+directory and measures the fleet sum, stat and check reports in one
+process and in a process pool with all cores.
+
+usage: python benchmarks/fleet.py [--logbooks N] [--flights N]
+                                  [--budget S]
+"""
+
+import argparse
+import datetime as dt
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from pyflightlog import fleet  # noqa: E402
+from pyflightlog import logbook  # noqa: E402
+
+
+def create_logbook(filename, flights):
+    """Creates a logbook with random flights."""
+    with logbook.FlightLog(filename, logbook.AirportDB(":memory:")) as log:
+        log.add_aircraft("DEABC", "C172", "SEP")
+        rows = []
+        start = dt.date.today() - dt.timedelta(days=3 * 365)
+        for _ in range(flights):
+            date = start + dt.timedelta(days=random.randrange(3 * 365))
+            hour = random.randrange(6, 18)
+            rows.append((date.strftime("%Y-%m-%d"), "C172", "DEABC",
+                         "EDFM", "EDFM", f"{hour:02d}:00",
+                         f"{hour + 1:02d}:10", f"{hour:02d}:05",
+                         f"{hour + 1:02d}:05", 1, 0, "Pilot", "PIC",
+                         "SEP"))
+        log.con.executemany(
+            "insert into flights (flightdate, type, registration, "
+            "departureId, destinationId, offblock, onblock, startTime, "
+            "landingTime, landingsDay, landingsNight, picName, "
+            "pilotFunction, flightTimeClass) "
+            "values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        log.con.commit()
+
+
+def measure(files, jobs):
+    """Returns the seconds of the sum, stat and check reports."""
+    today = dt.date.today()
+    start = time.perf_counter()
+    fleet.run(files, "totals", (dt.date(2000, 1, 1), today), jobs)
+    fleet.run(files, "currency_matrix", (today,), jobs)
+    fleet.run(files, "check", (today,), jobs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logbooks", type=int, default=300,
+                        help="number of logbooks")
+    parser.add_argument("--flights", type=int, default=2000,
+                        help="number of flights per logbook")
+    parser.add_argument("--budget", type=float, default=10,
+                        help="budget of the three reports with all cores "
+                        "in seconds")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        create_logbook(os.path.join(directory, "template.db"), args.flights)
+        for i in range(args.logbooks):
+            shutil.copy(os.path.join(directory, "template.db"),
+                        os.path.join(directory, f"pilot{i:04d}.db"))
+        os.remove(os.path.join(directory, "template.db"))
+        files = fleet.logbook_files([directory])
+
+        cores = os.cpu_count() or 1
+        single = measure(files, 1)
+        parallel = measure(files, cores)
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"{args.logbooks} logbooks with {args.flights} flights each")
+    print(f"1 process:   {single:6.2f} s")
+    print(f"{cores} processes: {parallel:6.2f} s "
+          f"(speedup {single / parallel:.1f}, budget {args.budget:.0f} s)")
+    sys.exit(1 if parallel > args.budget else 0)
+
+
+if __name__ == "__main__":
+    main()
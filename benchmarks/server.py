@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load benchmark of the JSON API server (flog serve).
+
+Starts the server on a generated logbook in a separate process and
+sends requests for sum, ls, stat, check and airport search over many
+concurrent keep-alive connections. Every few requests a flight is
+added, so responses are computed again for the new data version.
+
+Fails if the 99th percentile of the latency exceeds its budget or a
+request fails.
+
+usage: python benchmarks/server.py [--flights N] [--connections N]
+                                   [--requests N] [--budget MS]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pyflightlog import connections  # noqa: E402
+from pyflightlog import logbook  # noqa: E402
+
+PATHS = (
+    "/sum?start=2023-01-01&end=2024-01-01",
+    "/sum?start=2023-01-01&where=block%3E1:00",
+    "/ls?start=2023-06-01&limit=50",
+    "/stat",
+    "/check",
+    "/airports?q=EDF",
+)
+
+INSERT_FLIGHT = (
+    "insert into flights (flightdate, type, registration, departureId, "
+    "destinationId, offblock, onblock, startTime, landingTime, "
+    "landingsDay, landingsNight, picName, pilotFunction, flightTimeClass) "
+    "values (?, 'C172', 'DEABC', 'EDFM', 'EDFM', '10:00', '11:10', "
+    "'10:05', '11:05', 1, 0, 'Pilot', 'PIC', 'SEP')"
+)
+
+SERVER_SCRIPT = """
+import sys
+sys.argv = ["flog", sys.argv[1], "serve", "--port", sys.argv[2]]
+from pyflightlog.flightlog import main
+main()
+"""
+
+
+def create_logbook(filename, flights):
+    """Creates a logbook with one flight a day over the last years."""
+    start = time.time() - flights * 86400
+    with logbook.FlightLog(filename, logbook.AirportDB(":memory:")) as log:
+        log.con.executemany(INSERT_FLIGHT, [
+            (time.strftime("%Y-%m-%d", time.gmtime(start + i * 86400)),)
+            for i in range(flights)
+        ])
+        log.con.commit()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_server(port, timeout=30):
+    end = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > end:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def client(port, requests, offset, latencies, failures):
+    """Sends requests over one keep-alive connection."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for i in range(requests):
+        path = PATHS[(offset + i) % len(PATHS)]
+        start = time.perf_counter()
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n"
+                     .encode())
+        status = await reader.readline()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+        if b" 200 " not in status:
+            failures.append(status)
+    writer.close()
+
+
+async def load(port, filename, clients, requests):
+    """Returns the latencies and failures of all requests and the total
+    time."""
+    await wait_for_server(port)
+    latencies = []
+    failures = []
+    cn = connections.create_connection(filename)
+
+    async def add_flights():
+        # new data versions make the server compute responses again
+        while True:
+            await asyncio.sleep(0.2)
+            cn.execute(INSERT_FLIGHT, ("2023-06-01",))
+            cn.commit()
+
+    writer = asyncio.create_task(add_flights())
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(port, requests, i, latencies, failures)
+        for i in range(clients)
+    ))
+    elapsed = time.perf_counter() - start
+    writer.cancel()
+    cn.close()
+    return latencies, failures, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--flights", type=int, default=20000,
+                        help="number of flights in the logbook")
+    parser.add_argument("--connections", type=int, default=200,
+                        help="number of concurrent connections")
+    parser.add_argument("--requests", type=int, default=20,
+                        help="requests per connection")
+    parser.add_argument("--budget", type=float, default=500,
+                        help="budget of the 99th percentile in ms")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "logbook.db")
+        create_logbook(filename, args.flights)
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-c", SERVER_SCRIPT, filename, str(port)],
+            cwd=directory, stdout=subprocess.DEVNULL,
+            env=dict(os.environ, PYTHONPATH=ROOT),
+        )
+        try:
+            latencies, failures, elapsed = asyncio.run(
+                load(port, filename, args.connections, args.requests))
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{len(latencies)} requests over {args.connections} connections "
+          f"in {elapsed:.2f} s ({len(latencies) / elapsed:.0f} requests/s)")
+    print(f"latency median {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p99 {p99:.1f} ms, max {latencies[-1] * 1000:.1f} ms "
+          f"(budget p99 {args.budget:.0f} ms)")
+
+    if failures:
+        print(f"{len(failures)} requests failed, e.g. {failures[0]!r}")
+    sys.exit(1 if failures or p99 > args.budget else 0)
+
+
+if __name__ == "__main__":
+    main()
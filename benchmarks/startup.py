@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup benchmark of the command line interface.
+
+Measures in fresh interpreters
+* the import time of pyflightlog.flightlog (python -X importtime) and
+* the time until the prompt would appear, i.e. creating the command
+  loop with its dashboard on an empty logbook.
+
+Fails if one of them exceeds its budget or if the GUI, HTTP or NumPy
+stacks are loaded at startup.
+
+usage: python benchmarks/startup.py [--runs N] [--import-budget MS]
+                                    [--prompt-budget MS]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that must only be loaded by the commands needing them
+LAZY_MODULES = ("PySide6", "requests", "numpy")
+
+PROMPT_SCRIPT = """
+import contextlib, io, os, sys, time
+start = time.perf_counter()
+from pyflightlog import flightlog as fl
+from pyflightlog import logbook
+log = logbook.FlightLog(sys.argv[1], logbook.AirportDB(sys.argv[2]))
+with contextlib.redirect_stdout(io.StringIO()):
+    fl.CmdApp(log)
+elapsed = time.perf_counter() - start
+loaded = [m for m in sys.argv[3:] if m in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+
+def import_time():
+    """Returns the cumulative import time of pyflightlog.flightlog in
+    seconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "import pyflightlog.flightlog"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == "pyflightlog.flightlog":
+            return int(parts[1]) / 1e6
+    raise RuntimeError("pyflightlog.flightlog not found in importtime output")
+
+
+def prompt_time(directory):
+    """Returns the time until the command loop is ready in seconds and
+    the list of lazy modules loaded by then."""
+    result = subprocess.run(
+        [sys.executable, "-c", PROMPT_SCRIPT,
+         os.path.join(directory, "logbook.db"),
+         os.path.join(directory, "airports.db"), *LAZY_MODULES],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    elapsed, _, loaded = result.stdout.strip().splitlines()[-1].partition(
+        " ")
+    return float(elapsed), [module for module in loaded.split(",") if module]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5,
+                        help="number of runs, the best one counts")
+    parser.add_argument("--import-budget", type=float, default=500,
+                        help="budget of the import time in ms")
+    parser.add_argument("--prompt-budget", type=float, default=800,
+                        help="budget of the time until the prompt in ms")
+    args = parser.parse_args()
+
+    imports = min(import_time() for _ in range(args.runs))
+    with tempfile.TemporaryDirectory() as directory:
+        runs = [prompt_time(directory) for _ in range(args.runs)]
+    prompt = min(elapsed for elapsed, _ in runs)
+    loaded = sorted(set(module for _, modules in runs for module in modules))
+
+    print(f"import pyflightlog.flightlog: {imports * 1000:7.1f} ms "
+          f"(budget {args.import_budget:.0f} ms)")
+    print(f"ready for prompt:             {prompt * 1000:7.1f} ms "
+          f"(budget {args.prompt_budget:.0f} ms)")
+
+    failed = False
+    if imports * 1000 > args.import_budget:
+        print("import time exceeds its budget")
+        failed = True
+    if prompt * 1000 > args.prompt_budget:
+        print("time until prompt exceeds its budget")
+        failed = True
+    if loaded:
+        print("loaded at startup: " + ", ".join(loaded))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Airport database refresh from OurAirports.com and airport search.
+
+The airports, runways and radio frequencies are refreshed from their
+csv files (see DATASETS). Every file is downloaded to a .part file next
+to the database. The ETag, Last-Modified date, size and SHA-256 of the
+last download are kept in airportsMeta: requests are conditional, so an
+unchanged file isn't downloaded again, an interrupted download is
+resumed with a range request and a file with the same content isn't
+imported again.
+
+The csv file is loaded into a temporary staging table in batches,
+together with a hash of every row. Comparing these hashes with the
+hashes stored in the table gives the rows that were added, changed or
+removed, which are applied within one transaction, so readers always
+see a complete table. A routine refresh therefore writes only the pages
+of a few rows and their index entries.
+
+The search uses the FTS5 index airports_fts, which is kept up to date
+by every refresh. Runways and frequencies are indexed on the identifier
+of their airport.
+"""
+
+import csv
+import functools
+import hashlib
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+from pyflightlog import schema
+
+AIRPORTS_URL = "https://ourairports.com/data/airports.csv"
+RUNWAYS_URL = "https://ourairports.com/data/runways.csv"
+FREQUENCIES_URL = "https://ourairports.com/data/airport-frequencies.csv"
+
+# sizes of the chunks of the download, adapted to the connection so that
+# reading a chunk takes about CHUNK_SECONDS
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+CHUNK_SECONDS = 0.25
+
+Download = namedtuple("Download", ["etag", "lastModified", "size", "sha256"])
+
+# numbers of airports changed by a refresh
+Changes = namedtuple("Changes",
+                     ["inserted", "updated", "deleted", "unchanged"])
+
+# number of full-text matches ranked by the airport search
+RANK_CANDIDATES = 1000
+
+
+def to_float(value):
+    """Returns a number from the csv file, None for empty or invalid
+    values."""
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def to_int(value):
+    """Returns an integer from the csv file, None for empty or invalid
+    values."""
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+# a csv file of OurAirports, its table and the csv columns of the table
+# columns (without rowHash) with their converters
+Dataset = namedtuple("Dataset", ["url", "table", "columns", "fields"])
+
+DATASETS = {
+    "airports": Dataset(AIRPORTS_URL, "airports", schema.AIRPORTS_COLUMNS, [
+        ("ident", str), ("name", str), ("latitude_deg", to_float),
+        ("longitude_deg", to_float), ("elevation_ft", to_float),
+        ("municipality", str),
+    ]),
+    "runways": Dataset(RUNWAYS_URL, "runways", schema.RUNWAYS_COLUMNS, [
+        ("id", to_int), ("airport_ident", str), ("length_ft", to_int),
+        ("width_ft", to_int), ("surface", str), ("lighted", to_int),
+        ("closed", to_int), ("le_ident", str), ("le_heading_degT", to_float),
+        ("he_ident", str), ("he_heading_degT", to_float),
+    ]),
+    "frequencies": Dataset(
+        FREQUENCIES_URL, "frequencies", schema.FREQUENCIES_COLUMNS, [
+            ("id", to_int), ("airport_ident", str), ("type", str),
+            ("description", str), ("frequency_mhz", to_float),
+        ]
+    ),
+}
+
+
+def stream_rows(csv_reader, fields):
+    """Generator yielding a tuple of the converted values of the fields,
+    a list of (column name, converter), for every row of a csv file
+    with header."""
+    header = next(csv_reader)
+    index = {name: i for i, name in enumerate(header)}
+    columns = [(index[name], convert) for name, convert in fields]
+
+    for row in csv_reader:
+        if len(row) < len(header):
+            continue
+        yield tuple(convert(row[i]) for i, convert in columns)
+
+
+def row_hash(row):
+    """Returns a 64 bit hash of the values of a row."""
+    digest = hashlib.blake2b(repr(row).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def staging_table(table):
+    """Returns the name of the staging table of a table."""
+    return f"temp.{table}_new"
+
+
+def load_staging(cn, rows, dataset, batch_size=5000, progress=None):
+    """Loads rows with their hashes into a fresh temporary staging table
+    of a Dataset. Returns the number of rows."""
+    staging = staging_table(dataset.table)
+    values = ", ".join("?" * (len(dataset.fields) + 1))
+    cur = cn.cursor()
+    cur.execute(f"drop table if exists {staging}")
+    cur.execute(f"create table {staging} {dataset.columns}")
+
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row + (row_hash(row),))
+        if len(batch) >= batch_size:
+            cur.executemany(
+                f"insert or replace into {staging} values ({values})", batch
+            )
+            count += len(batch)
+            batch = []
+            if progress is not None:
+                progress(count)
+    if batch:
+        cur.executemany(
+            f"insert or replace into {staging} values ({values})", batch
+        )
+        count += len(batch)
+    cn.commit()
+    if progress is not None:
+        progress(count)
+
+    return count
+
+
+def apply_airports_staging(cn):
+    """Applies the differences between the staging table and the
+    airports table in one transaction: new and changed airports are
+    upserted, missing ones deleted, and the full-text and spatial
+    indexes are updated for these rows only. Returns the Changes."""
+    staging = staging_table("airports")
+    cn.commit()
+    cur = cn.cursor()
+    try:
+        cur.execute("begin")
+        # rows whose index entries are out of date, with their old values
+        # that the full-text index needs to delete them
+        cur.execute(
+            "create temp table airports_stale as "
+            "select a.id, a.icaoId, a.name, a.municipality, "
+            "s.icaoId is null as removed "
+            f"from airports a left join {staging} s "
+            "using (icaoId) "
+            "where s.icaoId is null or a.rowHash is not s.rowHash"
+        )
+        cur.execute(
+            "create temp table airports_changed as "
+            f"select s.icaoId from {staging} s "
+            "left join airports a using (icaoId) "
+            "where a.rowHash is not s.rowHash"
+        )
+
+        cur.execute(
+            "insert into airports_fts(airports_fts, rowid, icaoId, name, "
+            "municipality) select 'delete', id, icaoId, name, municipality "
+            "from temp.airports_stale"
+        )
+        cur.execute("delete from airports_rtree "
+                    "where id in (select id from temp.airports_stale)")
+        cur.execute("delete from airports where id in "
+                    "(select id from temp.airports_stale where removed)")
+
+        # updated rows keep their id, which the indexes refer to
+        cur.execute(
+            "insert into airports (icaoId, name, lat, long, elev, "
+            "municipality, rowHash) "
+            "select icaoId, name, lat, long, elev, municipality, rowHash "
+            f"from {staging} "
+            "where icaoId in (select icaoId from temp.airports_changed) "
+            "on conflict (icaoId) do update set name = excluded.name, "
+            "lat = excluded.lat, long = excluded.long, "
+            "elev = excluded.elev, municipality = excluded.municipality, "
+            "rowHash = excluded.rowHash"
+        )
+        cur.execute(
+            "insert into airports_fts(rowid, icaoId, name, municipality) "
+            "select id, icaoId, name, municipality from airports "
+            "where icaoId in (select icaoId from temp.airports_changed)"
+        )
+        cur.execute(
+            "insert into airports_rtree select id, lat, lat, long, long "
+            "from airports "
+            "where icaoId in (select icaoId from temp.airports_changed) "
+            "and lat is not null and long is not null"
+        )
+
+        changed, updated, deleted, total = cur.execute(
+            "select (select count(*) from temp.airports_changed), "
+            "(select count(*) from temp.airports_stale where not removed), "
+            "(select count(*) from temp.airports_stale where removed), "
+            f"(select count(*) from {staging})"
+        ).fetchone()
+        if changed or deleted:
+            # caches derived from airport data compare against this
+            # version
+            cur.execute("update airportsMeta set value = value + 1 "
+                        "where key = 'version'")
+        cur.execute("commit")
+    except Exception:
+        cn.rollback()
+        raise
+    finally:
+        for table in ("temp.airports_stale", "temp.airports_changed",
+                      staging):
+            cur.execute(f"drop table if exists {table}")
+
+    return Changes(changed - updated, updated, deleted, total - changed)
+
+
+def apply_staging(cn, table):
+    """Applies the differences between the staging table and a table
+    with an integer id like runways in one transaction. Returns the
+    Changes."""
+    staging = staging_table(table)
+    columns = [row[1] for row in cn.execute(f"pragma table_info({table})")]
+    cn.commit()
+    cur = cn.cursor()
+    try:
+        cur.execute("begin")
+        cur.execute(
+            f"create temp table {table}_changed as "
+            f"select s.id, t.id is not null as existing from {staging} s "
+            f"left join {table} t using (id) "
+            "where t.rowHash is not s.rowHash"
+        )
+        cur.execute(f"delete from {table} "
+                    f"where id not in (select id from {staging})")
+        deleted = cur.rowcount
+        cur.execute(
+            f"insert into {table} ({', '.join(columns)}) "
+            f"select {', '.join(columns)} from {staging} "
+            f"where id in (select id from temp.{table}_changed) "
+            "on conflict (id) do update set "
+            + ", ".join(f"{column} = excluded.{column}"
+                        for column in columns[1:])
+        )
+        changed, updated, total = cur.execute(
+            f"select (select count(*) from temp.{table}_changed), "
+            f"(select count(*) from temp.{table}_changed where existing), "
+            f"(select count(*) from {staging})"
+        ).fetchone()
+        cur.execute("commit")
+    except Exception:
+        cn.rollback()
+        raise
+    finally:
+        for name in (f"temp.{table}_changed", staging):
+            cur.execute(f"drop table if exists {name}")
+
+    return Changes(changed - updated, updated, deleted, total - changed)
+
+
+def meta_prefix(name):
+    """Returns the prefix of the airportsMeta keys of a dataset. The keys
+    of the airports have none, they came first."""
+    return "" if name == "airports" else name + "."
+
+
+def read_meta(cn, prefix=""):
+    """Returns the entries of airportsMeta with a key prefix as dict of
+    strings, without the prefix."""
+    return {key[len(prefix):]: str(value) for key, value in
+            cn.execute("select key, value from airportsMeta")
+            if key.startswith(prefix)}
+
+
+def write_meta(cn, prefix="", **values):
+    """Stores entries of airportsMeta with a key prefix, entries set to
+    None are removed. Doesn't commit."""
+    for key, value in values.items():
+        if value is None:
+            cn.execute("delete from airportsMeta where key = ?",
+                       (prefix + key,))
+        else:
+            cn.execute("insert or replace into airportsMeta values (?, ?)",
+                       (prefix + key, value))
+
+
+def part_file_name(db_filename, name="airports"):
+    """Returns the name of the file a dataset is downloaded to, next to
+    the airport database."""
+    if db_filename == ":memory:":
+        return os.path.join(tempfile.gettempdir(), f"{name}.csv.part")
+    return f"{os.path.splitext(db_filename)[0]}-{name}.csv.part"
+
+
+def adapt_chunk_size(chunk_size, seconds):
+    """Returns the size of the next chunk, so that reading a chunk takes
+    about CHUNK_SECONDS."""
+    if seconds < CHUNK_SECONDS / 2:
+        return min(chunk_size * 2, MAX_CHUNK_SIZE)
+    if seconds > CHUNK_SECONDS * 2:
+        return max(chunk_size // 2, MIN_CHUNK_SIZE)
+    return chunk_size
+
+
+def download_dataset(cn, url, part_file, prefix="", progress=None,
+                     timeout=60):
+    """Downloads a csv file into part_file and returns a Download, or
+    None if it didn't change since the last refresh. An interrupted
+    download is resumed if the file on the server is still the same.
+    The validators are kept in airportsMeta with the key prefix.
+    progress is called with (bytes read, total bytes or None)."""
+    # imported on first use, it takes longer to load than the whole CLI
+    import requests
+
+    meta = read_meta(cn, prefix)
+    # byte ranges refer to the file as sent, so don't let it be compressed
+    headers = {"Accept-Encoding": "identity"}
+    offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+    validator = meta.get("partEtag") or meta.get("partLastModified")
+    if offset and validator:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+    else:
+        offset = 0
+        if "etag" in meta:
+            headers["If-None-Match"] = meta["etag"]
+        if "lastModified" in meta:
+            headers["If-Modified-Since"] = meta["lastModified"]
+
+    with requests.get(url, headers=headers, stream=True,
+                      timeout=timeout) as response:
+        if response.status_code == 304:
+            return None
+        if response.status_code == 416:
+            # the partial file is longer than the file on the server
+            os.remove(part_file)
+            return download_dataset(cn, url, part_file, prefix, progress,
+                                    timeout)
+        response.raise_for_status()
+        if response.status_code != 206:
+            offset = 0
+
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        length = response.headers.get("content-length")
+        total = offset + int(length) if length is not None else None
+
+        # If-Range only accepts strong etags
+        write_meta(cn, prefix,
+                   partEtag=None if etag is None or etag.startswith("W/")
+                   else etag, partLastModified=last_modified)
+        cn.commit()
+
+        sha256 = hashlib.sha256()
+        if offset:
+            with open(part_file, "rb") as f:
+                for block in iter(lambda: f.read(MAX_CHUNK_SIZE), b""):
+                    sha256.update(block)
+
+        done = offset
+        chunk_size = MIN_CHUNK_SIZE
+        with open(part_file, "ab" if offset else "wb") as f:
+            while True:
+                start = time.perf_counter()
+                chunk = response.raw.read(chunk_size)
+                if not chunk:
+                    break
+                f.write(chunk)
+                sha256.update(chunk)
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, total)
+                chunk_size = adapt_chunk_size(chunk_size,
+                                              time.perf_counter() - start)
+
+    if total is not None and done != total:
+        raise OSError(f"incomplete download: {done} of {total} bytes")
+    return Download(etag, last_modified, done, sha256.hexdigest())
+
+
+def refresh_dataset(cn, name, part_file, url=None, batch_size=5000,
+                    progress=None):
+    """Downloads a dataset (see DATASETS) and applies the changes to its
+    table unless the file is the same as at the last refresh. progress
+    is called with (bytes read, total bytes or None). Returns the
+    Changes, None if the table is up to date."""
+    dataset = DATASETS[name]
+    prefix = meta_prefix(name)
+    download = download_dataset(cn, url or dataset.url, part_file, prefix,
+                                progress)
+    if download is None:
+        return None
+
+    changes = None
+    if download.sha256 != read_meta(cn, prefix).get("sha256"):
+        with open(part_file, encoding="utf-8", newline="") as f:
+            load_staging(cn, stream_rows(csv.reader(f), dataset.fields),
+                         dataset, batch_size)
+        if name == "airports":
+            changes = apply_airports_staging(cn)
+        else:
+            changes = apply_staging(cn, dataset.table)
+
+    # stored after the import, so a failed import is done again
+    write_meta(cn, prefix, etag=download.etag,
+               lastModified=download.lastModified, size=download.size,
+               sha256=download.sha256, partEtag=None, partLastModified=None)
+    cn.commit()
+    os.remove(part_file)
+    return changes
+
+
+def refresh_datasets(cn, db_filename, urls=None, batch_size=5000,
+                     progress=None):
+    """Refreshes the datasets given as dict of name and url, or all
+    DATASETS from OurAirports.com. progress is called with (name, bytes
+    read, total bytes or None). Returns a dict of name and Changes or
+    None."""
+    if urls is None:
+        urls = {name: dataset.url for name, dataset in DATASETS.items()}
+
+    # the staging tables go to a temporary file instead of memory, only
+    # its page cache is held in memory however large the datasets are
+    temp_store = cn.execute("pragma temp_store").fetchone()[0]
+    cn.execute("pragma temp_store = file")
+    try:
+        return {
+            name: refresh_dataset(
+                cn, name, part_file_name(db_filename, name), url,
+                batch_size,
+                None if progress is None
+                else functools.partial(progress, name),
+            )
+            for name, url in urls.items()
+        }
+    finally:
+        cn.execute(f"pragma temp_store = {temp_store}")
+
+
+def airports_version(cn_ap):
+    """Returns the version of the airport data."""
+    row = cn_ap.execute(
+        "select value from airportsMeta where key = 'version'"
+    ).fetchone()
+    return int(row[0]) if row is not None else 0
+
+
+def fts_query(search_string, column=None):
+    """Returns an FTS5 query matching all words of the search string as
+    prefixes, optionally restricted to one column."""
+    words = "".join(
+        c if c.isalnum() else " " for c in search_string
+    ).split()
+    if not words:
+        return None
+    query = " ".join('"' + word + '"*' for word in words)
+    if column is not None:
+        query = f"{column} : ({query})"
+    return query
+
+
+def search_airports(cn, search_string, ids_only=False, limit=25):
+    """Returns airports matching the search string, ranked by exact
+    identifier, identifier prefix and name or municipality match."""
+    query = fts_query(search_string, "icaoId" if ids_only else None)
+    if query is None:
+        return []
+
+    ident = search_string.strip().upper()
+    columns = "a.icaoId, a.name, a.municipality"
+
+    # exact identifier and identifier prefix, both on the primary key
+    results = cn.execute(
+        f"select {columns} from airports a where a.icaoId = ?", (ident,)
+    ).fetchall()
+    results += cn.execute(
+        f"select {columns} from airports a "
+        "where a.icaoId > ? and a.icaoId < ? order by a.icaoId limit ?",
+        (ident, ident + "\uffff", limit),
+    ).fetchall()
+
+    # words of names and municipalities, ranked by bm25 among a bounded
+    # number of candidates to keep very short prefixes fast
+    if len(results) < limit:
+        results += cn.execute(
+            f"select {columns} from (select rowid, rank from airports_fts "
+            "where airports_fts match ? limit ?) f "
+            "join airports a on a.id = f.rowid order by f.rank limit ?",
+            (query, RANK_CANDIDATES, limit + len(results)),
+        ).fetchall()
+
+    # remove duplicates, keeping the best ranked entry
+    seen = set()
+    unique = []
+    for result in results:
+        if result[0] not in seen:
+            seen.add(result[0])
+            unique.append(result)
+    return unique[:limit]
+
+
+def airport_details(cn, idents):
+    """Returns two dicts of the runways and the radio frequencies of
+    the airports with the given identifiers, keyed on the identifier.
+    Both are looked up by their index on the airport identifier."""
+    marks = ", ".join("?" * len(idents))
+    runways = {}
+    for row in cn.execute(
+        "select r.* from airports a "
+        "join runways r on r.airportIdent = a.icaoId "
+        f"where a.icaoId in ({marks}) "
+        "order by r.closed, r.lengthFt desc", list(idents)
+    ):
+        runways.setdefault(row["airportIdent"], []).append(row)
+    frequencies = {}
+    for row in cn.execute(
+        "select f.* from airports a "
+        "join frequencies f on f.airportIdent = a.icaoId "
+        f"where a.icaoId in ({marks}) "
+        "order by f.type, f.frequencyMhz", list(idents)
+    ):
+        frequencies.setdefault(row["airportIdent"], []).append(row)
+    return runways, frequencies
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tab completion of airports, aircraft registrations and names.
+
+Every kind of value is kept in memory as a sorted array and prefix
+queries are answered with bisect. The arrays are loaded from the
+databases on first use and dropped by invalidate() when the data changes.
+"""
+
+import bisect
+
+
+class PrefixIndex:
+    """Sorted array of words answering case-insensitive prefix
+    queries."""
+
+    def __init__(self, words):
+        unique = {}
+        for word in words:
+            if word:
+                unique.setdefault(word.casefold(), word)
+        self.keys = sorted(unique)
+        self.words = [unique[key] for key in self.keys]
+
+    def __len__(self):
+        return len(self.words)
+
+    def complete(self, prefix):
+        """Returns all words starting with prefix."""
+        key = prefix.casefold()
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_left(self.keys, key + "\U0010ffff", lo)
+        return self.words[lo:hi]
+
+
+def _split_names(values):
+    """Yields the single names of comma separated name lists."""
+    for value in values:
+        if value:
+            for name in str(value).split(","):
+                yield name.strip()
+
+
+class Completer:
+    """Lazily loaded prefix indexes over the logbook and airport
+    databases."""
+
+    KINDS = ("airports", "registrations", "names")
+
+    def __init__(self, cn, cn_ap):
+        self.cn = cn
+        self.cn_ap = cn_ap
+        self._indexes = {}
+
+    def _load(self, kind):
+        if kind == "airports":
+            words = [row[0] for row in
+                     self.cn_ap.execute("select icaoId from airports")]
+            # airfields used in the logbook but unknown to OurAirports
+            words += [row[0] for row in self.cn.execute(
+                "select departureId from flights union "
+                "select destinationId from flights"
+            )]
+        elif kind == "registrations":
+            words = [row[0] for row in
+                     self.cn.execute("select registration from aircrafts")]
+        elif kind == "names":
+            words = list(_split_names(row[0] for row in self.cn.execute(
+                "select picName from flights union "
+                "select studentName from flights union "
+                "select guests from flights union "
+                "select value from settings where key='default_PIC'"
+            )))
+        else:
+            raise ValueError(f"unknown completion kind: {kind}")
+        return PrefixIndex(str(word) for word in words if word is not None)
+
+    def complete(self, kind, prefix):
+        """Returns all values of the given kind starting with prefix."""
+        index = self._indexes.get(kind)
+        if index is None:
+            index = self._indexes[kind] = self._load(kind)
+        return index.complete(prefix)
+
+    def invalidate(self, *kinds):
+        """Drops the indexes of the given kinds, or all indexes if no
+        kind is given. They are reloaded on the next completion."""
+        for kind in kinds or self.KINDS:
+            self._indexes.pop(kind, None)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Database connections and a pool of them for concurrent access.
+
+Logbooks are kept in WAL mode: readers see the last committed state
+while the writer appends to the write-ahead log, so long reads like
+export don't block writes of the Qt GUI or another process and vice
+versa. Writers still wait for each other, up to BUSY_TIMEOUT.
+
+A ConnectionPool holds one writer and up to max_readers read-only
+connections that are opened on demand. All connections may be used by
+any thread, one thread at a time, which the pool takes care of.
+"""
+
+import contextlib
+import os
+import sqlite3 as sq
+import threading
+import urllib.parse
+
+from pyflightlog.query import STATEMENT_CACHE_SIZE
+
+# time to wait for locks of other connections in ms
+BUSY_TIMEOUT = 5000
+
+# journal mode of logbooks, it is stored in the database file
+JOURNAL_MODE = "wal"
+
+# pragmas of every connection; synchronous=normal only syncs at
+# checkpoints in WAL mode, a crash may lose the last commits but never
+# corrupts the database
+PRAGMAS = (
+    "synchronous = normal",
+    "cache_size = -16000",
+    "mmap_size = 268435456",
+    "temp_store = memory",
+)
+
+
+def create_connection(filename, read_only=False):
+    """Creates and returns a database connection. If the given filename
+    doesn't exist, a new file is created unless the connection is
+    read-only."""
+    if read_only:
+        filename = ("file:" + urllib.parse.quote(os.path.abspath(filename))
+                    + "?mode=ro")
+    cn = sq.connect(filename, uri=read_only, timeout=BUSY_TIMEOUT / 1000,
+                    cached_statements=STATEMENT_CACHE_SIZE,
+                    check_same_thread=False)
+    for pragma in PRAGMAS:
+        cn.execute("pragma " + pragma)
+    return cn
+
+
+def set_journal_mode(cn, mode=JOURNAL_MODE):
+    """Sets the journal mode of a database and returns the mode in use,
+    which is 'memory' for in-memory databases."""
+    # pragma arguments cannot be bound as parameters
+    return cn.execute(f"pragma journal_mode = {mode}").fetchone()[0]
+
+
+class ConnectionPool:
+    """One writer and up to max_readers reader connections of a database.
+    In-memory and read-only databases have a single connection, which is
+    used for reading as well."""
+
+    def __init__(self, filename, max_readers=4, read_only=False,
+                 journal_mode=JOURNAL_MODE):
+        self.filename = filename
+        self.writer = create_connection(filename, read_only)
+        self.writer.row_factory = sq.Row
+        if read_only or filename == ":memory:":
+            self.max_readers = 0
+        else:
+            set_journal_mode(self.writer, journal_mode)
+            self.max_readers = max_readers
+        self._write_lock = threading.RLock()
+        self._condition = threading.Condition()
+        self._idle = []
+        self._opened = 0
+
+    def close(self):
+        """Closes all connections. Readers in use are closed when they
+        are given back."""
+        with self._condition:
+            for cn in self._idle:
+                cn.close()
+            self._idle = []
+            self.max_readers = 0
+        with self._write_lock:
+            self.writer.close()
+
+    def _acquire(self):
+        with self._condition:
+            while not self._idle and self._opened >= self.max_readers:
+                self._condition.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._opened += 1
+        try:
+            cn = create_connection(self.filename, read_only=True)
+        except sq.Error:
+            with self._condition:
+                self._opened -= 1
+                self._condition.notify()
+            raise
+        cn.row_factory = sq.Row
+        return cn
+
+    def _release(self, cn):
+        with self._condition:
+            if len(self._idle) < self.max_readers:
+                self._idle.append(cn)
+            else:
+                cn.close()
+                self._opened -= 1
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def reader(self):
+        """Yields a read-only connection. Waits if all readers are in
+        use."""
+        if self.max_readers == 0:
+            with self._write_lock:
+                yield self.writer
+            return
+
+        cn = self._acquire()
+        try:
+            yield cn
+        finally:
+            # end the read transaction, so the WAL can be checkpointed
+            if cn.in_transaction:
+                cn.rollback()
+            self._release(cn)
+
+    @contextlib.contextmanager
+    def write(self):
+        """Yields the writer. Changes are committed at the end or rolled
+        back on errors. Only one thread writes at a time."""
+        with self._write_lock:
+            try:
+                yield self.writer
+            except BaseException:
+                self.writer.rollback()
+                raise
+            self.writer.commit()
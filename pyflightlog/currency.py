@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validity of ratings and the 90 day rule: a pilot needs three takeoffs
+and landings within the preceding 90 days in an aircraft of the same
+class.
+
+The landings are loaded once per class as a series of (day, landings)
+and the date of expiry is found by a backwards sweep over that series.
+"""
+
+import bisect
+import datetime as dt
+from collections import defaultdict, namedtuple
+
+from dateutil.relativedelta import relativedelta
+
+STATUSES = ("valid", "warning", "expired")
+
+CheckResult = namedtuple("CheckResult", ["title", "status", "expiration"])
+
+
+# landings per class and day, see landing_series
+LANDINGS_QUERY = (
+    "select flightTimeClass, flightdate, "
+    "sum(landingsDay+landingsNight) from flights "
+    "group by flightTimeClass, flightdate "
+    "having sum(landingsDay+landingsNight) > 0 "
+    "order by flightTimeClass, flightdate"
+)
+
+RATINGS_QUERY = (
+    "select type, title, expirationDate, warningPeriod from ratings "
+    "order by rowid"
+)
+
+
+def landing_series(cn):
+    """Returns a dict class -> list of (date, landings) sorted by date,
+    containing only days with at least one landing."""
+    cur = cn.execute(LANDINGS_QUERY)
+
+    series = defaultdict(list)
+    for flight_class, flightdate, landings in cur:
+        series[flight_class].append(
+            (dt.date.fromisoformat(flightdate), int(landings))
+        )
+    return series
+
+
+def ninety_day_expiry(series, date, landings=3, days=90):
+    """Returns the last day on which the 90 day rule is still met by the
+    landings made up to the given date, or None if there are not
+    enough landings at all.
+
+    The rule lapses when the third most recent landing is older than
+    90 days, so the last valid day is that landing's date plus 90 days.
+    """
+    if isinstance(date, dt.datetime):
+        date = date.date()
+
+    # only landings up to the evaluation date count
+    end = bisect.bisect_right(series, (date, float("inf")))
+
+    count = 0
+    for i in range(end - 1, -1, -1):
+        count += series[i][1]
+        if count >= landings:
+            return series[i][0] + relativedelta(days=days)
+
+    return None
+
+
+def ninety_day_status(series, date, warning_days=10):
+    """Returns a tuple (status, expiration_date), status being one of
+    'valid', 'warning' and 'expired'."""
+    if isinstance(date, dt.datetime):
+        date = date.date()
+
+    expiry = ninety_day_expiry(series, date)
+    if expiry is None or date > expiry:
+        return "expired", expiry
+    if date >= expiry + relativedelta(days=-warning_days):
+        return "warning", expiry
+    return "valid", expiry
+
+
+def rating_status(date, expiration_date, warning_period):
+    """Returns 'valid', 'warning' or 'expired' for a rating expiring at
+    expiration_date (yyyy-mm-dd) with a warning period like 'm3' (three
+    months) or 'd10' (ten days)."""
+    if isinstance(date, dt.datetime):
+        date = date.date()
+
+    expiration = dt.date.fromisoformat(expiration_date)
+    warning = expiration
+    if warning_period[0] == "m":
+        warning += relativedelta(months=-int(warning_period[1:]))
+    if warning_period[0] == "d":
+        warning += relativedelta(days=-int(warning_period[1:]))
+    if date > expiration:
+        return "expired"
+    if date >= warning:
+        return "warning"
+    return "valid"
+
+
+def check_all(cn, date):
+    """Returns a list of CheckResult for class ratings, the 90 day rule
+    on every class and UL, other ratings and all the rest, in this
+    order."""
+    ratings = defaultdict(list)
+    cur = cn.execute(RATINGS_QUERY)
+    for rating_type, title, expiration_date, warning_period in cur:
+        ratings[rating_type].append(
+            (title, expiration_date, warning_period)
+        )
+
+    def check_ratings(rating_type, prefix):
+        return [
+            CheckResult(
+                prefix + title,
+                rating_status(date, expiration_date, warning_period),
+                dt.date.fromisoformat(expiration_date),
+            )
+            for title, expiration_date, warning_period
+            in ratings[rating_type]
+        ]
+
+    landings = landing_series(cn)
+    ninety_day = [
+        CheckResult("90 day rule on " + title,
+                    *ninety_day_status(landings[title], date))
+        for title in [rating[0] for rating in ratings["CR"]] + ["UL"]
+    ]
+
+    return (check_ratings("CR", "Class Rating ") + ninety_day
+            + check_ratings("OR", "") + check_ratings("O", ""))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache of command output shown at startup, e.g. stat and check.
+
+The output of a command is stored in the table dashboardCache together
+with the data version of the logbook and the evaluation date. Triggers
+on flights and ratings count up the data version in dataVersion on
+every change, also for changes made by the Qt GUI or other programs.
+Cached output is valid as long as neither the data version nor the
+date has changed.
+"""
+
+import io
+
+
+class Capture(io.StringIO):
+    """Buffer collecting the output of a command with its styles. The
+    styles are stripped when the output is written to a stream that is
+    no terminal."""
+
+    def isatty(self):
+        return True
+
+
+def data_version(cn):
+    """Returns the version of the logbook data."""
+    row = cn.execute("select version from dataVersion where id = 1").fetchone()
+    return int(row[0]) if row is not None else 0
+
+
+def cached_output(cn, command, version, date):
+    """Returns the cached output of a command for the given data version
+    and date, or None."""
+    row = cn.execute(
+        "select output from dashboardCache where command = ? "
+        "and dataVersion = ? and evaluationDate = ?",
+        (command, version, date),
+    ).fetchone()
+    return None if row is None else row[0]
+
+
+def store_output(cn, command, version, date, output):
+    """Stores the output of a command. The caller commits."""
+    cn.execute(
+        "insert or replace into dashboardCache "
+        "(command, dataVersion, evaluationDate, output) values (?, ?, ?, ?)",
+        (command, version, date, output),
+    )
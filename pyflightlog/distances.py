@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Great circle distances of flights, computed with NumPy for all flights
+at once and cached per flight in the table flightDistances.
+
+A cached distance is valid as long as the flight's airports are unchanged
+(triggers delete the cache entry otherwise) and the airport data has the
+version stored with it. Computed distances count up the data version of
+the logbook, so cached responses of the server are dropped.
+"""
+
+import numpy as np
+
+from pyflightlog.airports import airports_version
+from pyflightlog.geo import EARTH_RADIUS_NM
+
+# maximum number of parameters per query
+CHUNK_SIZE = 500
+
+
+def haversine_nm(lat1, lon1, lat2, lon2):
+    """Returns the great circle distances in nautical miles between
+    arrays of positions given in degrees."""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lon2 - lon1)
+    a = (np.sin(dphi / 2) ** 2
+         + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2)
+    return 2 * EARTH_RADIUS_NM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def airport_coordinates(cn_ap, idents):
+    """Returns arrays (lat, long) for the given identifiers, NaN for
+    unknown airports."""
+    idents = list(idents)
+    lat = np.full(len(idents), np.nan)
+    lon = np.full(len(idents), np.nan)
+    position = {ident: i for i, ident in enumerate(idents)}
+
+    for start in range(0, len(idents), CHUNK_SIZE):
+        chunk = idents[start:start + CHUNK_SIZE]
+        cur = cn_ap.execute(
+            "select icaoId, lat, long from airports where icaoId in ("
+            + ", ".join("?" * len(chunk)) + ")",
+            chunk,
+        )
+        for ident, ap_lat, ap_lon in cur:
+            if ap_lat is not None and ap_lon is not None:
+                lat[position[ident]] = ap_lat
+                lon[position[ident]] = ap_lon
+
+    return lat, lon
+
+
+def missing_distances_query(version, start_date=None, end_date=None):
+    """Returns the statement and parameters selecting the flights in a
+    date range whose distance is missing or older than version."""
+    conditions = ""
+    params = [version]
+    if start_date is not None:
+        conditions += "and f.flightdate >= ? "
+        params.append(start_date)
+    if end_date is not None:
+        conditions += "and f.flightdate < ? "
+        params.append(end_date)
+    return (
+        "select f.id, f.departureId, f.destinationId from flights f "
+        "left join flightDistances d on d.flightId = f.id "
+        "where (d.flightId is null or d.airportsVersion != ?) "
+        + conditions,
+        params,
+    )
+
+
+def refresh_distances(cn, cn_ap, start_date=None, end_date=None):
+    """Computes the distances of all flights in the date range that are
+    missing from the cache or were computed from older airport data.
+    Returns the number of computed flights. The caller commits."""
+    version = airports_version(cn_ap)
+    rows = cn.execute(
+        *missing_distances_query(version, start_date, end_date)
+    ).fetchall()
+    if not rows:
+        return 0
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    departures = [row[1] for row in rows]
+    destinations = [row[2] for row in rows]
+
+    # look up every airport once and join by index
+    idents = sorted(set(departures) | set(destinations), key=str)
+    index = {ident: i for i, ident in enumerate(idents)}
+    lat, lon = airport_coordinates(cn_ap, idents)
+    dep = np.array([index[ident] for ident in departures], dtype=np.int64)
+    dest = np.array([index[ident] for ident in destinations], dtype=np.int64)
+
+    distances = haversine_nm(lat[dep], lon[dep], lat[dest], lon[dest])
+
+    # unknown airports are cached as NULL
+    values = [
+        (int(flight_id), version,
+         None if np.isnan(distance) else float(distance))
+        for flight_id, distance in zip(ids, distances)
+    ]
+    cn.executemany(
+        "insert or replace into flightDistances "
+        "(flightId, airportsVersion, distanceNm) values (?, ?, ?)",
+        values,
+    )
+    cn.execute("update dataVersion set version = version + 1 where id = 1")
+
+    return len(values)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filter expressions on the flights table, e.g.
+
+    class in (SEP,TMG) and block > 1:30 and not dep=EDTM
+
+Expressions combine comparisons with and, or, not and parentheses.
+A comparison is a field, an operator and a value:
+
+    =  !=  <  <=  >  >=   compare values
+    in (a, b, ...)        value is one of the list
+    ~                     text contains value
+
+Durations are given as H:MM, as hours like 2h or as minutes. Dates are
+given as dd.mm.yyyy or yyyy-mm-dd. Values with spaces or special
+characters are quoted with ' or ".
+
+An expression is compiled to a SQL condition with parameters, so every
+comparison is done by SQLite on the columns (and indexes) of the flights
+table.
+"""
+
+import datetime as dt
+import functools
+import re
+
+# field name -> (column, kind)
+FIELDS = {
+    "date": ("flightdate", "date"),
+    "type": ("type", "text"),
+    "reg": ("registration", "text"),
+    "registration": ("registration", "text"),
+    "dep": ("departureId", "text"),
+    "dest": ("destinationId", "text"),
+    "class": ("flightTimeClass", "text"),
+    "pic": ("picName", "text"),
+    "function": ("pilotFunction", "text"),
+    "student": ("studentName", "text"),
+    "guests": ("guests", "text"),
+    "remarks": ("remarks", "text"),
+    "block": ("blockMinutes", "duration"),
+    "air": ("airMinutes", "duration"),
+    "night": ("nightMinutes", "duration"),
+    "ifr": ("ifrMinutes", "duration"),
+    "ldg": ("(landingsDay + landingsNight)", "number"),
+    "ldgday": ("landingsDay", "number"),
+    "ldgnight": ("landingsNight", "number"),
+}
+
+COMPARISONS = ("=", "!=", "<", "<=", ">", ">=")
+
+TOKEN = re.compile(
+    r"\s*(?:"
+    r"(?P<op><=|>=|!=|=|<|>|~|\(|\)|,)"
+    r"|'(?P<squote>[^']*)'"
+    r'|"(?P<dquote>[^"]*)"'
+    r"|(?P<word>[^\s=!<>~(),'\"]+)"
+    r")"
+)
+
+
+class FilterError(ValueError):
+    """Raised for filter expressions that cannot be parsed."""
+
+
+def tokenize(text):
+    """Returns a list of tokens (kind, value, position). Kinds are
+    'op', 'word', 'string' and 'end'."""
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKEN.match(text, pos)
+        if match is None or match.end() == pos:
+            pos += len(text[pos:]) - len(text[pos:].lstrip())
+            raise FilterError(f"unexpected character at {pos + 1}: "
+                              f"{text[pos:pos + 10]!r}")
+        start = match.start(match.lastgroup)
+        if match.lastgroup == "op":
+            tokens.append(("op", match.group("op"), start))
+        elif match.lastgroup == "word":
+            tokens.append(("word", match.group("word"), start))
+        else:
+            tokens.append(("string", match.group(match.lastgroup),
+                           start - 1))
+        pos = match.end()
+    tokens.append(("end", None, len(text)))
+    return tokens
+
+
+def escape_like(value):
+    """Escapes the wildcards of a LIKE pattern."""
+    return (value.replace("\\", "\\\\").replace("%", "\\%")
+            .replace("_", "\\_"))
+
+
+def parse_duration(value):
+    """Returns a duration given as H:MM, Nh or minutes in minutes."""
+    match = re.fullmatch(r"(\d+):([0-5]\d)", value)
+    if match:
+        return int(match.group(1)) * 60 + int(match.group(2))
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)h", value)
+    if match:
+        return round(float(match.group(1)) * 60)
+    match = re.fullmatch(r"(\d+)(?:min)?", value)
+    if match:
+        return int(match.group(1))
+    raise FilterError(f"invalid duration: {value}")
+
+
+def parse_date(value):
+    """Returns a date given as dd.mm.yyyy or yyyy-mm-dd as yyyy-mm-dd."""
+    for date_format in ("%d.%m.%Y", "%Y-%m-%d"):
+        try:
+            return dt.datetime.strptime(value, date_format).strftime(
+                "%Y-%m-%d")
+        except ValueError:
+            pass
+    raise FilterError(f"invalid date: {value}")
+
+
+def convert_value(kind, value):
+    """Converts a value given for a field of the given kind."""
+    if kind == "duration":
+        return parse_duration(value)
+    if kind == "date":
+        return parse_date(value)
+    if kind == "number":
+        try:
+            return int(value)
+        except ValueError:
+            raise FilterError(f"invalid number: {value}") from None
+    return value
+
+
+class Parser:
+    """Recursive descent parser compiling an expression to SQL."""
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.index = 0
+        self.params = []
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def next(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def accept(self, kind, value):
+        token = self.peek()
+        if token[0] == kind and (
+                token[1] == value
+                or kind == "word" and token[1].lower() == value):
+            self.index += 1
+            return True
+        return False
+
+    def expect(self, kind, value):
+        if not self.accept(kind, value):
+            self.error(f"expected '{value}'")
+
+    def error(self, message):
+        token = self.peek()
+        found = "end of expression" if token[0] == "end" else repr(token[1])
+        raise FilterError(f"{message} at {token[2] + 1}, found {found}")
+
+    def compile(self):
+        sql = self.parse_or()
+        if self.peek()[0] != "end":
+            self.error("expected 'and' or 'or'")
+        return sql, tuple(self.params)
+
+    def parse_or(self):
+        parts = [self.parse_and()]
+        while self.accept("word", "or"):
+            parts.append(self.parse_and())
+        if len(parts) == 1:
+            return parts[0]
+        return "(" + " or ".join(parts) + ")"
+
+    def parse_and(self):
+        parts = [self.parse_not()]
+        while self.accept("word", "and"):
+            parts.append(self.parse_not())
+        return " and ".join(parts)
+
+    def parse_not(self):
+        if self.accept("word", "not"):
+            return f"not ({self.parse_not()})"
+        if self.accept("op", "("):
+            sql = self.parse_or()
+            self.expect("op", ")")
+            return f"({sql})"
+        return self.parse_comparison()
+
+    def parse_value(self):
+        token = self.next()
+        if token[0] not in ("word", "string"):
+            self.index -= 1
+            self.error("expected a value")
+        return token[1]
+
+    def parse_comparison(self):
+        token = self.next()
+        if token[0] != "word" or token[1].lower() not in FIELDS:
+            self.index -= 1
+            self.error("expected one of the fields "
+                       + ", ".join(sorted(FIELDS)))
+        column, kind = FIELDS[token[1].lower()]
+
+        negate = self.accept("word", "not")
+        if self.accept("word", "in"):
+            self.expect("op", "(")
+            values = [self.parse_value()]
+            while self.accept("op", ","):
+                values.append(self.parse_value())
+            self.expect("op", ")")
+            self.params.extend(convert_value(kind, value)
+                               for value in values)
+            placeholders = ", ".join("?" * len(values))
+            return (f"{column} {'not in' if negate else 'in'} "
+                    f"({placeholders})")
+        if negate:
+            self.error("expected 'in'")
+
+        operator = self.next()
+        if operator[0] != "op" or operator[1] not in COMPARISONS + ("~",):
+            self.index -= 1
+            self.error("expected an operator")
+        if operator[1] == "~" and kind != "text":
+            self.index -= 1
+            self.error("'~' can only be used on text fields")
+        value = self.parse_value()
+
+        if operator[1] == "~":
+            self.params.append(f"%{escape_like(value)}%")
+            return f"{column} like ? escape '\\'"
+        self.params.append(convert_value(kind, value))
+        return f"{column} {operator[1]} ?"
+
+
+@functools.lru_cache(maxsize=64)
+def compile_filter(text):
+    """Returns a SQL condition and a tuple of parameters for a filter
+    expression. Raises FilterError for invalid expressions."""
+    return Parser(text).compile()
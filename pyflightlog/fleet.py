@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reports over many logbooks, e.g. one database per pilot of a flight
+school.
+
+Every logbook is opened read-only by a process of a pool and queried
+with the methods of FlightLog. Only the results, i.e. small namedtuples
+and dicts, are sent back and merged. Logbooks that cannot be read are
+reported with their error instead of failing the whole report.
+"""
+
+import concurrent.futures
+import glob
+import os
+import sqlite3 as sq
+from collections import namedtuple
+
+from pyflightlog import logbook
+from pyflightlog import stats
+
+FleetResult = namedtuple("FleetResult", ["filename", "value", "error"])
+
+# airport database of a worker process, see init_worker()
+_airport_db = None
+
+
+def logbook_files(paths):
+    """Returns the logbook files given as files, directories (all *.db
+    files in it) or glob patterns, sorted and without duplicates."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, "*.db")))
+        else:
+            files += sorted(glob.glob(path))
+    return list(dict.fromkeys(files))
+
+
+def logbook_name(filename):
+    """Returns the name of a logbook shown in reports."""
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def init_worker():
+    """Opens the airport database of a worker process. The fleet
+    commands don't need airports, so it is an empty one in memory."""
+    global _airport_db
+    _airport_db = logbook.AirportDB(":memory:")
+
+
+def query_logbook(task):
+    """Opens a logbook read-only and returns a FleetResult with the
+    value of one of its methods."""
+    filename, method, arguments = task
+    if _airport_db is None:
+        init_worker()
+    try:
+        with logbook.FlightLog(filename, _airport_db, read_only=True) as log:
+            value = getattr(log, method)(*arguments)
+    # invalid values, e.g. a malformed expiration date of a rating, make
+    # only this logbook fail
+    except (sq.Error, logbook.OutdatedLogbook, ValueError) as err:
+        return FleetResult(filename, None, str(err))
+    return FleetResult(filename, value, None)
+
+
+def run(files, method, arguments=(), jobs=None):
+    """Returns a list of FleetResult of calling a method of FlightLog
+    with arguments on every logbook, in the order of files. The
+    logbooks are spread over jobs processes, all cores by default."""
+    tasks = [(filename, method, arguments) for filename in files]
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+    if jobs <= 1:
+        return [query_logbook(task) for task in tasks]
+
+    # several logbooks per message keep the overhead of the pool low
+    chunksize = max(1, len(tasks) // (jobs * 4))
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs, initializer=init_worker) as executor:
+        return list(executor.map(query_logbook, tasks, chunksize=chunksize))
+
+
+def total_totals(values):
+    """Returns the sum of FlightTotals."""
+    total = [0] * len(logbook.FlightTotals._fields)
+    for totals in values:
+        total = [a + b for a, b in zip(total, totals)]
+    return logbook.FlightTotals(*total)
+
+
+def total_matrix(matrices):
+    """Returns the sum of currency matrices (see stats.currency_matrix)."""
+    total = {
+        group: {window: stats.Totals(0, 0) for window in stats.WINDOWS}
+        for group in stats.GROUPS
+    }
+    for matrix in matrices:
+        for group in stats.GROUPS:
+            for window in stats.WINDOWS:
+                totals = total[group][window]
+                total[group][window] = stats.Totals(
+                    totals.landings + matrix[group][window].landings,
+                    totals.minutes + matrix[group][window].minutes,
+                )
+    return total
@@ -6,12 +6,11 @@ Created on Sat Mar 21 14:03:50 2020
 @author: fabi
 """
 
-import sqlite3 as sq
 import datetime as dt
 import sys
-
-# import tempfile
-import requests
+import json
+import shlex
+import shutil
 
 from dateutil.relativedelta import relativedelta
 import csv
@@ -21,13 +20,77 @@ import argparse
 
 import colorama as col
 
-from pyflightlog.flightlog_gui import QtGui
+from pyflightlog import connections
+from pyflightlog import dashboard
+from pyflightlog import filterexpr
+from pyflightlog import logbook
+from pyflightlog import output
+from pyflightlog import query
+from pyflightlog import report
+from pyflightlog import schema
+from pyflightlog import stats
 
 
 def to_datetime(diff):
     return dt.datetime.strptime("0000", "%H%M") + diff
 
 
+def format_minutes(minutes):
+    """Returns a number of minutes as string in format HH:MM."""
+    hrs, mins = divmod(int(minutes), 60)
+    return f"{hrs:02d}:{mins:02d}"
+
+
+# colors of the statuses of check
+STATUS_COLORS = {
+    "valid": col.Fore.LIGHTBLUE_EX,
+    "warning": col.Fore.LIGHTYELLOW_EX,
+    "expired": col.Fore.LIGHTRED_EX,
+}
+
+
+def format_flight(result, long_format=False):
+    """Returns a row of the flights table as a line of ls."""
+    date = result["flightdate"]
+    date = f"{date[8:10]}.{date[5:7]}.{date[:4]}"
+    if not long_format:
+        return "{:<11}{:>6}  {:>4} {:>4}  {:>4} {:>4} {:>2} Ldg".format(
+            date,
+            result["registration"],
+            result["departureId"],
+            result["offblock"],
+            result["destinationId"],
+            result["onblock"],
+            result["landingsDay+landingsNight"],
+        )
+
+    distance = ""
+    if result["distanceNm"] is not None:
+        distance = f"{result['distanceNm']:.0f} nm"
+    return (
+        "{:<11}{:>6} {:>5} {:>4} {:>4} {:>4}  {:>4} "
+        "{:>4} {:>4} {:>2}/{:>2} Ldg(day/night) {:>7}"
+        "  {}({}) {} {}".format(
+            date,
+            result["type"],
+            result["registration"],
+            result["departureId"],
+            result["offblock"],
+            result["startTime"],
+            result["destinationId"],
+            result["landingTime"],
+            result["onblock"],
+            result["landingsDay"],
+            result["landingsNight"],
+            distance,
+            result["picName"],
+            result["pilotFunction"],
+            result["studentName"],
+            result["guests"],
+        )
+    )
+
+
 def parse_dateparam(cmd, datestring):
     """Returns a datetime object"""
     # split given string at every "."
@@ -52,296 +115,10 @@ def parse_dateparam(cmd, datestring):
     return date1
 
 
-def create_connection(filename):
-    """Creates and returns a database connection. If the given "
-    "filename doesn't exist, a new file is created."""
-    cn = sq.connect(filename)
-    return cn
-
-
-def create_tables():
-    """Creates all necessary tables."""
-    cur = con.cursor()
-    cur_ap = con_ap.cursor()
-
-    # check if tables exist
-    cur.execute(
-        "SELECT count(name) FROM sqlite_master WHERE type='table' "
-        "AND name='flights'"
-    )
-    if cur.fetchone()[0] == 1:
-        flights_db = True
-    else:
-        flights_db = False
-
-    cur.execute(
-        "SELECT count(name) FROM sqlite_master WHERE type='table' "
-        "AND name='aircrafts'"
-    )
-    if cur.fetchone()[0] == 1:
-        aircrafts_db = True
-    else:
-        aircrafts_db = False
-
-    cur.execute(
-        "SELECT count(name) FROM sqlite_master WHERE type='table' "
-        "AND name='ratings'"
-    )
-    if cur.fetchone()[0] == 1:
-        ratings_db = True
-    else:
-        ratings_db = False
-
-    cur.execute(
-        "SELECT count(name) FROM sqlite_master WHERE type='table' "
-        "AND name='settings'"
-    )
-    if cur.fetchone()[0] == 1:
-        settings_db = True
-    else:
-        settings_db = False
-
-    cur_ap.execute(
-        "SELECT count(name) FROM sqlite_master WHERE type='table' "
-        "AND name='airports'"
-    )
-    if cur_ap.fetchone()[0] == 1:
-        airports_db = True
-    else:
-        airports_db = False
-
-    # create missing tables
-    if not flights_db:
-        cur.execute(
-            "create table flights (id integer primary key, "
-            "flightdate string, type string, "
-            "registration string, departureId string, destinationId string,"
-            "offblock string, onblock string, "
-            "startTime string, landingTime string,"
-            "landingsDay integer, landingsNight integer, "
-            "picName string, pilotFunction string,"
-            "flightTimeNight integer, flightTimeIFR integer, "
-            "flightTimeClass string, studentName string, "
-            "guests string, remarks string, internalMarkers string)"
-        )
-
-    if not aircrafts_db:
-        cur.execute(
-            "create table aircrafts (registration string primary key, "
-            "type string, class string)"
-        )
-
-    if not ratings_db:
-        cur.execute(
-            "create table ratings (id integer primary key, "
-            "title string, expirationDate string, "
-            "warningPeriod string, renewalConditions string, type string)"
-        )
-        cur.execute(
-            "insert into ratings values (?,?, ?, ?, ?, ?)",
-            ("1", "SEP", "2000-01-01", "m3", "", "CR"),
-        )
-
-    if not settings_db:
-        cur.execute("create table settings (key string primary key, "
-                    "value string)")
-        cur.execute("insert into settings values (?, ?)",
-                    ("default_PIC", "Bühler"))
-        cur.execute(
-            "insert into settings values (?, ?)",
-            ("default_registration", "DESFM")
-        )
-        cur.execute("insert into settings values (?, ?)",
-                    ("default_airport", "EDTM"))
-
-    if not airports_db:
-        cur_ap.execute(
-            "create table airports (icaoId string primary key, "
-            "name string, lat string, "
-            "long string, elev string)"
-        )
-
-    con.commit()
-    con_ap.commit()
-
-
-def delete_table():
-    """Deletes the table if it exists."""
-    cur = con.cursor()
-    cur.execute("drop table if exists flights")
-    cur.execute("drop table if exists ratings")
-    cur.execute("drop table if exists aircrafts")
-    cur.execute("drop table if exists settings")
-    con.commit()
-
-
-def add_flight(
-    ofbt,
-    stt,
-    ldt,
-    onbt,
-    flightdate=None,
-    registration=None,
-    apdep=None,
-    apdest=None,
-    ldgd=1,
-    ldgn="",
-    pic=None,
-    pfct=None,
-    ftn=None,
-    ftifr=None,
-    stud=None,
-    guests=None,
-    rmk=None,
-):
-    """Adds a flight."""
-
-    cur = con.cursor()
-
-    # get defaults from database
-    cur.execute("select value from settings where key='default_PIC'")
-    result = cur.fetchone()
-    default_pic = result["value"]
-
-    cur.execute("select value from settings where key='default_registration'")
-    result = cur.fetchone()
-    default_registration = result["value"]
-
-    cur.execute("select value from settings where key='default_airport'")
-    result = cur.fetchone()
-    default_airport = result["value"]
-
-    # set missing flightdate
-    if flightdate is None:
-        flightdate = dt.date.today()
-
-    # set missing aircraft
-    if registration is None:
-        registration = default_registration
-
-    # get aircraft type and class from aircraft database
-
-    cur.execute("select * from aircrafts where registration=?",
-                (registration,))
-    result = cur.fetchone()
-
-    # Aircraft not found?
-    if result is None:
-        print(
-            col.Fore.RED
-            + f"Aircraft not found: {registration}. Check callsign "
-            "and add aircraft if necessary."
-            + col.Style.RESET_ALL
-        )
-        return
-
-    actype, ftc = (result[1], result[2])
-
-    # set missing airport of departure
-    if apdep is None:
-        apdep = default_airport
-
-    # set missing airport of destination
-    if apdest is None:
-        apdest = default_airport
-
-    # set missing PIC
-    if pic is None:
-        pic = default_pic
-
-    # set missing pilot function
-    if pfct is None:
-        pfct = "PIC"
-
-    # set missing night flight time
-    if ftn is None:
-        ftn = ""
-
-    # set missing ifr flight time
-    if ftifr is None:
-        ftifr = ""
-
-    # set missing student
-    if stud is None:
-        stud = ""
-
-    # set missing guests
-    if guests is None:
-        guests = ""
-
-    # set missing remarks
-    if rmk is None:
-        rmk = ""
-
-    # insert flight into database
-    cur.execute(
-        "insert into flights (flightdate, type, registration, "
-        "departureId, destinationId, offblock, "
-        "onblock, startTime, landingTime, "
-        "landingsDay, landingsNight, picName, "
-        "pilotFunction, flightTimeNight, "
-        "flightTimeIFR, flightTimeClass, "
-        "studentName, guests, remarks) values"
-        " (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, "
-        " ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        (
-            flightdate,
-            actype,
-            registration,
-            apdep,
-            apdest,
-            ofbt,
-            onbt,
-            stt,
-            ldt,
-            ldgd,
-            ldgn,
-            pic,
-            pfct,
-            ftn,
-            ftifr,
-            ftc,
-            stud,
-            guests,
-            rmk,
-        ),
-    )
-    con.commit()
-
-
-def import_database(filename):
-    """Import a database from a csv file."""
-    with open(filename) as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=",")
-        for row in csv_reader:
-            # noinspection PyTypeChecker
-            add_flight(
-                ofbt=row[4],
-                stt=row[5],
-                ldt=row[8],
-                onbt=row[7],
-                registration=row[2],
-                apdep=row[3],
-                flightdate=dt.datetime.strptime(row[0], "%d.%m.%y").strftime(
-                    "%Y-%m-%d"
-                ),
-                apdest=row[6],
-                ldgd=row[12],
-                ldgn=row[13],
-                pfct=row[16],
-                pic="Bühler" if row[9] == "*" else row[9],
-                ftn=row[17],
-                ftifr=row[18],
-                guests=row[11],
-                rmk=row[19],
-                stud="Bühler" if row[10] == "*" else row[10],
-            )
-
-
 class CmdApp(cmd2.Cmd):
     """Command application object, manages all the cli stuff"""
 
-    def __init__(self):
+    def __init__(self, flightlog, dashboard=True):
         # some initializations
         super().__init__()
         del cmd2.Cmd.do_edit
@@ -355,13 +132,61 @@ class CmdApp(cmd2.Cmd):
         del cmd2.Cmd.do_alias
         self.prompt = (
             col.Fore.CYAN + col.Style.BRIGHT +
-            db_name + " > " + col.Style.RESET_ALL
+            flightlog.filename + " > " + col.Style.RESET_ALL
         )
-
-        # noinspection PyTypeChecker
-        self.do_stat("")
-        # noinspection PyTypeChecker
-        self.do_check("--hide-valid")
+        self.log = flightlog
+        self.completion = flightlog.completion
+        # the Qt GUI is created by get_qt_gui() when a GUI command runs
+        # first
+        self.qt_gui = None
+
+        # dashboard, from cache if nothing has changed since the last run
+        if dashboard:
+            self.show_cached("stat")
+            self.show_cached("check --hide-valid")
+
+    def perror(self, msg="", *, end="\n", apply_style=True):
+        """Prints an error message. Makes the one-shot mode exit with an
+        error."""
+        super().perror(msg, end=end, apply_style=apply_style)
+        self.exit_code = max(self.exit_code, output.EXIT_ERROR)
+
+    def onecmd(self, statement, *, add_to_history=True):
+        try:
+            return super().onecmd(statement, add_to_history=add_to_history)
+        except cmd2.exceptions.Cmd2ArgparseError:
+            # invalid arguments, the usage is already printed
+            self.exit_code = max(self.exit_code, output.EXIT_ERROR)
+            raise
+
+    def get_qt_gui(self):
+        """Returns the Qt GUI. PySide6 is imported and the windows are
+        loaded on the first call."""
+        if self.qt_gui is None:
+            from pyflightlog.flightlog_gui import QtGui
+            self.qt_gui = QtGui(self.log.filename,
+                                connections.BUSY_TIMEOUT)
+        return self.qt_gui
+
+    def show_cached(self, command):
+        """Runs a command and caches its output. The cached output is
+        shown instead as long as neither the logbook nor the date has
+        changed."""
+        version = self.log.data_version()
+        today = dt.date.today().strftime("%Y-%m-%d")
+        with self.log.pool.reader() as cn:
+            text = dashboard.cached_output(cn, command, version, today)
+        if text is None:
+            stdout = self.stdout
+            self.stdout = dashboard.Capture()
+            try:
+                self.onecmd(command, add_to_history=False)
+                text = self.stdout.getvalue()
+            finally:
+                self.stdout = stdout
+            with self.log.pool.write() as cn:
+                dashboard.store_output(cn, command, version, today, text)
+        self.poutput(text, end="")
 
     def parse_dateparams(self, datestring_start, datestring_end):
         """Returns a tuple (start_date, end_date) of datetime objects
@@ -490,6 +315,16 @@ class CmdApp(cmd2.Cmd):
                         end_date = end_date + relativedelta(days=1)
         return start_date, end_date
 
+    # tab completion of argument values
+    def airport_completer(self, text, line, begidx, endidx):
+        return self.completion.complete("airports", text)
+
+    def registration_completer(self, text, line, begidx, endidx):
+        return self.completion.complete("registrations", text)
+
+    def name_completer(self, text, line, begidx, endidx):
+        return self.completion.complete("names", text)
+
     # parser for add command
     parser_add = argparse.ArgumentParser()
     parser_add.add_argument("ofbt", help="offblock time")
@@ -512,14 +347,19 @@ class CmdApp(cmd2.Cmd):
         help="specify date of flight in format dd.mm.yyyy",
     )
     parser_add.add_argument(
-        "-a", "--aircraft", nargs=1, dest="acft",
-        help="specify aicraft by registration"
+        "-a",
+        "--aircraft",
+        nargs=1,
+        dest="acft",
+        completer=registration_completer,
+        help="specify aicraft by registration",
     )
     parser_add.add_argument(
         "-dep",
         "--departure",
         nargs=1,
         dest="apdep",
+        completer=airport_completer,
         help="specify airport of departure",
     )
     parser_add.add_argument(
@@ -527,6 +367,7 @@ class CmdApp(cmd2.Cmd):
         "--destination",
         nargs=1,
         dest="apdest",
+        completer=airport_completer,
         help="specify airport of destination",
     )
     parser_add.add_argument(
@@ -550,6 +391,7 @@ class CmdApp(cmd2.Cmd):
         "--pic",
         nargs=1,
         dest="pic",
+        completer=name_completer,
         help="specify PIC; if used, --pilot-function must also be given",
     )
     parser_add.add_argument(
@@ -575,7 +417,12 @@ class CmdApp(cmd2.Cmd):
         help="use full flight time as ifr flight time",
     )
     parser_add.add_argument(
-        "-g", "--guests", dest="guests", nargs=1, help="specify guests"
+        "-g",
+        "--guests",
+        dest="guests",
+        completer=name_completer,
+        nargs=1,
+        help="specify guests",
     )
     parser_add.add_argument(
         "-r", "--remarks", dest="rmk", nargs=1, help="specify remarks"
@@ -585,6 +432,7 @@ class CmdApp(cmd2.Cmd):
         "--flight-instruction",
         dest="fi",
         nargs=1,
+        completer=name_completer,
         help="set pilot function to FI, argument sets student",
     )
     parser_add.add_argument(
@@ -593,8 +441,13 @@ class CmdApp(cmd2.Cmd):
     parser_add.add_argument(
         "--ifr-time", nargs=1, dest="ftifr", help="specify ifr flight time"
     )
-    parser_add.add_argument("--student", dest="stud", nargs=1,
-                            help="specify student")
+    parser_add.add_argument(
+        "--student",
+        dest="stud",
+        completer=name_completer,
+        nargs=1,
+        help="specify student",
+    )
 
     @cmd2.with_argparser(parser_add)
     def do_add(self, args):
@@ -635,11 +488,11 @@ class CmdApp(cmd2.Cmd):
             ldgd = args.ldgd[0]
 
         # option --landings_night specified
-        ldgn = ""
+        ldgn = 0
         if args.ldgn:
             ldgn = args.ldgn[0]
             if not args.ldgd:
-                ldgd = ""
+                ldgd = 0
 
         # option --pic specified
         pic = None
@@ -686,12 +539,8 @@ class CmdApp(cmd2.Cmd):
 
         # option --night given
         if args.night:
-            if ldgd != "":
-                if ldgn != "":
-                    ldgn += ldgd
-                else:
-                    ldgn = ldgd
-                ldgd = ""
+            ldgn += ldgd
+            ldgd = 0
             ftn_string = to_datetime(onbt - ofbt).strftime("%H:%M")
 
         # option --ifr given
@@ -715,25 +564,30 @@ class CmdApp(cmd2.Cmd):
             stud = args.fi[0]
 
         # add flight to database
-        add_flight(
-            ofbt_string,
-            stt_string,
-            ldt_string,
-            onbt_string,
-            flightdate=flightdate.strftime("%Y-%m-%d"),
-            registration=aircraft,
-            apdep=apdep,
-            apdest=apdest,
-            ldgd=ldgd,
-            ldgn=ldgn,
-            pic=pic,
-            pfct=pfct,
-            ftn=ftn_string,
-            ftifr=ftifr_string,
-            stud=stud,
-            guests=guests,
-            rmk=rmk,
-        )
+        try:
+            self.log.add_flight(
+                ofbt_string,
+                stt_string,
+                ldt_string,
+                onbt_string,
+                flightdate=flightdate.strftime("%Y-%m-%d"),
+                registration=aircraft,
+                apdep=apdep,
+                apdest=apdest,
+                ldgd=ldgd,
+                ldgn=ldgn,
+                pic=pic,
+                pfct=pfct,
+                ftn=ftn_string,
+                ftifr=ftifr_string,
+                stud=stud,
+                guests=guests,
+                rmk=rmk,
+            )
+        except logbook.AircraftNotFound as err:
+            self.perror(f"Aircraft not found: {err}. Check callsign "
+                        "and add aircraft if necessary.")
+            return
 
         # show added flight
         self.show_delete(flightdate)
@@ -751,63 +605,9 @@ class CmdApp(cmd2.Cmd):
     @cmd2.with_argparser(parser_last)
     def do_last(self, args):
         """Lists the last n flights."""
-        cur = con.cursor()
-        cur.execute(
-            "select * from (select flightdate, type, registration, "
-            "departureId, destinationId, offblock, "
-            "onblock, startTime, landingTime, landingsDay, "
-            "landingsNight, landingsDay+landingsNight, "
-            "picName,pilotFunction, flightTimeNight, flightTimeIFR, "
-            "flightTimeClass, studentName, guests, "
-            "remarks from flights order by flightdate desc, "
-            "offblock desc limit ?) "
-            "order by flightdate asc, offblock asc;",
-            (args.num,),
-        )
-        if not args.long:
-            for result in cur:
-                date = dt.datetime.strptime(result["flightdate"],
-                                            "%Y-%m-%d").strftime(
-                    "%d.%m.%Y"
-                )
-                self.poutput(
-                    "{:<11}{:>6}  {:>4} {:>4}  {:>4} {:>4} {:>2} Ldg".format(
-                        date,
-                        result["registration"],
-                        result["departureId"],
-                        result["offblock"],
-                        result["destinationId"],
-                        result["onblock"],
-                        result["landingsDay+landingsNight"],
-                    )
-                )
-        else:
-            for result in cur:
-                date = dt.datetime.strptime(result["flightdate"],
-                                            "%Y-%m-%d").strftime(
-                    "%d.%m.%Y"
-                )
-                self.poutput(
-                    "{:<11}{:>6} {:>5} {:>4} {:>4} {:>4}  {:>4} {:>4} "
-                    "{:>4} {:>2}/{:>2} Ldg(day/night)"
-                    "  {}({}) {} {}".format(
-                        date,
-                        result["type"],
-                        result["registration"],
-                        result["departureId"],
-                        result["offblock"],
-                        result["startTime"],
-                        result["destinationId"],
-                        result["landingTime"],
-                        result["onblock"],
-                        result["landingsDay"],
-                        result["landingsNight"],
-                        result["picName"],
-                        result["pilotFunction"],
-                        result["studentName"],
-                        result["guests"],
-                    )
-                )
+        rows = self.log.last_flights(args.num)
+        for result in rows:
+            self.poutput(format_flight(result, args.long))
 
     # parser for add-aircraft command
     parser_add_aircraft = argparse.ArgumentParser()
@@ -822,13 +622,8 @@ class CmdApp(cmd2.Cmd):
     @cmd2.with_argparser(parser_add_aircraft)
     def do_add_aircraft(self, args):
         """Adds an aircraft."""
-        cur = con.cursor()
-        cur.execute(
-            "insert into aircrafts (registration, type, class) values"
-            " (?, ?, ?)",
-            (args.registration, args.type, args.acft_class),
-        )
-        con.commit()
+        self.log.add_aircraft(args.registration, args.type,
+                              args.acft_class)
 
     # parser for ls command
     parser_ls = argparse.ArgumentParser()
@@ -851,52 +646,29 @@ class CmdApp(cmd2.Cmd):
         "-l", "--long", action="store_true", dest="long",
         help="show all data fields"
     )
-    parser_ls.add_argument(
-        "-dep", "--departure", nargs=1, dest="apdep",
-        help="filter airport of departure"
-    )
-    parser_ls.add_argument(
-        "-dest",
-        "--destination",
-        nargs=1,
-        dest="apdest",
-        help="filter airport of destination",
-    )
-    parser_ls.add_argument(
-        "-a", "--aircraft", nargs=1, dest="acft",
-        help="filter aircraft registration"
-    )
-    parser_ls.add_argument(
-        "-t", "--type", nargs=1, dest="type", help="filter aircraft type"
-    )
-    parser_ls.add_argument(
-        "-c", "--class", nargs=1, dest="aclass", help="filter aircraft class"
-    )
-    parser_ls.add_argument("-p", "--pic", nargs=1, dest="pic",
-                           help="filter PIC")
-    parser_ls.add_argument(
-        "-pf",
-        "--pilot-function",
-        nargs=1,
-        dest="pfct",
-        help="filter pilot function, i.e. PIC, Dual",
-    )
-    parser_ls.add_argument(
-        "-s", "--student", dest="stud", nargs=1, help="filter student"
+    query.add_filter_arguments(
+        parser_ls, airport_completer, registration_completer,
+        name_completer
     )
     parser_ls.add_argument(
-        "-g", "--guests", dest="guests", nargs=1, help="filter guests"
+        "-n",
+        "--page-size",
+        type=int,
+        dest="page_size",
+        help="number of flights per page; prints the cursor of the next "
+        "page",
     )
     parser_ls.add_argument(
-        "-r", "--remarks", dest="rmk", nargs=1, help="filter remarks"
+        "--after",
+        dest="after",
+        help="cursor of the page to show, as printed after the previous "
+        "page",
     )
     parser_ls.add_argument(
-        "-fi",
-        "--flight-instruction",
-        dest="fi",
-        action="store_true",
-        help="filter pilot function to FI",
+        "--pager", action="store_true", dest="pager",
+        help="show the flights page by page"
     )
+    output.add_format_arguments(parser_ls)
 
     @cmd2.with_argparser(parser_ls)
     def do_ls(self, args):
@@ -904,99 +676,80 @@ class CmdApp(cmd2.Cmd):
         start_date, end_date = self.parse_dateparams(args.start_date,
                                                      args.end_date)
 
-        # retrieve flights from database
-        cur = con.cursor()
-
-        # parse filter options and set conditions accordingly
-        conditions = ""
-        if args.apdep:
-            conditions += f"and departureId='{args.apdep[0]}' "
-        if args.apdest:
-            conditions += f"and destinationId='{args.apdest[0]}' "
-        if args.acft:
-            conditions += f"and registration='{args.acft[0]}' "
-        if args.type:
-            conditions += f"and type='{args.type[0]}' "
-        if args.aclass:
-            conditions += f"and flightTimeClass='{args.aclass[0]}' "
-        if args.pic:
-            conditions += f"and picName='{args.pic[0]}' "
-        if args.pfct:
-            conditions += f"and pilotFunction='{args.pfct[0]}' "
-        if args.stud:
-            conditions += f"and studentName like '%{args.stud[0]}%' "
-        if args.guests:
-            conditions += f"and guests like '%{args.guests[0]}%' "
-        if args.rmk:
-            conditions += f"and remarks like '%{args.rmk[0]}%' "
-        if args.fi:
-            conditions += "and pilotFunction='FI'"
-
-        if conditions == "":
-            conditions = "and True"  # no additional condition was given
-
-        query_string = (
-            "select flightdate, type, registration, "
-            "departureId, destinationId, offblock, "
-            "onblock, startTime, landingTime, landingsDay, "
-            "landingsNight, landingsDay+landingsNight, "
-            "picName,pilotFunction, flightTimeNight, flightTimeIFR, "
-            "flightTimeClass, studentName, guests, "
-            "remarks from flights where flightdate >= ? and flightdate < ? "
-            + conditions
-            + " order by flightdate asc, offblock asc"
-        )
-
-        cur.execute(
-            query_string,
-            (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")),
-        )
+        cursor = None
+        if args.after:
+            try:
+                cursor = query.parse_cursor(args.after)
+            except ValueError:
+                self.perror(f"Invalid cursor: {args.after}")
+                return
 
-        # print results
-        if not args.long:
-            for result in cur:
-                date = dt.datetime.strptime(result["flightdate"],
-                                            "%Y-%m-%d").strftime(
-                    "%d.%m.%Y"
-                )
+        page_size = args.page_size
+        if page_size is None:
+            if args.pager:
+                page_size = max(shutil.get_terminal_size().lines - 2, 1)
+            else:
+                page_size = query.PAGE_SIZE
+        if page_size < 1:
+            self.perror("Page size must be positive.")
+            return
+
+        count = 0
+        while True:
+            # one more row than needed tells whether there is another page
+            try:
+                rows = list(self.log.flights(start_date, end_date, args,
+                                             after=cursor,
+                                             limit=page_size + 1))
+            except filterexpr.FilterError as err:
+                self.perror(f"Invalid filter expression: {err}")
+                return
+            more = len(rows) > page_size
+            rows = rows[:page_size]
+
+            # each page is written at once
+            if args.format == "csv":
+                self.poutput(output.csv_text(
+                    None if count else output.LS_FIELDS,
+                    [[result[field] for field in output.LS_FIELDS]
+                     for result in rows],
+                ), end="")
+            elif args.format == "json" and rows:
                 self.poutput(
-                    "{:<11}{:>6}  {:>4} {:>4}  {:>4} {:>4} {:>2} Ldg".format(
-                        date,
-                        result["registration"],
-                        result["departureId"],
-                        result["offblock"],
-                        result["destinationId"],
-                        result["onblock"],
-                        result["landingsDay+landingsNight"],
-                    )
+                    ("," if count else "[") + "\n" + ",\n".join(
+                        json.dumps({field: result[field]
+                                    for field in output.LS_FIELDS})
+                        for result in rows
+                    ), end=""
                 )
-        else:
-            for result in cur:
-                date = dt.datetime.strptime(result["flightdate"],
-                                            "%Y-%m-%d").strftime(
-                    "%d.%m.%Y"
-                )
-                self.poutput(
-                    "{:<11}{:>6} {:>5} {:>4} {:>4} {:>4}  {:>4} "
-                    "{:>4} {:>4} {:>2}/{:>2} Ldg(day/night)"
-                    "  {}({}) {} {}".format(
-                        date,
-                        result["type"],
-                        result["registration"],
-                        result["departureId"],
-                        result["offblock"],
-                        result["startTime"],
-                        result["destinationId"],
-                        result["landingTime"],
-                        result["onblock"],
-                        result["landingsDay"],
-                        result["landingsNight"],
-                        result["picName"],
-                        result["pilotFunction"],
-                        result["studentName"],
-                        result["guests"],
-                    )
+            elif rows:
+                self.poutput("\n".join(
+                    format_flight(result, args.long) for result in rows
+                ))
+            count += len(rows)
+            if not more:
+                break
+
+            last = rows[-1]
+            cursor = (last["flightdate"], last["offblock"], last["id"])
+            if args.pager:
+                answer = self.read_input(
+                    "-- more: Enter for next page, q to quit -- "
                 )
+                if answer.strip().lower().startswith("q"):
+                    break
+            elif args.page_size is not None:
+                hint = "--after " + query.format_cursor(*cursor)
+                if args.format == "table":
+                    self.poutput(col.Fore.GREEN + "Next page: "
+                                 + col.Style.RESET_ALL + hint)
+                else:
+                    # keep stdout machine-readable
+                    sys.stderr.write("Next page: " + hint + "\n")
+                break
+
+        if args.format == "json":
+            self.poutput("\n]" if count else "[]")
 
     # parser for export command
     parser_export = argparse.ArgumentParser()
@@ -1020,51 +773,9 @@ class CmdApp(cmd2.Cmd):
         "or 'today'; in case of "
         "relative start date dd.mm.yyyy is mandatory",
     )
-    parser_export.add_argument(
-        "-dep", "--departure", nargs=1, dest="apdep",
-        help="filter airport of departure"
-    )
-    parser_export.add_argument(
-        "-dest",
-        "--destination",
-        nargs=1,
-        dest="apdest",
-        help="filter airport of destination",
-    )
-    parser_export.add_argument(
-        "-a", "--aircraft", nargs=1, dest="acft",
-        help="filter aircraft registration"
-    )
-    parser_export.add_argument(
-        "-t", "--type", nargs=1, dest="type", help="filter aircraft type"
-    )
-    parser_export.add_argument(
-        "-c", "--class", nargs=1, dest="aclass", help="filter aircraft class"
-    )
-    parser_export.add_argument("-p", "--pic", nargs=1, dest="pic",
-                               help="filter PIC")
-    parser_export.add_argument(
-        "-pf",
-        "--pilot-function",
-        nargs=1,
-        dest="pfct",
-        help="filter pilot function, i.e. PIC, Dual",
-    )
-    parser_export.add_argument(
-        "-s", "--student", dest="stud", nargs=1, help="filter student"
-    )
-    parser_export.add_argument(
-        "-g", "--guests", dest="guests", nargs=1, help="filter guests"
-    )
-    parser_export.add_argument(
-        "-r", "--remarks", dest="rmk", nargs=1, help="filter remarks"
-    )
-    parser_export.add_argument(
-        "-fi",
-        "--flight-instruction",
-        dest="fi",
-        action="store_true",
-        help="filter pilot function to FI",
+    query.add_filter_arguments(
+        parser_export, airport_completer, registration_completer,
+        name_completer
     )
 
     @cmd2.with_argparser(parser_export)
@@ -1074,52 +785,11 @@ class CmdApp(cmd2.Cmd):
                                                      args.end_date)
 
         # retrieve flights from database
-        cur = con.cursor()
-
-        # parse filter options and set conditions accordingly
-        conditions = ""
-        if args.apdep:
-            conditions += f"and departureId='{args.apdep[0]}' "
-        if args.apdest:
-            conditions += f"and destinationId='{args.apdest[0]}' "
-        if args.acft:
-            conditions += f"and registration='{args.acft[0]}' "
-        if args.type:
-            conditions += f"and type='{args.type[0]}' "
-        if args.aclass:
-            conditions += f"and flightTimeClass='{args.aclass[0]}' "
-        if args.pic:
-            conditions += f"and picName='{args.pic[0]}' "
-        if args.pfct:
-            conditions += f"and pilotFunction='{args.pfct[0]}' "
-        if args.stud:
-            conditions += f"and studentName like '%{args.stud[0]}%' "
-        if args.guests:
-            conditions += f"and guests like '%{args.guests[0]}%' "
-        if args.rmk:
-            conditions += f"and remarks like '%{args.rmk[0]}%' "
-        if args.fi:
-            conditions += "and pilotFunction='FI'"
-
-        if conditions == "":
-            conditions = "and True"  # no additional condition was given
-
-        query_string = (
-            "select flightdate, type, registration, "
-            "departureId, destinationId, offblock, "
-            "onblock, startTime, landingTime, landingsDay, "
-            "landingsNight, landingsDay+landingsNight, "
-            "picName,pilotFunction, flightTimeNight, flightTimeIFR, "
-            "flightTimeClass, studentName, guests, "
-            "remarks from flights where flightdate >= ? and flightdate < ? "
-            + conditions
-            + " order by flightdate asc, offblock asc"
-        )
-
-        cur.execute(
-            query_string,
-            (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")),
-        )
+        try:
+            cur = self.log.flights(start_date, end_date, args)
+        except filterexpr.FilterError as err:
+            self.perror(f"Invalid filter expression: {err}")
+            return
 
         filename = args.file_name
         if not filename.endswith(".csv"):
@@ -1168,25 +838,7 @@ class CmdApp(cmd2.Cmd):
     def show_delete(self, date, do_delete=False):
         """Common function called by do_show and do_delete"""
         # retrieve flights from database
-        cur = con.cursor()
-        cur.execute(
-            "select flightdate, type, registration, "
-            "departureId, destinationId, offblock, "
-            "onblock, startTime, landingTime, landingsDay, "
-            "landingsNight, landingsDay+landingsNight, "
-            "picName,pilotFunction, flightTimeNight, "
-            "flightTimeIFR, flightTimeClass, studentName, guests, "
-            "remarks, id from flights where flightdate ="
-            " ? order by offblock asc ",
-            (date.strftime("%Y-%m-%d"),),
-        )
-
-        res = cur.fetchall()
-        # close cursor to prevent any conflict with deleting a record
-        # while looping through the result list
-        # no idea if this is necessary
-        cur.close()
-        cur = con.cursor()  # get a shiny new cursor
+        res = self.log.flights_on(date)
 
         for result in res:
             date = dt.datetime.strptime(result["flightdate"],
@@ -1261,12 +913,7 @@ class CmdApp(cmd2.Cmd):
             )
 
             s1 = "{:>15} ".format("Flight time:")
-
-            diff = dt.datetime.strptime(
-                result["onblock"], "%H:%M"
-            ) - dt.datetime.strptime(result["offblock"], "%H:%M")
-
-            s2 = to_datetime(diff).strftime("%H:%M")
+            s2 = format_minutes(result["blockMinutes"])
             s3 = "{:>7}".format(" IFR:")
             s4 = "{:7}".format(result["flightTimeIFR"])
             s5 = "{:>7}".format(" night:")
@@ -1338,9 +985,7 @@ class CmdApp(cmd2.Cmd):
                 ans = self.read_input("Delete this flight (y/N)? ")
                 if ans == "y" or ans == "Y":
                     idn = result["id"]
-                    cur.execute("delete from flights where id=? limit 1",
-                                (int(idn),))
-                    con.commit()
+                    self.log.delete_flight(int(idn))
                     self.poutput(f"Flight Nr. {int(idn)} has been deleted.")
 
     # parser for delete command
@@ -1374,51 +1019,10 @@ class CmdApp(cmd2.Cmd):
         "-l", "--long", action="store_true", dest="long",
         help="show all data fields"
     )
-    parser_sum.add_argument(
-        "-dep", "--departure", nargs=1, dest="apdep",
-        help="filter airport of departure"
-    )
-    parser_sum.add_argument(
-        "-dest",
-        "--destination",
-        nargs=1,
-        dest="apdest",
-        help="filter airport of destination",
-    )
-    parser_sum.add_argument(
-        "-a", "--aircraft", nargs=1, dest="acft",
-        help="filter aircraft registration"
-    )
-    parser_sum.add_argument(
-        "-t", "--type", nargs=1, dest="type", help="filter aircraft type"
-    )
-    parser_sum.add_argument(
-        "-c", "--class", nargs=1, dest="aclass", help="filter aircraft class"
-    )
-    parser_sum.add_argument("-p", "--pic", nargs=1,
-                            dest="pic", help="filter PIC")
-    parser_sum.add_argument(
-        "-pf",
-        "--pilot-function",
-        nargs=1,
-        dest="pfct",
-        help="filter pilot function, i.e. PIC, Dual",
-    )
-    parser_sum.add_argument(
-        "-s", "--student", dest="stud", nargs=1, help="filter student"
-    )
-    parser_sum.add_argument(
-        "-g", "--guests", dest="guests", nargs=1, help="filter guests"
-    )
-    parser_sum.add_argument(
-        "-r", "--remarks", dest="rmk", nargs=1, help="filter remarks"
-    )
-    parser_sum.add_argument(
-        "-fi",
-        "--flight-instruction",
-        dest="fi",
-        action="store_true",
-        help="filter pilot function to FI",
+    output.add_format_arguments(parser_sum)
+    query.add_filter_arguments(
+        parser_sum, airport_completer, registration_completer,
+        name_completer
     )
 
     @cmd2.with_argparser(parser_sum)
@@ -1427,107 +1031,33 @@ class CmdApp(cmd2.Cmd):
         start_date, end_date = self.parse_dateparams(args.start_date,
                                                      args.end_date)
 
-        cur = con.cursor()
-
-        # parse filter options and set conditions accordingly
-        conditions = ""
-        if args.apdep:
-            conditions += f"and departureId='{args.apdep[0]}' "
-        if args.apdest:
-            conditions += f"and destinationId='{args.apdest[0]}' "
-        if args.acft:
-            conditions += f"and registration='{args.acft[0]}' "
-        if args.type:
-            conditions += f"and type='{args.type[0]}' "
-        if args.aclass:
-            conditions += f"and flightTimeClass='{args.aclass[0]}' "
-        if args.pic:
-            conditions += f"and picName='{args.pic[0]}' "
-        if args.pfct:
-            conditions += f"and pilotFunction='{args.pfct[0]}' "
-        if args.stud:
-            conditions += f"and studentName like '%{args.stud[0]}%' "
-        if args.guests:
-            conditions += f"and guests like '%{args.guests[0]}%' "
-        if args.rmk:
-            conditions += f"and remarks like '%{args.rmk[0]}%' "
-        if args.fi:
-            conditions += "and pilotFunction='FI'"
-
-        if conditions == "":
-            conditions = "and True"  # no additional condition was given
-
-        # retrieve flights from database
-        query_string = (
-            "select flightdate, type, registration, "
-            "departureId, destinationId, offblock, "
-            "onblock, startTime, landingTime, landingsDay, "
-            "landingsNight, landingsDay+landingsNight, "
-            "picName,pilotFunction, flightTimeNight, "
-            "flightTimeIFR, flightTimeClass, studentName, guests, "
-            "remarks from flights where flightdate >= ? and flightdate < ? "
-            + conditions
-            + " order by flightdate asc, offblock asc"
-        )
-        cur.execute(
-            query_string,
-            (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")),
-        )
-
-        # loop over all flights and do the sums
-        block_sec = 0
-        flight_sec = 0
-        night_sec = 0
-        ifr_sec = 0
-        ldg_day = 0
-        ldg_night = 0
-        for result in cur:
-            diff = dt.datetime.strptime(
-                result["onblock"], "%H:%M"
-            ) - dt.datetime.strptime(result["offblock"], "%H:%M")
-            if diff.total_seconds() >= 0:
-                block_sec += diff.total_seconds()
-            else:
-                block_sec += diff.total_seconds() + 86400  # add 24h = 86400 s
-
-            diff = dt.datetime.strptime(
-                result["landingTime"], "%H:%M"
-            ) - dt.datetime.strptime(result["startTime"], "%H:%M")
-            if diff.total_seconds() >= 0:
-                flight_sec += diff.total_seconds()
+        # sum up times and landings in the database
+        try:
+            (block_min, flight_min, night_min, ifr_min,
+             ldg_day, ldg_night, distance) = self.log.totals(
+                start_date, end_date, args)
+        except filterexpr.FilterError as err:
+            self.perror(f"Invalid filter expression: {err}")
+            return
+
+        if args.format != "table":
+            fields = ["blockMinutes", "airMinutes", "nightMinutes",
+                      "ifrMinutes", "landingsDay", "landingsNight",
+                      "distanceNm"]
+            record = [block_min, flight_min, night_min, ifr_min,
+                      ldg_day, ldg_night, round(distance, 1)]
+            if args.format == "csv":
+                self.poutput(output.csv_text(fields, [record]), end="")
             else:
-                flight_sec += diff.total_seconds() + 86400  # add 24h = 86400 s
-
-            if result["flightTimeNight"] != "":
-                diff = dt.datetime.strptime(
-                    result["flightTimeNight"], "%H:%M"
-                ) - dt.datetime.strptime("00:00", "%H:%M")
-                night_sec += diff.total_seconds()
-
-            if result["flightTimeIFR"] != "":
-                diff = dt.datetime.strptime(
-                    result["flightTimeIFR"], "%H:%M"
-                ) - dt.datetime.strptime("00:00", "%H:%M")
-                ifr_sec += diff.total_seconds()
-
-            if result["landingsDay"] != "":
-                ldg_day += int(result["landingsDay"])
+                self.poutput(output.json_text(dict(zip(fields, record))))
+            return
 
-            if result["landingsNight"] != "":
-                ldg_night += int(result["landingsNight"])
-
-        block_min, block_sec = divmod(block_sec, 60)
-        block_hr, block_min = divmod(block_min, 60)
         s1 = "Summe Blockzeit: "
-        s2 = "{:02.0f}:{:02.0f}".format(block_hr, block_min)
-        night_min, night_sec = divmod(night_sec, 60)
-        night_hr, night_min = divmod(night_min, 60)
+        s2 = format_minutes(block_min)
         s3 = "   night: "
-        s4 = "{:02.0f}:{:02.0f}".format(night_hr, night_min)
-        ifr_min, ifr_sec = divmod(ifr_sec, 60)
-        ifr_hr, ifr_min = divmod(ifr_min, 60)
+        s4 = format_minutes(night_min)
         s5 = "   IFR: "
-        s6 = "{:02.0f}:{:02.0f}".format(ifr_hr, ifr_min)
+        s6 = format_minutes(ifr_min)
         self.poutput(
             col.Fore.GREEN
             + s1
@@ -1543,18 +1073,27 @@ class CmdApp(cmd2.Cmd):
             + s6
         )
 
-        flight_min, flight_sec = divmod(flight_sec, 60)
-        flight_hr, flight_min = divmod(flight_min, 60)
         s1 = "Summe Flugzeit: "
-        s2 = "{:02.0f}:{:02.0f}".format(flight_hr, flight_min)
-        self.poutput(col.Fore.GREEN + s1 + col.Style.RESET_ALL + s2)
+        s2 = format_minutes(flight_min)
+        s3 = "   distance: "
+        s4 = f"{distance:.0f} nm"
+        self.poutput(
+            col.Fore.GREEN
+            + s1
+            + col.Style.RESET_ALL
+            + s2
+            + col.Fore.GREEN
+            + s3
+            + col.Style.RESET_ALL
+            + s4
+        )
 
         s1 = "Landings: "
-        s2 = "{:>4d}".format(ldg_day + ldg_night)
+        s2 = "{:>4d}".format(int(ldg_day + ldg_night))
         s3 = "  day: "
-        s4 = "{:>4d}".format(ldg_day)
+        s4 = "{:>4d}".format(int(ldg_day))
         s5 = "  night: "
-        s6 = "{:>4d}".format(ldg_night)
+        s6 = "{:>4d}".format(int(ldg_night))
         self.poutput(
             col.Fore.GREEN
             + s1
@@ -1572,401 +1111,261 @@ class CmdApp(cmd2.Cmd):
 
         self.poutput()
 
-    # parser for stat command
-    parser_stat = argparse.ArgumentParser()
-    parser_stat.add_argument(
-        "-l", "--long", action="store_true", dest="long",
-        help="show more information"
+    # parser for route_stats command
+    parser_route_stats = argparse.ArgumentParser()
+    parser_route_stats.add_argument(
+        "start_date",
+        help="start date as yyyy or mm.yyyy or dd.mm.yyyy or "
+        "relative as 'dNNN', 'mNN', 'yNN' "
+        "where N are digits",
+    )
+    parser_route_stats.add_argument(
+        "end_date",
+        nargs="?",
+        help="end date as yyyy or mm.yyyy or dd.mm.yyyy "
+        "or 'today'; in case of "
+        "relative start date dd.mm.yyyy is mandatory",
+    )
+    parser_route_stats.add_argument(
+        "-m",
+        "--min-distance",
+        type=float,
+        default=50,
+        dest="min_distance",
+        help="count legs longer than this distance in nm, default 50",
     )
 
-    @cmd2.with_argparser(parser_stat)
-    def do_stat(self, args):
-        """Shows some information about currency and validity of licenses.
-        Runs at startup.
-        """
-
-        today = dt.datetime.today()
-
-        def calc_sums():
-            secs = 0
-            ldgs_ = 0
-            for result in cur:
-                diff = dt.datetime.strptime(
-                    result["onblock"], "%H:%M"
-                ) - dt.datetime.strptime(result["offblock"], "%H:%M")
-                if diff.total_seconds() >= 0:
-                    secs += diff.total_seconds()
-                else:
-                    secs += diff.total_seconds() + 86400  # add 24h = 86400 s
-
-                # secs += diff.total_seconds()
-                ldgs_ += int(result["landingsDay+landingsNight"])
-
-            mins_, secs = divmod(secs, 60)
-            hrs_, mins_ = divmod(mins_, 60)
-            return hrs_, mins_, ldgs_
-
-        def calc_pic_wo_pic():
-            # sums for 90 days
-            start_date = today + relativedelta(days=-90)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and pilotFunction = ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d"), "PIC"),
-            )
-
-            hrs, mins, ldgs = calc_sums()
-            s1 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for 6 months
-            start_date = today + relativedelta(months=-6)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and pilotFunction = ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d"), "PIC"),
-            )
-
-            hrs, mins, ldgs = calc_sums()
-            s2 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for current year
-            start_date = today.replace(month=1, day=1)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and pilotFunction = ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d"), "PIC"),
-            )
-
-            hrs, mins, ldgs = calc_sums()
-            s3 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for one year
-            start_date = today + relativedelta(years=-1)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and pilotFunction = ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d"), "PIC"),
-            )
-
-            hrs, mins, ldgs = calc_sums()
-            s4 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            self.poutput(
-                col.Fore.GREEN
-                + f"{'PIC (without FI)':18}"
-                + col.Style.RESET_ALL
-                + s1
-                + "  "
-                + s2
-                + "  "
-                + s3
-                + "  "
-                + s4
-            )
-
-        def calc_fi():
-            # sums for 90 days
-            start_date = today + relativedelta(days=-90)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and pilotFunction = ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d"), "FI"),
-            )
-
-            hrs, mins, ldgs = calc_sums()
-            s1 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for 6 months
-            start_date = today + relativedelta(months=-6)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and pilotFunction = ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d"), "FI"),
-            )
-
-            hrs, mins, ldgs = calc_sums()
-            s2 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for current year
-            start_date = today.replace(month=1, day=1)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and pilotFunction = ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d"), "FI"),
-            )
-
-            hrs, mins, ldgs = calc_sums()
-            s3 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for one year
-            start_date = today + relativedelta(years=-1)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and pilotFunction = ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d"), "FI"),
-            )
+    @cmd2.with_argparser(parser_route_stats)
+    def do_route_stats(self, args):
+        """Shows cross-country statistics in given date range."""
+        start_date, end_date = self.parse_dateparams(args.start_date,
+                                                     args.end_date)
+        legs, known, total, long_legs, result = self.log.route_stats(
+            start_date, end_date, args.min_distance)
 
-            hrs, mins, ldgs = calc_sums()
-            s4 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
+        self.poutput(
+            col.Fore.GREEN + "Legs: " + col.Style.RESET_ALL
+            + f"{legs}   "
+            + col.Fore.GREEN + "unknown airports: " + col.Style.RESET_ALL
+            + f"{legs - known}"
+        )
+        self.poutput(
+            col.Fore.GREEN + "Total distance: " + col.Style.RESET_ALL
+            + f"{total:.0f} nm   "
+            + col.Fore.GREEN + f"legs over {args.min_distance:.0f} nm: "
+            + col.Style.RESET_ALL + f"{long_legs}"
+        )
 
+        if result is not None:
+            date = dt.datetime.strptime(result["flightdate"],
+                                        "%Y-%m-%d").strftime("%d.%m.%Y")
             self.poutput(
-                col.Fore.GREEN
-                + f"{'FI':18}"
-                + col.Style.RESET_ALL
-                + s1
-                + "  "
-                + s2
-                + "  "
-                + s3
-                + "  "
-                + s4
-            )
-
-        def calc_fi_incl_pic():
-            # sums for 90 days
-            start_date = today + relativedelta(days=-90)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and (pilotFunction = ? or pilotFunction = ?)",
-                (
-                    start_date.strftime("%Y-%m-%d"),
-                    today.strftime("%Y-%m-%d"),
-                    "PIC",
-                    "FI",
-                ),
+                col.Fore.GREEN + "Longest leg: " + col.Style.RESET_ALL
+                + f"{result['departureId']} - {result['destinationId']} "
+                f"{result['distanceNm']:.0f} nm on {date}"
             )
 
-            hrs, mins, ldgs = calc_sums()
-            s1 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for 6 months
-            start_date = today + relativedelta(months=-6)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and (pilotFunction = ? or pilotFunction = ?)",
-                (
-                    start_date.strftime("%Y-%m-%d"),
-                    today.strftime("%Y-%m-%d"),
-                    "PIC",
-                    "FI",
-                ),
-            )
-
-            hrs, mins, ldgs = calc_sums()
-            s2 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for current year
-            start_date = today.replace(month=1, day=1)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and (pilotFunction = ? or pilotFunction = ?)",
-                (
-                    start_date.strftime("%Y-%m-%d"),
-                    today.strftime("%Y-%m-%d"),
-                    "PIC",
-                    "FI",
-                ),
-            )
+        self.poutput()
 
-            hrs, mins, ldgs = calc_sums()
-            s3 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for one year
-            start_date = today + relativedelta(years=-1)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and (pilotFunction = ? or pilotFunction = ?)",
-                (
-                    start_date.strftime("%Y-%m-%d"),
-                    today.strftime("%Y-%m-%d"),
-                    "PIC",
-                    "FI",
-                ),
-            )
+    # parser for report command
+    parser_report = argparse.ArgumentParser()
+    parser_report.add_argument(
+        "start_date",
+        help="start date as yyyy or mm.yyyy or dd.mm.yyyy or "
+        "relative as 'dNNN', 'mNN', 'yNN' "
+        "where N are digits",
+    )
+    parser_report.add_argument(
+        "end_date",
+        nargs="?",
+        help="end date as yyyy or mm.yyyy or dd.mm.yyyy "
+        "or 'today'; in case of "
+        "relative start date dd.mm.yyyy is mandatory",
+    )
+    parser_report.add_argument(
+        "--group-by",
+        type=report.parse_groups,
+        default=["month"],
+        dest="group_by",
+        help="comma separated list of "
+        + ", ".join(report.GROUPS) + "; default month",
+    )
+    output.add_format_arguments(parser_report)
+    query.add_filter_arguments(
+        parser_report, airport_completer, registration_completer,
+        name_completer
+    )
 
-            hrs, mins, ldgs = calc_sums()
-            s4 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
+    @cmd2.with_argparser(parser_report)
+    def do_report(self, args):
+        """Shows times and landings in given date range grouped by
+        month, aircraft, airport and more."""
+        start_date, end_date = self.parse_dateparams(args.start_date,
+                                                     args.end_date)
+        groups = args.group_by
+        try:
+            rows = self.log.report(groups, start_date, end_date, args)
+        except filterexpr.FilterError as err:
+            self.perror(f"Invalid filter expression: {err}")
+            return
+
+        if args.format == "csv":
+            self.poutput(report.to_csv(groups, rows), end="")
+            return
+        if args.format == "json":
+            self.poutput(report.to_json(groups, rows))
+            return
+
+        widths = [
+            max([len(group)] + [len(keys[i]) for keys, _ in rows])
+            for i, group in enumerate(groups)
+        ]
+        # room for the total line
+        widths[0] = max(widths[0], len("Total"))
+        keys_header = "  ".join(
+            f"{group:<{width}}" for group, width in zip(groups, widths)
+        )
+        self.poutput(
+            col.Fore.GREEN + keys_header
+            + f"  {'Flights':>7} {'Block':>8} {'Air':>8} {'Night':>7} "
+            f"{'IFR':>7} {'Ldg day':>7} {'night':>5}" + col.Style.RESET_ALL
+        )
 
+        previous = ()
+        for keys, totals in rows:
+            # show only keys that changed in multi-level groupings
+            shown = []
+            for i, key in enumerate(keys):
+                if keys[:i + 1] == previous[:i + 1]:
+                    shown.append("")
+                else:
+                    shown.append(key)
+            previous = keys
             self.poutput(
-                col.Fore.GREEN
-                + f"{'PIC (incl. FI)':18}"
-                + col.Style.RESET_ALL
-                + s1
-                + "  "
-                + s2
-                + "  "
-                + s3
-                + "  "
-                + s4
-            )
-
-        def calc_dual():
-            # sums for 90 days
-            start_date = today + relativedelta(days=-90)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and pilotFunction = ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d"), "Dual"),
-            )
-
-            hrs, mins, ldgs = calc_sums()
-            s1 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for 6 months
-            start_date = today + relativedelta(months=-6)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and pilotFunction = ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d"), "Dual"),
-            )
-
-            hrs, mins, ldgs = calc_sums()
-            s2 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for current year
-            start_date = today.replace(month=1, day=1)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and pilotFunction = ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d"), "Dual"),
+                "  ".join(f"{key:<{width}}"
+                          for key, width in zip(shown, widths))
+                + f"  {totals.flights:>7} "
+                f"{format_minutes(totals.blockMinutes):>8} "
+                f"{format_minutes(totals.airMinutes):>8} "
+                f"{format_minutes(totals.nightMinutes):>7} "
+                f"{format_minutes(totals.ifrMinutes):>7} "
+                f"{totals.landingsDay:>7} {totals.landingsNight:>5}"
             )
 
-            hrs, mins, ldgs = calc_sums()
-            s3 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for one year
-            start_date = today + relativedelta(years=-1)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?"
-                "  and pilotFunction = ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d"), "Dual"),
-            )
+        total = report.report_total(rows)
+        self.poutput(
+            col.Fore.GREEN + f"{'Total':<{len(keys_header)}}"
+            + col.Style.RESET_ALL
+            + f"  {total.flights:>7} "
+            f"{format_minutes(total.blockMinutes):>8} "
+            f"{format_minutes(total.airMinutes):>8} "
+            f"{format_minutes(total.nightMinutes):>7} "
+            f"{format_minutes(total.ifrMinutes):>7} "
+            f"{total.landingsDay:>7} {total.landingsNight:>5}"
+        )
+        self.poutput()
 
-            hrs, mins, ldgs = calc_sums()
-            s4 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
+    # parser for night command
+    parser_night = argparse.ArgumentParser()
+    parser_night.add_argument(
+        "start_date",
+        help="start date as yyyy or mm.yyyy or dd.mm.yyyy or "
+        "relative as 'dNNN', 'mNN', 'yNN' "
+        "where N are digits",
+    )
+    parser_night.add_argument(
+        "end_date",
+        nargs="?",
+        help="end date as yyyy or mm.yyyy or dd.mm.yyyy "
+        "or 'today'; in case of "
+        "relative start date dd.mm.yyyy is mandatory",
+    )
+    parser_night.add_argument(
+        "-t",
+        "--tolerance",
+        type=int,
+        default=5,
+        dest="tolerance",
+        help="list and apply only flights whose night time differs by "
+        "more than this number of minutes, default 5",
+    )
+    parser_night.add_argument(
+        "--apply", action="store_true", dest="apply",
+        help="write computed night time and landings to the logbook"
+    )
 
+    @cmd2.with_argparser(parser_night)
+    def do_night(self, args):
+        """Computes night time and night landings from the position of the
+        sun for all flights in given date range. Lists flights where the
+        logbook differs, --apply writes the computed values."""
+        start_date, end_date = self.parse_dateparams(args.start_date,
+                                                     args.end_date)
+        results, skipped = self.log.compute_night(start_date, end_date)
+
+        # differences within the tolerance are neither listed nor applied
+        changed = [
+            result for result in results
+            if abs(result.night_minutes - result.stored_minutes)
+            > args.tolerance
+            or result.night_landings != result.stored_landings
+        ]
+        for result in changed:
+            date = dt.datetime.strptime(result.flightdate,
+                                        "%Y-%m-%d").strftime("%d.%m.%Y")
             self.poutput(
-                col.Fore.GREEN
-                + f"{'Dual':18}"
-                + col.Style.RESET_ALL
-                + s1
-                + "  "
-                + s2
-                + "  "
-                + s3
-                + "  "
-                + s4
-            )
-
-        def calc_all():
-            # sums for 90 days
-            start_date = today + relativedelta(days=-90)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d")),
+                f"{date} {result.departure:>4}-{result.destination:<4} "
+                f"night {format_minutes(result.stored_minutes)} -> "
+                f"{format_minutes(result.night_minutes)}  "
+                f"landings {result.stored_landings} -> "
+                f"{result.night_landings}"
             )
 
-            hrs, mins, ldgs = calc_sums()
-            s1 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for 6 months
-            start_date = today + relativedelta(months=-6)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d")),
-            )
+        self.poutput(
+            col.Fore.GREEN + "Flights: " + col.Style.RESET_ALL
+            + f"{len(results)}   "
+            + col.Fore.GREEN + "differing: " + col.Style.RESET_ALL
+            + f"{len(changed)}   "
+            + col.Fore.GREEN + "skipped (unknown airports or times): "
+            + col.Style.RESET_ALL + f"{skipped}"
+        )
 
-            hrs, mins, ldgs = calc_sums()
-            s2 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for current year
-            start_date = today.replace(month=1, day=1)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d")),
-            )
+        if args.apply and changed:
+            self.log.apply_night(changed)
+            self.poutput(f"Updated {len(changed)} flights.")
+        self.poutput()
 
-            hrs, mins, ldgs = calc_sums()
-            s3 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
-
-            # sums for one year
-            start_date = today + relativedelta(years=-1)
-            cur.execute(
-                "select offblock, onblock, "
-                "landingsDay+landingsNight from flights "
-                "where flightdate >= ? and  flightdate <= ?",
-                (start_date.strftime("%Y-%m-%d"),
-                 today.strftime("%Y-%m-%d")),
-            )
+    # parser for stat command
+    parser_stat = argparse.ArgumentParser()
+    parser_stat.add_argument(
+        "-l", "--long", action="store_true", dest="long",
+        help="show more information"
+    )
+    output.add_format_arguments(parser_stat)
 
-            hrs, mins, ldgs = calc_sums()
-            s4 = f"  {ldgs:>3}     {int(hrs):>02d}:{int(mins):>02d} "
+    @cmd2.with_argparser(parser_stat)
+    def do_stat(self, args):
+        """Shows some information about currency and validity of licenses.
+        Runs at startup.
+        """
 
-            self.poutput(
-                col.Fore.GREEN
-                + f"{'All':18}"
-                + col.Style.RESET_ALL
-                + s1
-                + "  "
-                + s2
-                + "  "
-                + s3
-                + "  "
-                + s4
-            )
+        today = dt.date.today()
+        matrix = self.log.currency_matrix(today)
+
+        if args.format != "table":
+            records = [
+                [group, window, totals.landings, totals.minutes]
+                for group in stats.GROUPS
+                for window, totals in matrix[group].items()
+            ]
+            fields = ["group", "window", "landings", "minutes"]
+            if args.format == "csv":
+                self.poutput(output.csv_text(fields, records), end="")
+            else:
+                self.poutput(output.json_text(
+                    [dict(zip(fields, record)) for record in records]
+                ))
+            return
 
         # Headers
         self.poutput(
@@ -1980,20 +1379,27 @@ class CmdApp(cmd2.Cmd):
             + col.Style.RESET_ALL
         )
 
-        cur = con.cursor()
-
-        # sums for PIC (without FI)
-        calc_pic_wo_pic()
-
-        # sums for FI
-        calc_fi()
-
-        # sums for PIC (incl. FI)
-        calc_fi_incl_pic()
-
+        rows = [
+            ("PIC (without FI)", "PIC"),
+            ("FI", "FI"),
+            ("PIC (incl. FI)", "PIC+FI"),
+        ]
         if args.long:
-            calc_dual()
-            calc_all()
+            rows += [("Dual", "Dual"), ("All", "All")]
+
+        for title, group in rows:
+            cells = [
+                f"  {totals.landings:>3}     "
+                f"{format_minutes(totals.minutes)} "
+                for totals in (matrix[group][window]
+                               for window in stats.WINDOWS)
+            ]
+            self.poutput(
+                col.Fore.GREEN
+                + f"{title:18}"
+                + col.Style.RESET_ALL
+                + "  ".join(cells)
+            )
 
         self.poutput()
 
@@ -2008,298 +1414,309 @@ class CmdApp(cmd2.Cmd):
         action="store_true",
         help="show only warnings and expired items",
     )
+    output.add_format_arguments(parser_check)
 
     @cmd2.with_argparser(parser_check)
     def do_check(self, args):
-        """Checks licenses, ratings etc."""
-
-        def check_ninety_day(_date, _cur, _class):
-            # start checking from yesterday and then move forward day after day
-            d = dt.datetime.today().replace(hour=0, minute=0,
-                                            second=0, microsecond=0)
-            d += relativedelta(days=-1)
-
-            while True:
-                ldg = 0
-                datestring = (d + relativedelta(days=-90)).strftime("%Y-%m-%d")
-                _cur.execute(
-                    "select sum(landingsDay+landingsNight) from "
-                    "flights where flightdate >= ? and "
-                    "flightTimeClass = ?",
-                    (datestring, _class),
-                )
-                row = cur.fetchone()
-                if row[0] is not None:
-                    ldg = int(row[0])
-                if ldg < 3:
-                    d += relativedelta(days=-1)  # return to the last valid day
-                    break
-                d += relativedelta(days=1)
-
-            if _date <= d:
-                if _date >= d + relativedelta(days=-10):
-                    ret = "warning"
-                else:
-                    ret = "valid"
-            else:
-                ret = "expired"
-
-            return ret, d
-
-        def check_date(_date, exp_date, warning_period):
-            ret = "valid"
-            de = dt.datetime.strptime(exp_date, "%Y-%m-%d")
-            dw = de
-            if warning_period[0] == "m":
-                dw += relativedelta(months=-int(warning_period[1:]))
-            if warning_period[0] == "d":
-                dw += relativedelta(days=-int(warning_period[1:]))
-            if _date > de:
-                ret = "expired"
-            else:
-                if _date >= dw:
-                    ret = "warning"
-            return ret
-
+        """Checks licenses, ratings etc. Exits with a warning or expired
+        status in one-shot mode."""
         date = parse_dateparam(self, args.date)
-
-        # get all class ratings, expiration dates and warning periods
-        cur = con.cursor()
-        cur.execute(
-            "select title, expirationDate, warningPeriod "
-            "from ratings where type='CR'"
-        )
-
-        res = cur.fetchall()
-        rating_list = []
-        for result in res:
-            rating_list.append(
-                {
-                    "title": result["title"],
-                    "expirationDate": result["expirationDate"],
-                    "warningPeriod": result["warningPeriod"],
-                }
+        results = self.log.check(date)
+
+        statuses = set(result.status for result in results)
+        if "expired" in statuses:
+            self.exit_code = max(self.exit_code, output.EXIT_EXPIRED)
+        elif "warning" in statuses:
+            self.exit_code = max(self.exit_code, output.EXIT_WARNING)
+
+        if args.hide_valid:
+            results = [result for result in results
+                       if result.status != "valid"]
+
+        if args.format != "table":
+            records = [
+                [result.title, result.status,
+                 None if result.expiration is None
+                 else result.expiration.strftime("%Y-%m-%d")]
+                for result in results
+            ]
+            if args.format == "csv":
+                self.poutput(output.csv_text(
+                    ["title", "status", "expirationDate"], records
+                ), end="")
+            else:
+                self.poutput(output.json_text([
+                    dict(zip(["title", "status", "expirationDate"], record))
+                    for record in records
+                ]))
+            return
+
+        for result in results:
+            expiration = ""
+            if result.expiration is not None:
+                expiration = "  " + result.expiration.strftime("%d.%m.%Y")
+            self.poutput(
+                col.Fore.GREEN
+                + f"{result.title:>20}: "
+                + col.Style.RESET_ALL
+                + STATUS_COLORS[result.status]
+                + f"{result.status:>10}"
+                + expiration
+                + col.Style.RESET_ALL
             )
 
-        # check validity of class ratings
-        for rating in rating_list:
-            s1 = ""
-            check_result = check_date(
-                date, rating["expirationDate"], rating["warningPeriod"]
-            )
-            s2 = "  " + dt.datetime.strptime(
-                rating["expirationDate"], "%Y-%m-%d"
-            ).date().strftime("%d.%m.%Y")
-            if check_result == "valid":
-                s1 = (
-                    col.Fore.LIGHTBLUE_EX
-                    + "{:>10}".format("valid")
-                    + s2
-                    + col.Style.RESET_ALL
-                )
-            if check_result == "expired":
-                s1 = (
-                    col.Fore.LIGHTRED_EX
-                    + "{:>10}".format("expired")
-                    + s2
-                    + col.Style.RESET_ALL
-                )
-            if check_result == "warning":
-                s1 = (
-                    col.Fore.LIGHTYELLOW_EX
-                    + "{:>10}".format("warning")
-                    + s2
-                    + col.Style.RESET_ALL
-                )
-
-            if (not args.hide_valid) or check_result != "valid":
-                self.poutput(
-                    col.Fore.GREEN
-                    + f"{'Class Rating ' + rating['title']:>20}: "
-                    + col.Style.RESET_ALL
-                    + s1
-                )
-
-        # check 90 day rule for class ratings
-        for rating in rating_list:
-            s1 = ""
-            check_result, expiration_date = check_ninety_day(date,
-                                                             cur,
-                                                             rating["title"])
-            s2 = "  " + expiration_date.strftime("%d.%m.%Y")
-            if check_result == "valid":
-                s1 = (
-                    col.Fore.LIGHTBLUE_EX
-                    + "{:>10}".format("valid")
-                    + s2
-                    + col.Style.RESET_ALL
-                )
-            if check_result == "expired":
-                s1 = (
-                    col.Fore.LIGHTRED_EX
-                    + "{:>10}".format("expired")
-                    + s2
-                    + col.Style.RESET_ALL
-                )
-            if check_result == "warning":
-                s1 = (
-                    col.Fore.LIGHTYELLOW_EX
-                    + "{:>10}".format("warning")
-                    + s2
-                    + col.Style.RESET_ALL
-                )
+    # parser for fleet command
+    parser_fleet = argparse.ArgumentParser()
+    parser_fleet.add_argument(
+        "logbooks",
+        completer=cmd2.Cmd.path_complete,
+        help="directory with the logbooks or a glob pattern like "
+        "'pilots/*.db'",
+    )
+    parser_fleet.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        dest="jobs",
+        help="number of processes, default is the number of cores",
+    )
+    fleet_commands = parser_fleet.add_subparsers(
+        dest="fleet_command", required=True, help="report over all logbooks"
+    )
 
-            if (not args.hide_valid) or check_result != "valid":
-                self.poutput(
-                    col.Fore.GREEN
-                    + f"{'90 day rule on ' + rating['title']:>20}: "
-                    + col.Style.RESET_ALL
-                    + s1
-                )
+    parser_fleet_sum = fleet_commands.add_parser(
+        "sum", help="times and landings in a date range per logbook"
+    )
+    parser_fleet_sum.add_argument(
+        "start_date",
+        help="start date as yyyy or mm.yyyy or dd.mm.yyyy or "
+        "relative as 'dNNN', 'mNN', 'yNN' "
+        "where N are digits",
+    )
+    parser_fleet_sum.add_argument(
+        "end_date",
+        nargs="?",
+        help="end date as yyyy or mm.yyyy or dd.mm.yyyy "
+        "or 'today'; in case of "
+        "relative start date dd.mm.yyyy is mandatory",
+    )
+    query.add_filter_arguments(
+        parser_fleet_sum, airport_completer, registration_completer,
+        name_completer
+    )
+    output.add_format_arguments(parser_fleet_sum)
 
-        # check 90 day rule for spl
-        s1 = ""
-        check_result, expiration_date = check_ninety_day(date, cur, "UL")
-        s2 = "  " + expiration_date.strftime("%d.%m.%Y")
-        if check_result == "valid":
-            s1 = (
-                col.Fore.LIGHTBLUE_EX
-                + "{:>10}".format("valid")
-                + s2
-                + col.Style.RESET_ALL
-            )
-        if check_result == "expired":
-            s1 = (
-                col.Fore.LIGHTRED_EX
-                + "{:>10}".format("expired")
-                + s2
-                + col.Style.RESET_ALL
-            )
-        if check_result == "warning":
-            s1 = (
-                col.Fore.LIGHTYELLOW_EX
-                + "{:>10}".format("warning")
-                + s2
-                + col.Style.RESET_ALL
-            )
+    parser_fleet_stat = fleet_commands.add_parser(
+        "stat", help="landings and times of the currency windows per logbook"
+    )
+    parser_fleet_stat.add_argument(
+        "-g",
+        "--group",
+        choices=stats.GROUPS,
+        default="PIC+FI",
+        dest="group",
+        help="pilot functions shown in the table, default PIC+FI",
+    )
+    output.add_format_arguments(parser_fleet_stat)
 
-        if (not args.hide_valid) or check_result != "valid":
-            self.poutput(
-                col.Fore.GREEN
-                + f"{'90 day rule on ' + 'UL':>20}: "
-                + col.Style.RESET_ALL
-                + s1
-            )
+    parser_fleet_check = fleet_commands.add_parser(
+        "check", help="licenses, ratings and 90 day rules per logbook"
+    )
+    parser_fleet_check.add_argument(
+        "date", nargs="?", help="date as dd.mm.yyyy, default is today"
+    )
+    parser_fleet_check.add_argument(
+        "--hide-valid",
+        dest="hide_valid",
+        action="store_true",
+        help="show only warnings and expired items",
+    )
+    output.add_format_arguments(parser_fleet_check)
+
+    @cmd2.with_argparser(parser_fleet)
+    def do_fleet(self, args):
+        """Runs sum, stat or check over many logbooks in parallel and
+        shows the results in one table."""
+        from pyflightlog import fleet
+
+        files = fleet.logbook_files([args.logbooks])
+        if not files:
+            self.perror(f"No logbooks found: {args.logbooks}")
+            return
+        if args.jobs is not None and args.jobs < 1:
+            self.perror("Number of jobs must be positive.")
+            return
+
+        if args.fleet_command == "sum":
+            start_date, end_date = self.parse_dateparams(args.start_date,
+                                                         args.end_date)
+            filters = query.filter_values(args)
+            # invalid expressions are reported once, not per logbook
+            try:
+                query.flight_conditions(filters, start_date, end_date)
+            except filterexpr.FilterError as err:
+                self.perror(f"Invalid filter expression: {err}")
+                return
+            results = fleet.run(files, "totals",
+                                (start_date, end_date, filters), args.jobs)
+        elif args.fleet_command == "stat":
+            results = fleet.run(files, "currency_matrix", (dt.date.today(),),
+                                args.jobs)
+        else:
+            date = parse_dateparam(self, args.date)
+            if date is None:
+                return
+            results = fleet.run(files, "check", (date,), args.jobs)
+
+        for result in results:
+            if result.error is not None:
+                self.perror(f"Skipped {result.filename}: {result.error}")
+        results = [(fleet.logbook_name(result.filename), result.value)
+                   for result in results if result.error is None]
+
+        if args.fleet_command == "sum":
+            self.fleet_sum(results, args.format)
+        elif args.fleet_command == "stat":
+            self.fleet_stat(results, args.group, args.format)
+        else:
+            self.fleet_check(results, args.hide_valid, args.format)
+
+    def fleet_sum(self, results, output_format):
+        """Shows the FlightTotals of every logbook and their total.
+        Distances are left out, they are not computed for read-only
+        logbooks."""
+        from pyflightlog import fleet
+
+        if output_format != "table":
+            fields = ["logbook"] + list(logbook.FlightTotals._fields[:6])
+            records = [[name] + list(totals[:6]) for name, totals in results]
+            if output_format == "csv":
+                self.poutput(output.csv_text(fields, records), end="")
+            else:
+                self.poutput(output.json_text(
+                    [dict(zip(fields, record)) for record in records]
+                ))
+            return
 
-        # get other ratings
-        cur.execute(
-            "select title, expirationDate, "
-            "warningPeriod from ratings where type='OR'"
+        width = max([len("Total")] + [len(name) for name, _ in results])
+        self.poutput(
+            col.Fore.GREEN + f"{'Logbook':<{width}}"
+            + f"  {'Block':>8} {'Air':>8} {'Night':>7} {'IFR':>7} "
+            f"{'Ldg day':>7} {'night':>5}"
+            + col.Style.RESET_ALL
         )
 
-        res = cur.fetchall()
-        rating_list = []
-        for result in res:
-            rating_list.append(
-                {
-                    "title": result["title"],
-                    "expirationDate": result["expirationDate"],
-                    "warningPeriod": result["warningPeriod"],
-                }
-            )
-        # check validity of other ratings
-        for rating in rating_list:
-            s1 = ""
-            check_result = check_date(
-                date, rating["expirationDate"], rating["warningPeriod"]
+        def cells(totals):
+            return (
+                f"  {format_minutes(totals.blockMinutes):>8} "
+                f"{format_minutes(totals.airMinutes):>8} "
+                f"{format_minutes(totals.nightMinutes):>7} "
+                f"{format_minutes(totals.ifrMinutes):>7} "
+                f"{totals.landingsDay:>7} {totals.landingsNight:>5}"
             )
-            s2 = "  " + dt.datetime.strptime(
-                rating["expirationDate"], "%Y-%m-%d"
-            ).date().strftime("%d.%m.%Y")
-            if check_result == "valid":
-                s1 = (
-                    col.Fore.LIGHTBLUE_EX
-                    + "{:>10}".format("valid")
-                    + s2
-                    + col.Style.RESET_ALL
-                )
-            if check_result == "expired":
-                s1 = (
-                    col.Fore.LIGHTRED_EX
-                    + "{:>10}".format("expired")
-                    + s2
-                    + col.Style.RESET_ALL
-                )
-            if check_result == "warning":
-                s1 = (
-                    col.Fore.LIGHTYELLOW_EX
-                    + "{:>10}".format("warning")
-                    + s2
-                    + col.Style.RESET_ALL
-                )
 
-            if (not args.hide_valid) or check_result != "valid":
-                self.poutput(
-                    col.Fore.GREEN
-                    + f"{rating['title']:>20}: "
-                    + col.Style.RESET_ALL
-                    + s1
-                )
+        for name, totals in results:
+            self.poutput(f"{name:<{width}}" + cells(totals))
+        total = fleet.total_totals(totals for _, totals in results)
+        self.poutput(col.Fore.GREEN + f"{'Total':<{width}}"
+                     + col.Style.RESET_ALL + cells(total))
+        self.poutput()
 
-        # get all the rest
-        cur.execute(
-            "select title, expirationDate, "
-            "warningPeriod from ratings where type='O'"
+    def fleet_stat(self, results, group, output_format):
+        """Shows the currency windows of a group of every logbook and
+        their total."""
+        from pyflightlog import fleet
+
+        if output_format != "table":
+            records = [
+                [name, row_group, window, totals.landings, totals.minutes]
+                for name, matrix in results
+                for row_group in stats.GROUPS
+                for window, totals in matrix[row_group].items()
+            ]
+            fields = ["logbook", "group", "window", "landings", "minutes"]
+            if output_format == "csv":
+                self.poutput(output.csv_text(fields, records), end="")
+            else:
+                self.poutput(output.json_text(
+                    [dict(zip(fields, record)) for record in records]
+                ))
+            return
+
+        width = max([18, len("Total")] + [len(name) for name, _ in results])
+        today = dt.date.today()
+        self.poutput(
+            col.Fore.GREEN + f"{group:{width}}{'90 days':^16}  "
+            f"{'6 months':^16}  {today.strftime('%Y'):^16}  "
+            f"{'1 year':^16}" + col.Style.RESET_ALL
+        )
+        self.poutput(
+            col.Fore.GREEN
+            + f"{'':{width}}{'Flights':^8}{'Time':^8}  {'Flights':^8}"
+            f"{'Time':^8}  {'Flights':^8}{'Time':^8}  {'Flights':^8}"
+            f"{'Time':^8}" + col.Style.RESET_ALL
         )
 
-        res = cur.fetchall()
-        rating_list = []
-        for result in res:
-            rating_list.append(
-                {
-                    "title": result["title"],
-                    "expirationDate": result["expirationDate"],
-                    "warningPeriod": result["warningPeriod"],
-                }
-            )
-        # check validity of other ratings
-        for rating in rating_list:
-            s1 = ""
-            check_result = check_date(
-                date, rating["expirationDate"], rating["warningPeriod"]
+        def cells(matrix):
+            return "  ".join(
+                f"  {totals.landings:>3}     "
+                f"{format_minutes(totals.minutes)} "
+                for totals in (matrix[group][window]
+                               for window in stats.WINDOWS)
             )
-            s2 = "  " + dt.datetime.strptime(
-                rating["expirationDate"], "%Y-%m-%d"
-            ).date().strftime("%d.%m.%Y")
-            if check_result == "valid":
-                s1 = (
-                    col.Fore.LIGHTBLUE_EX
-                    + "{:>10}".format("valid")
-                    + s2
-                    + col.Style.RESET_ALL
-                )
-            if check_result == "expired":
-                s1 = (
-                    col.Fore.LIGHTRED_EX
-                    + "{:>10}".format("expired")
-                    + s2
-                    + col.Style.RESET_ALL
-                )
-            if check_result == "warning":
-                s1 = (
-                    col.Fore.LIGHTYELLOW_EX
-                    + "{:>10}".format("warning")
-                    + s2
-                    + col.Style.RESET_ALL
-                )
 
-            if (not args.hide_valid) or check_result != "valid":
-                self.poutput(
-                    col.Fore.GREEN
-                    + f"{rating['title']:>20}: "
-                    + col.Style.RESET_ALL
-                    + s1
-                )
+        for name, matrix in results:
+            self.poutput(f"{name:{width}}" + cells(matrix))
+        total = fleet.total_matrix(matrix for _, matrix in results)
+        self.poutput(col.Fore.GREEN + f"{'Total':{width}}"
+                     + col.Style.RESET_ALL + cells(total))
+        self.poutput()
+
+    def fleet_check(self, results, hide_valid, output_format):
+        """Shows licenses, ratings and 90 day rules of every logbook."""
+        statuses = set(result.status
+                       for _, checks in results for result in checks)
+        if "expired" in statuses:
+            self.exit_code = max(self.exit_code, output.EXIT_EXPIRED)
+        elif "warning" in statuses:
+            self.exit_code = max(self.exit_code, output.EXIT_WARNING)
+
+        rows = [
+            (name, result) for name, checks in results for result in checks
+            if not hide_valid or result.status != "valid"
+        ]
+
+        if output_format != "table":
+            fields = ["logbook", "title", "status", "expirationDate"]
+            records = [
+                [name, result.title, result.status,
+                 None if result.expiration is None
+                 else result.expiration.strftime("%Y-%m-%d")]
+                for name, result in rows
+            ]
+            if output_format == "csv":
+                self.poutput(output.csv_text(fields, records), end="")
+            else:
+                self.poutput(output.json_text(
+                    [dict(zip(fields, record)) for record in records]
+                ))
+            return
+
+        width = max([len("Logbook")] + [len(name) for name, _ in rows])
+        for name, result in rows:
+            expiration = ""
+            if result.expiration is not None:
+                expiration = "  " + result.expiration.strftime("%d.%m.%Y")
+            self.poutput(
+                f"{name:<{width}}"
+                + col.Fore.GREEN
+                + f"{result.title:>20}: "
+                + col.Style.RESET_ALL
+                + STATUS_COLORS[result.status]
+                + f"{result.status:>10}"
+                + expiration
+                + col.Style.RESET_ALL
+            )
 
     # parser for edit_ratings command
     parser_edit_ratings = argparse.ArgumentParser()
@@ -2308,7 +1725,7 @@ class CmdApp(cmd2.Cmd):
     @cmd2.with_argparser(parser_edit_ratings)
     def do_edit_ratings(self, args):
         """Add, change or delete ratings, licenses, conditions."""
-        qt_gui.execute_edit_ratings()
+        self.get_qt_gui().execute_edit_ratings()
 
     # parser for edit_settings command
     parser_edit_settings = argparse.ArgumentParser()
@@ -2317,16 +1734,35 @@ class CmdApp(cmd2.Cmd):
     @cmd2.with_argparser(parser_edit_settings)
     def do_edit_settings(self, args):
         """Like it says: Edit settings."""
-        qt_gui.execute_edit_settings()
+        self.get_qt_gui().execute_edit_settings()
+        self.completion.invalidate()
 
     # parser for import command
     parser_import = argparse.ArgumentParser()
     parser_import.add_argument("filename", nargs=1, help="name of csv file")
+    parser_import.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=1000,
+        dest="batch_size",
+        help="number of rows inserted at once",
+    )
 
     @cmd2.with_argparser(parser_import)
     def do_import(self, args):
         """Import flight from a csv file."""
-        import_database(args.filename[0])
+        result = self.log.import_csv(args.filename[0], args.batch_size)
+
+        for line, message in result.rejected:
+            self.perror(f"Line {line} rejected: {message}")
+
+        rate = result.imported / result.seconds if result.seconds else 0
+        self.poutput(
+            col.Fore.GREEN + "Imported: " + col.Style.RESET_ALL
+            + f"{result.imported} flights in {result.seconds:.2f} s "
+            f"({rate:.0f} rows/s), {len(result.rejected)} rejected"
+        )
 
     # parser for update_airport command
     parser_update_airports = argparse.ArgumentParser()
@@ -2335,47 +1771,39 @@ class CmdApp(cmd2.Cmd):
     @cmd2.with_argparser(parser_update_airports)
     def do_update_airports(self, args):
         """Update airport database from OurAirports.com"""
-        # Download csv file from OurAirports.com
-        with open("airports.csv", "wb") as local_file:
-            self.poutput("Download airport database.")
-            response = requests.get(
-                "https://ourairports.com/data/airports.csv", stream=True
-            )
-            total_length = response.headers.get("content-length")
-
-            if total_length is None:  # no content length header
-                local_file.write(response.content)
-            else:
-                dl = 0
-                total_length = int(total_length)
-                for data in response.iter_content(chunk_size=4096):
-                    dl += len(data)
-                    local_file.write(data)
-                    ratio = dl / total_length
-                    sys.stdout.write(
-                        f"\r|{'=' * int(ratio * 50)}"
-                        "{' ' * int((1 - ratio) * 50)}> {int(ratio * 100)}% "
-                    )
-                    sys.stdout.flush()
-                sys.stdout.write("\n")
-
-        cur_ap = con_ap.cursor()
-
-        # remove old airport entries
-        cur_ap.execute("delete from airports")
-
-        # write airports to database
-        with open("airports.csv", "r") as local_file:
-            csv_reader = csv.reader(local_file, delimiter=",")
-            next(csv_reader)  # skip first for it contains headers
-            for row in csv_reader:
-                cur_ap.execute(
-                    "insert into airports (icaoId, name,"
-                    " lat, long, elev) values "
-                    "(?, ?, ?, ?, ?)",
-                    (row[1], row[3], row[4], row[5], row[6]),
+        self.poutput("Download airport database.")
+        label = None
+
+        def progress(name, done, total):
+            nonlocal label
+            if name != label:
+                if label is not None:
+                    sys.stdout.write("\n")
+                label = name
+            if total:
+                ratio = min(done / total, 1)
+                sys.stdout.write(
+                    f"\r{name:<12}|{'=' * int(ratio * 50)}"
+                    f"{' ' * int((1 - ratio) * 50)}> {int(ratio * 100)}% "
                 )
-            con_ap.commit()
+                sys.stdout.flush()
+
+        results = self.log.airports.refresh(progress=progress)
+        sys.stdout.write("\n")
+        for name, changes in results.items():
+            if changes is None or not (changes.inserted or changes.updated
+                                       or changes.deleted):
+                self.poutput(f"{name.capitalize()} are up to date.")
+                continue
+            if name == "airports":
+                self.completion.invalidate("airports")
+                # distances of the flights from the new positions
+                self.log.refresh_distances()
+            self.poutput(
+                f"{name.capitalize()}: {changes.inserted} added, "
+                f"{changes.updated} changed, {changes.deleted} removed, "
+                f"{changes.unchanged} unchanged."
+            )
 
     # parser for search_airport command
     parser_search_airport = argparse.ArgumentParser()
@@ -2385,60 +1813,237 @@ class CmdApp(cmd2.Cmd):
     parser_search_airport.add_argument(
         "-id", action="store_true", help="Search identifiers only"
     )
+    parser_search_airport.add_argument(
+        "-n",
+        "--limit",
+        type=int,
+        default=25,
+        dest="limit",
+        help="maximum number of results",
+    )
+    parser_search_airport.add_argument(
+        "--details", action="store_true",
+        help="show runways and radio frequencies"
+    )
 
     @cmd2.with_argparser(parser_search_airport)
     def do_search_airports(self, args):
         """Search airport by identifier or name."""
-        cur = con_ap.cursor()
-        if not args.id:
-            cur.execute(
-                "select * from airports where name like ? or icaoId like ?",
-                ("%" + args.search_string[0] + "%", "%" +
-                 args.search_string[0] + "%"),
-            )
-        else:
-            cur.execute(
-                "select * from airports where icaoId like ?",
-                ("%" + args.search_string[0] + "%",),
+        results = self.log.airports.search(
+            args.search_string[0], ids_only=args.id, limit=args.limit
+        )
+
+        if args.details:
+            runways, frequencies = self.log.airports.details(
+                [result["icaoId"] for result in results]
             )
 
-        for result in cur:
-            self.poutput(f'{result["icaoID"]:>8} {result["name"]}')
+        for result in results:
+            if result["municipality"]:
+                self.poutput(f'{result["icaoId"]:>8} {result["name"]} '
+                             f'({result["municipality"]})')
+            else:
+                self.poutput(f'{result["icaoId"]:>8} {result["name"]}')
+            if not args.details:
+                continue
+            for runway in runways.get(result["icaoId"], []):
+                size = (f'{runway["lengthFt"] or "?"} x '
+                        f'{runway["widthFt"] or "?"} ft')
+                remarks = [runway["surface"]]
+                if runway["lighted"]:
+                    remarks.append("lighted")
+                if runway["closed"]:
+                    remarks.append("closed")
+                designator = f'{runway["leIdent"]}/{runway["heIdent"]}'
+                self.poutput(
+                    f'{"":>8}   RWY {designator:<9} {size:>16} '
+                    f'{", ".join(filter(None, remarks))}'
+                )
+            for frequency in frequencies.get(result["icaoId"], []):
+                self.poutput(
+                    f'{"":>8}   {frequency["type"]:<7} '
+                    f'{frequency["frequencyMhz"] or 0:8.3f} MHz '
+                    f'{frequency["description"]}'
+                )
+
+    # parser for nearby_airports command
+    parser_nearby_airports = argparse.ArgumentParser()
+    parser_nearby_airports.add_argument(
+        "airport",
+        completer=airport_completer,
+        help="identifier of the airport in the center",
+    )
+    parser_nearby_airports.add_argument(
+        "-r",
+        "--radius",
+        type=float,
+        default=20,
+        dest="radius",
+        help="radius in nautical miles, default 20",
+    )
+
+    @cmd2.with_argparser(parser_nearby_airports)
+    def do_nearby_airports(self, args):
+        """List airports within a radius around an airport."""
+        position = self.log.airports.position(args.airport)
+        if position is None:
+            self.perror(f"Airport not found or without position: "
+                        f"{args.airport}")
+            return
+
+        for distance, ident, name in self.log.airports.within(
+                *position, args.radius):
+            self.poutput(f"{ident:>8} {distance:6.1f} nm  {name}")
+
+    # parser for nearest_airport command
+    parser_nearest_airport = argparse.ArgumentParser()
+    parser_nearest_airport.add_argument(
+        "lat", type=float, help="latitude in decimal degrees"
+    )
+    parser_nearest_airport.add_argument(
+        "lon", type=float, help="longitude in decimal degrees"
+    )
+    parser_nearest_airport.add_argument(
+        "-n",
+        "--number",
+        type=int,
+        default=1,
+        dest="number",
+        help="number of airports to show",
+    )
+
+    @cmd2.with_argparser(parser_nearest_airport)
+    def do_nearest_airport(self, args):
+        """Show the airports closest to a position."""
+        if not -90 <= args.lat <= 90 or not -180 <= args.lon <= 180:
+            self.perror("Position out of range.")
+            return
+
+        for distance, ident, name in self.log.airports.nearest(
+            args.lat, args.lon, args.number
+        ):
+            self.poutput(f"{ident:>8} {distance:6.1f} nm  {name}")
+
+    # parser for serve command
+    parser_serve = argparse.ArgumentParser()
+    parser_serve.add_argument(
+        "--host", dest="host",
+        help="address to listen on, default 127.0.0.1"
+    )
+    parser_serve.add_argument(
+        "-p", "--port", type=int, dest="port",
+        help="port to listen on, default 8400"
+    )
+    parser_serve.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        dest="workers",
+        help="number of threads running queries, default is the number "
+        "of reader connections",
+    )
+
+    @cmd2.with_argparser(parser_serve)
+    def do_serve(self, args):
+        """Serves ls, sum, stat, check and airport search as JSON over
+        HTTP until Ctrl-C is pressed."""
+        import asyncio
+        from pyflightlog import server
+
+        host = args.host or server.HOST
+        port = args.port or server.PORT
+        api = server.Server(self.log, args.workers)
+
+        def ready(addresses):
+            for address in addresses:
+                self.poutput(f"Serving on http://{address[0]}:{address[1]}/"
+                             " (Ctrl-C to stop)")
+
+        try:
+            asyncio.run(api.serve(host, port, ready))
+        except KeyboardInterrupt:
+            self.poutput()
+        except OSError as err:
+            self.perror(f"Cannot listen on {host}:{port}: {err}")
+        finally:
+            api.close()
+
+    # parser for explain command
+    parser_explain = argparse.ArgumentParser()
+
+    # noinspection PyUnusedLocal
+    @cmd2.with_argparser(parser_explain)
+    def do_explain(self, args):
+        """Shows the query plans of the queries used by the commands."""
+        self.poutput(
+            col.Fore.GREEN + f"Schema version: {self.log.schema_version()}"
+            + col.Style.RESET_ALL
+        )
+        for commands, lines in self.log.query_plans():
+            self.poutput(col.Fore.GREEN + commands + col.Style.RESET_ALL)
+            for line in lines:
+                self.poutput("    " + line)
 
 
 def main():
-    # Determine database name from command line argument
-    if len(sys.argv) < 2:
-        print("usage: flightlog [filename]")
-        sys.exit(1)
-    global db_name
-    db_name = sys.argv[1]
+    parser = argparse.ArgumentParser(
+        prog="flog",
+        description="A small EASA-compliant flight log for the command "
+        "line. Without a command the interactive prompt is started.",
+    )
+    parser.add_argument("filename", help="logbook database file")
+    parser.add_argument(
+        "-f",
+        "--file",
+        dest="script",
+        help="run the commands in this file, one per line, and exit",
+    )
+    parser.add_argument(
+        "command",
+        nargs=argparse.REMAINDER,
+        help="run this command and exit, e.g. sum 2023 --json",
+    )
+    cli_args = parser.parse_args()
+
+    # the script is usually given after the filename, where it ends up
+    # in the remainder
+    if (cli_args.script is None and len(cli_args.command) == 2
+            and cli_args.command[0] in ("-f", "--file")):
+        cli_args.script = cli_args.command[1]
+        cli_args.command = []
+
+    # cmd2 would run the remaining arguments as commands
     del sys.argv[1:]
 
-    # create database connection
-    global con
-    con = create_connection(db_name)
-    con.row_factory = sq.Row
-
-    # create airport database connection
+    # open the logbook and the airport database, missing tables are
+    # created
     # TODO good location for airports.db file?
-    global con_ap
-    con_ap = create_connection("airports.db")
-    con_ap.row_factory = sq.Row
-
-    # check if all tables exists and create them if necessary
-    create_tables()
-
-    # Prepare Qt Gui
-    global qt_gui
-    qt_gui = QtGui(db_name)
+    flightlog = logbook.FlightLog(cli_args.filename,
+                                  logbook.AirportDB("airports.db"))
 
-    # start cmd2 command loop
-    CmdApp().cmdloop()
+    exit_code = output.EXIT_OK
+    if cli_args.script is None and not cli_args.command:
+        # start cmd2 command loop
+        CmdApp(flightlog).cmdloop()
+    else:
+        # one-shot mode without the dashboard
+        if cli_args.script is not None:
+            try:
+                commands = output.read_script(cli_args.script)
+            except OSError as err:
+                print(f"flog: cannot read {cli_args.script}: {err}",
+                      file=sys.stderr)
+                sys.exit(output.EXIT_ERROR)
+        else:
+            commands = [shlex.join(cli_args.command)]
+        app = CmdApp(flightlog, dashboard=False)
+        app.runcmds_plus_hooks(commands, add_to_history=False)
+        exit_code = app.exit_code
 
     # close db connections
-    con.close()
-    con_ap.close()
+    flightlog.close()
+    flightlog.airports.close()
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
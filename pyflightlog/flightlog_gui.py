@@ -6,11 +6,13 @@ import os
 
 
 class QtGui:
-    def __init__(self, dbname):
+    def __init__(self, dbname, busy_timeout=5000):
         QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)  # to avoid a warning message in the terminal
         self.app = QApplication()
         db = QSqlDatabase.addDatabase("QSQLITE")
         db.setDatabaseName(dbname)
+        # wait for the writer of the command line instead of failing
+        db.setConnectOptions(f"QSQLITE_BUSY_TIMEOUT={busy_timeout}")
         db.open()
 
         self.edit_rating_window = EditRatingWindow(self.app)
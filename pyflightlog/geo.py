@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Geographic queries on the airport database.
+
+Candidates are selected by bounding boxes on the R*Tree index
+airports_rtree and then filtered by their great circle distance.
+"""
+
+import math
+
+EARTH_RADIUS_NM = 3440.065
+
+# nautical miles per degree of latitude
+NM_PER_DEGREE = 60.0
+
+# half the circumference of the earth
+MAX_DISTANCE_NM = math.pi * EARTH_RADIUS_NM
+
+
+def distance_nm(lat1, lon1, lat2, lon2):
+    """Returns the great circle distance between two positions in
+    nautical miles."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (math.sin(dphi / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2)
+    return 2 * EARTH_RADIUS_NM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_boxes(lat, lon, radius_nm):
+    """Returns a list of (minLat, maxLat, minLon, maxLon) covering all
+    positions within radius_nm. Boxes crossing the antimeridian are
+    split in two."""
+    dlat = radius_nm / NM_PER_DEGREE
+    min_lat = lat - dlat
+    max_lat = lat + dlat
+
+    # near the poles every longitude is within range
+    if min_lat <= -90 or max_lat >= 90:
+        return [(max(min_lat, -90), min(max_lat, 90), -180, 180)]
+
+    # widest longitude difference at the latitude closest to a pole
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    dlon = radius_nm / (NM_PER_DEGREE * cos_lat)
+    if dlon >= 180:
+        return [(min_lat, max_lat, -180, 180)]
+
+    min_lon = lon - dlon
+    max_lon = lon + dlon
+    if min_lon < -180:
+        return [(min_lat, max_lat, min_lon + 360, 180),
+                (min_lat, max_lat, -180, max_lon)]
+    if max_lon > 180:
+        return [(min_lat, max_lat, min_lon, 180),
+                (min_lat, max_lat, -180, max_lon - 360)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
+
+
+def airport_position(cn, ident):
+    """Returns (lat, long) of an airport or None if it is unknown."""
+    row = cn.execute(
+        "select lat, long from airports where icaoId = ?", (ident.upper(),)
+    ).fetchone()
+    if row is None or row[0] is None or row[1] is None:
+        return None
+    return row[0], row[1]
+
+
+def airports_within(cn, lat, lon, radius_nm):
+    """Returns a list of (distance in nm, icaoId, name) of all airports
+    within radius_nm, sorted by distance."""
+    results = []
+    for min_lat, max_lat, min_lon, max_lon in bounding_boxes(lat, lon,
+                                                              radius_nm):
+        cur = cn.execute(
+            "select a.icaoId, a.name, a.lat, a.long from airports_rtree r "
+            "join airports a on a.id = r.id "
+            "where r.minLat <= ? and r.maxLat >= ? "
+            "and r.minLon <= ? and r.maxLon >= ?",
+            (max_lat, min_lat, max_lon, min_lon),
+        )
+        for ident, name, ap_lat, ap_lon in cur:
+            distance = distance_nm(lat, lon, ap_lat, ap_lon)
+            if distance <= radius_nm:
+                results.append((distance, ident, name))
+
+    results.sort()
+    return results
+
+
+def nearest_airports(cn, lat, lon, count=1):
+    """Returns the count airports closest to a position as a list of
+    (distance in nm, icaoId, name)."""
+    radius = 10.0
+    while True:
+        results = airports_within(cn, lat, lon, radius)
+        if len(results) >= count or radius >= MAX_DISTANCE_NM:
+            return results[:count]
+        radius *= 4
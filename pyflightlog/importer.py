@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bulk import of flights from a csv file.
+
+Defaults and aircraft are looked up once, the rows are validated and
+converted by a generator and inserted in batches inside one transaction.
+"""
+
+import csv
+import datetime as dt
+import functools
+import time
+from collections import namedtuple
+
+ImportResult = namedtuple("ImportResult", ["imported", "rejected", "seconds"])
+
+INSERT_FLIGHT = (
+    "insert into flights (flightdate, type, registration, "
+    "departureId, destinationId, offblock, "
+    "onblock, startTime, landingTime, "
+    "landingsDay, landingsNight, picName, "
+    "pilotFunction, flightTimeNight, "
+    "flightTimeIFR, flightTimeClass, "
+    "studentName, guests, remarks) values"
+    " (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, "
+    " ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# number of columns of the csv format
+CSV_COLUMNS = 20
+
+
+def read_settings(cn):
+    """Returns all settings as a dict."""
+    return {row[0]: row[1] for row in
+            cn.execute("select key, value from settings")}
+
+
+def read_aircrafts(cn):
+    """Returns a dict registration -> (type, class)."""
+    return {row[0]: (row[1], row[2]) for row in
+            cn.execute("select registration, type, class from aircrafts")}
+
+
+def parse_time(value, optional=False):
+    """Returns a time given as H:MM, HH:MM, HMM or HHMM in format HH:MM.
+    Empty values are allowed for optional fields."""
+    value = value.strip()
+    if value == "" and optional:
+        return ""
+    if ":" in value:
+        hours, _, minutes = value.partition(":")
+    else:
+        hours, minutes = value[:-2], value[-2:]
+    if (1 <= len(hours) <= 2 and len(minutes) == 2 and hours.isdigit()
+            and minutes.isdigit() and int(hours) < 24 and int(minutes) < 60):
+        return f"{int(hours):02d}:{minutes}"
+    raise ValueError(f"invalid time '{value}'")
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_date(value):
+    """Returns a date given as dd.mm.yy in format yyyy-mm-dd."""
+    try:
+        return dt.datetime.strptime(value, "%d.%m.%y").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"invalid date '{value}'") from None
+
+
+def parse_landings(value):
+    """Returns a number of landings, empty values count as 0."""
+    value = value.strip()
+    if value == "":
+        return 0
+    landings = int(value)
+    if landings < 0:
+        raise ValueError(f"invalid number of landings '{value}'")
+    return landings
+
+
+def convert_rows(csv_reader, settings, aircrafts, rejected):
+    """Generator yielding the values to insert for every valid row.
+    Invalid rows are appended to rejected as (line number, message)."""
+    default_pic = settings.get("default_PIC", "")
+
+    for row in csv_reader:
+        line = csv_reader.line_num
+        if not row:
+            continue
+        if len(row) < CSV_COLUMNS:
+            rejected.append(
+                (line, f"expected {CSV_COLUMNS} columns, got {len(row)}")
+            )
+            continue
+
+        registration = row[2]
+        if registration not in aircrafts:
+            rejected.append((line, f"aircraft not found: {registration}"))
+            continue
+        actype, ftc = aircrafts[registration]
+
+        try:
+            values = (
+                parse_date(row[0]),
+                actype,
+                registration,
+                row[3],
+                row[6],
+                parse_time(row[4]),
+                parse_time(row[7]),
+                parse_time(row[5]),
+                parse_time(row[8]),
+                parse_landings(row[12]),
+                parse_landings(row[13]),
+                default_pic if row[9] == "*" else row[9],
+                row[16],
+                parse_time(row[17], optional=True),
+                parse_time(row[18], optional=True),
+                ftc,
+                default_pic if row[10] == "*" else row[10],
+                row[11],
+                row[19],
+            )
+        except ValueError as err:
+            rejected.append((line, str(err)))
+            continue
+
+        yield values
+
+
+def bulk_import(cn, filename, batch_size=1000):
+    """Imports all flights from a csv file in a single transaction.
+    Returns an ImportResult."""
+    start = time.perf_counter()
+    settings = read_settings(cn)
+    aircrafts = read_aircrafts(cn)
+    rejected = []
+    imported = 0
+
+    cn.commit()
+    cur = cn.cursor()
+    try:
+        cur.execute("begin")
+        with open(filename, newline="") as csv_file:
+            csv_reader = csv.reader(csv_file, delimiter=",")
+            batch = []
+            for values in convert_rows(csv_reader, settings, aircrafts,
+                                       rejected):
+                batch.append(values)
+                if len(batch) >= batch_size:
+                    cur.executemany(INSERT_FLIGHT, batch)
+                    imported += len(batch)
+                    batch = []
+            if batch:
+                cur.executemany(INSERT_FLIGHT, batch)
+                imported += len(batch)
+        cur.execute("commit")
+    except Exception:
+        cn.rollback()
+        raise
+
+    return ImportResult(imported, rejected, time.perf_counter() - start)
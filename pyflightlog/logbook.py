@@ -0,0 +1,644 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Library interface of the logbook and the airport database.
+
+A FlightLog owns a pool of connections to one logbook file (see
+connections), an AirportDB the connection to an airport database. Both
+keep their compiled statements in the statement cache of their
+connections, so services embedding them should keep the objects alive
+instead of opening them per request. Queries run on the readers of the
+pool, changes on its writer, so a FlightLog may be shared by threads.
+The distances of flights are computed when flights or airports change
+and when a logbook is opened for writing, so queries never write.
+Any number of logbooks can be open at once, e.g.
+
+    with AirportDB("airports.db") as airport_db:
+        with FlightLog("logbook.db", airport_db) as log:
+            totals = log.totals(dt.date(2023, 1, 1), dt.date(2024, 1, 1),
+                                "class=SEP")
+
+Methods selecting flights take a date range (start inclusive, end
+exclusive) and filters, which are either a filter expression (see
+filterexpr) or an object with the attributes of the filter options of
+the command line (see query). Invalid filter expressions raise
+FilterError.
+"""
+
+import argparse
+import datetime as dt
+import sqlite3 as sq
+from collections import namedtuple
+
+from pyflightlog import airports
+from pyflightlog import completion
+from pyflightlog import connections
+from pyflightlog import currency
+from pyflightlog import dashboard
+from pyflightlog import geo
+from pyflightlog import importer
+from pyflightlog import query
+from pyflightlog import report
+from pyflightlog import schema
+from pyflightlog import stats
+
+# the modules distances and night load NumPy, so they are imported by the
+# methods using them
+
+FLIGHT_COLUMNS = (
+    "select flights.id, flightdate, type, registration, "
+    "departureId, destinationId, offblock, "
+    "onblock, startTime, landingTime, landingsDay, "
+    "landingsNight, landingsDay+landingsNight, "
+    "picName,pilotFunction, flightTimeNight, flightTimeIFR, "
+    "flightTimeClass, studentName, guests, "
+    "remarks, blockMinutes, distanceNm from flights "
+    "left join flightDistances on flightId = flights.id "
+)
+
+LAST_FLIGHTS_QUERY = (
+    "select * from (" + FLIGHT_COLUMNS
+    + "order by flightdate desc, offblock desc limit ?) "
+    "order by flightdate asc, offblock asc"
+)
+
+FLIGHTS_ON_QUERY = (
+    FLIGHT_COLUMNS + "where flightdate = ? order by offblock asc"
+)
+
+ROUTE_STATS_QUERY = (
+    "select count(*), count(distanceNm), "
+    "coalesce(sum(distanceNm), 0), "
+    "coalesce(sum(distanceNm > ?), 0) from flights "
+    "left join flightDistances on flightId = flights.id "
+    "where flightdate >= ? and flightdate < ?"
+)
+
+LONGEST_LEG_QUERY = (
+    "select flightdate, departureId, destinationId, distanceNm "
+    "from flights join flightDistances "
+    "on flightId = flights.id "
+    "where flightdate >= ? and flightdate < ? "
+    "and distanceNm is not null "
+    "order by distanceNm desc limit 1"
+)
+
+# whether a flight has no distance computed from the current airports
+STALE_DISTANCES_QUERY = (
+    "select exists (select 1 from flights "
+    "left join flightDistances on flightId = flights.id "
+    "where flightId is null or airportsVersion != ?)"
+)
+
+FlightTotals = namedtuple(
+    "FlightTotals",
+    ["blockMinutes", "airMinutes", "nightMinutes", "ifrMinutes",
+     "landingsDay", "landingsNight", "distanceNm"],
+)
+
+RouteStats = namedtuple(
+    "RouteStats", ["legs", "known", "distanceNm", "longLegs", "longest"]
+)
+
+
+class AircraftNotFound(LookupError):
+    """Raised when a flight is added for an unknown aircraft."""
+
+
+class OutdatedLogbook(RuntimeError):
+    """Raised when a logbook opened read-only has an older schema, which
+    lacks tables and columns the queries need."""
+
+
+def table_exists(cn, name):
+    """Returns True if the table exists."""
+    cur = cn.execute(
+        "SELECT count(name) FROM sqlite_master WHERE type='table' "
+        "AND name=?", (name,)
+    )
+    return cur.fetchone()[0] == 1
+
+
+def to_date(date):
+    """Returns a date, datetime or yyyy-mm-dd string as date or
+    datetime."""
+    if isinstance(date, str):
+        return dt.date.fromisoformat(date)
+    return date
+
+
+def date_string(date):
+    """Returns a date, datetime or yyyy-mm-dd string as yyyy-mm-dd."""
+    return to_date(date).strftime("%Y-%m-%d")
+
+
+class AirportDB:
+    """Airport database from OurAirports.com with full-text search and
+    spatial queries. Searches and lookups run on the reader connections
+    of a pool, so that threads can share an AirportDB."""
+
+    def __init__(self, filename="airports.db", max_readers=4):
+        self.filename = filename
+        self.pool = connections.ConnectionPool(filename, max_readers)
+        # the writer, used by refresh and the command line completion
+        self.con = self.pool.writer
+        self.create_tables()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.pool.close()
+
+    def create_tables(self):
+        """Creates the airports table if necessary and brings the
+        database to the current schema version."""
+        if not table_exists(self.con, "airports"):
+            self.con.execute(
+                "create table airports (icaoId string primary key, "
+                "name string, lat string, "
+                "long string, elev string)"
+            )
+            self.con.commit()
+        schema.migrate(self.con, schema.AIRPORTS_MIGRATIONS)
+
+    def refresh(self, urls=None, progress=None):
+        """Downloads the airports, runways and frequencies, or the
+        datasets given as dict of name and url (see airports.DATASETS),
+        and applies the changes to their tables. progress is called with
+        (name, bytes read, total bytes or None). Returns a dict of name
+        and airports.Changes, None if the file didn't change."""
+        return airports.refresh_datasets(self.con, self.filename, urls,
+                                         progress=progress)
+
+    def version(self):
+        """Returns the version of the airport data, counted up on every
+        refresh."""
+        with self.pool.reader() as cn:
+            return airports.airports_version(cn)
+
+    def search(self, search_string, ids_only=False, limit=25):
+        """Returns the airports matching a search string, best first."""
+        with self.pool.reader() as cn:
+            return airports.search_airports(cn, search_string,
+                                            ids_only=ids_only, limit=limit)
+
+    def details(self, idents):
+        """Returns two dicts of the runways and the radio frequencies of
+        airports, keyed on their identifiers."""
+        with self.pool.reader() as cn:
+            return airports.airport_details(cn, idents)
+
+    def position(self, ident):
+        """Returns (lat, lon) of an airport or None."""
+        with self.pool.reader() as cn:
+            return geo.airport_position(cn, ident)
+
+    def within(self, lat, lon, radius_nm):
+        """Returns a list of (distance, ident, name) of the airports
+        within a radius, closest first."""
+        with self.pool.reader() as cn:
+            return geo.airports_within(cn, lat, lon, radius_nm)
+
+    def nearest(self, lat, lon, count=1):
+        """Returns a list of (distance, ident, name) of the airports
+        closest to a position."""
+        with self.pool.reader() as cn:
+            return geo.nearest_airports(cn, lat, lon, count)
+
+
+class FlightLog:
+    """Logbook database with queries and aggregates over its flights.
+    Opens airports.db if no AirportDB is given. A read-only logbook is
+    neither created nor migrated and its cached distances are not
+    computed; OutdatedLogbook is raised if it needs a migration."""
+
+    def __init__(self, filename, airport_db=None, read_only=False,
+                 max_readers=4):
+        self.filename = filename
+        self.read_only = read_only
+        self.pool = connections.ConnectionPool(filename, max_readers,
+                                               read_only)
+        if read_only:
+            version = schema.schema_version(self.pool.writer)
+            latest = schema.latest_version(schema.FLIGHTS_MIGRATIONS)
+            if version < latest:
+                self.pool.close()
+                raise OutdatedLogbook(
+                    f"schema version {version} is older than {latest}, "
+                    "open the logbook once with flog to upgrade it"
+                )
+        # the writer, used by the command line for everything
+        self.con = self.pool.writer
+        self._own_airports = airport_db is None
+        self.airports = AirportDB() if airport_db is None else airport_db
+        if not read_only:
+            self.create_tables()
+            # the airports may have been refreshed by another logbook
+            self.update_distances()
+        self.completion = completion.Completer(self.con, self.airports.con)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the logbook and the airport database if it was opened
+        by the logbook."""
+        self.pool.close()
+        if self._own_airports:
+            self.airports.close()
+
+    def create_tables(self):
+        """Creates all necessary tables."""
+        cur = self.con.cursor()
+
+        # create missing tables
+        if not table_exists(self.con, "flights"):
+            cur.execute(
+                "create table flights (id integer primary key, "
+                "flightdate string, type string, "
+                "registration string, departureId string, "
+                "destinationId string,"
+                "offblock string, onblock string, "
+                "startTime string, landingTime string,"
+                "landingsDay integer, landingsNight integer, "
+                "picName string, pilotFunction string,"
+                "flightTimeNight integer, flightTimeIFR integer, "
+                "flightTimeClass string, studentName string, "
+                "guests string, remarks string, internalMarkers string)"
+            )
+
+        if not table_exists(self.con, "aircrafts"):
+            cur.execute(
+                "create table aircrafts (registration string primary key, "
+                "type string, class string)"
+            )
+
+        if not table_exists(self.con, "ratings"):
+            cur.execute(
+                "create table ratings (id integer primary key, "
+                "title string, expirationDate string, "
+                "warningPeriod string, renewalConditions string, "
+                "type string)"
+            )
+            cur.execute(
+                "insert into ratings values (?,?, ?, ?, ?, ?)",
+                ("1", "SEP", "2000-01-01", "m3", "", "CR"),
+            )
+
+        if not table_exists(self.con, "settings"):
+            cur.execute("create table settings (key string primary key, "
+                        "value string)")
+            cur.execute("insert into settings values (?, ?)",
+                        ("default_PIC", "Bühler"))
+            cur.execute(
+                "insert into settings values (?, ?)",
+                ("default_registration", "DESFM")
+            )
+            cur.execute("insert into settings values (?, ?)",
+                        ("default_airport", "EDTM"))
+
+        self.con.commit()
+
+        # bring the database to the current schema version
+        schema.migrate(self.con, schema.FLIGHTS_MIGRATIONS)
+
+    def delete_tables(self):
+        """Deletes the tables if they exist."""
+        cur = self.con.cursor()
+        cur.execute("drop table if exists flights")
+        cur.execute("drop table if exists ratings")
+        cur.execute("drop table if exists aircrafts")
+        cur.execute("drop table if exists settings")
+        self.con.commit()
+
+    def schema_version(self):
+        return schema.schema_version(self.con)
+
+    def data_version(self):
+        """Returns the version of the logbook data, counted up on every
+        change of flights and ratings."""
+        with self.pool.reader() as cn:
+            return dashboard.data_version(cn)
+
+    def conditions(self, start_date, end_date, filters=None, after=None):
+        """Returns a where clause and its parameters for a date range and
+        filters."""
+        if isinstance(filters, str):
+            filters = argparse.Namespace(where=filters)
+        return query.flight_conditions(filters, to_date(start_date),
+                                       to_date(end_date), after=after)
+
+    def add_flight(
+        self,
+        ofbt,
+        stt,
+        ldt,
+        onbt,
+        flightdate=None,
+        registration=None,
+        apdep=None,
+        apdest=None,
+        ldgd=1,
+        ldgn=0,
+        pic=None,
+        pfct=None,
+        ftn=None,
+        ftifr=None,
+        stud=None,
+        guests=None,
+        rmk=None,
+    ):
+        """Adds a flight. Missing values are taken from the settings.
+        Raises AircraftNotFound for unknown aircraft."""
+        with self.pool.write() as cn:
+            flight_id = self._add_flight(
+                cn, ofbt, stt, ldt, onbt, flightdate, registration, apdep,
+                apdest, ldgd, ldgn, pic, pfct, ftn, ftifr, stud, guests, rmk
+            )
+            self._refresh_distances(cn)
+
+        # new names and airfields may have been used
+        self.completion.invalidate("names", "airports")
+        return flight_id
+
+    def _add_flight(self, cn, ofbt, stt, ldt, onbt, flightdate, registration,
+                    apdep, apdest, ldgd, ldgn, pic, pfct, ftn, ftifr, stud,
+                    guests, rmk):
+        cur = cn.cursor()
+
+        # get defaults from database
+        settings = importer.read_settings(cn)
+        default_pic = settings.get("default_PIC")
+        default_registration = settings.get("default_registration")
+        default_airport = settings.get("default_airport")
+
+        # set missing flightdate
+        if flightdate is None:
+            flightdate = dt.date.today()
+
+        # set missing aircraft
+        if registration is None:
+            registration = default_registration
+
+        # get aircraft type and class from aircraft database
+        cur.execute("select * from aircrafts where registration=?",
+                    (registration,))
+        result = cur.fetchone()
+        if result is None:
+            raise AircraftNotFound(registration)
+
+        actype, ftc = (result[1], result[2])
+
+        # set missing values
+        if apdep is None:
+            apdep = default_airport
+        if apdest is None:
+            apdest = default_airport
+        if pic is None:
+            pic = default_pic
+        if pfct is None:
+            pfct = "PIC"
+
+        # landings are stored as numbers
+        if ldgd == "":
+            ldgd = 0
+        if ldgn == "":
+            ldgn = 0
+
+        # set missing optional fields
+        ftn = "" if ftn is None else ftn
+        ftifr = "" if ftifr is None else ftifr
+        stud = "" if stud is None else stud
+        guests = "" if guests is None else guests
+        rmk = "" if rmk is None else rmk
+
+        # insert flight into database
+        cur.execute(
+            "insert into flights (flightdate, type, registration, "
+            "departureId, destinationId, offblock, "
+            "onblock, startTime, landingTime, "
+            "landingsDay, landingsNight, picName, "
+            "pilotFunction, flightTimeNight, "
+            "flightTimeIFR, flightTimeClass, "
+            "studentName, guests, remarks) values"
+            " (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, "
+            " ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                flightdate, actype, registration, apdep, apdest,
+                ofbt, onbt, stt, ldt, ldgd, ldgn, pic, pfct,
+                ftn, ftifr, ftc, stud, guests, rmk,
+            ),
+        )
+        return cur.lastrowid
+
+    def delete_flight(self, flight_id):
+        with self.pool.write() as cn:
+            cn.execute("delete from flights where id=?", (flight_id,))
+
+        # names and airfields of the flight may no longer be used
+        self.completion.invalidate("names", "airports")
+
+    def add_aircraft(self, registration, actype, acft_class):
+        with self.pool.write() as cn:
+            cn.execute(
+                "insert into aircrafts (registration, type, class) values"
+                " (?, ?, ?)",
+                (registration, actype, acft_class),
+            )
+        self.completion.invalidate("registrations")
+
+    def import_csv(self, filename, batch_size=1000):
+        """Imports flights from a csv file. Returns an ImportResult."""
+        with self.pool.write() as cn:
+            result = importer.bulk_import(cn, filename, batch_size)
+            self._refresh_distances(cn)
+        self.completion.invalidate("names", "airports")
+        return result
+
+    def last_flights(self, num=5):
+        """Returns the last num flights, oldest first."""
+        with self.pool.reader() as cn:
+            return cn.execute(LAST_FLIGHTS_QUERY, (num,)).fetchall()
+
+    def flights_on(self, date):
+        """Returns the flights of a day."""
+        with self.pool.reader() as cn:
+            return cn.execute(FLIGHTS_ON_QUERY,
+                              (date_string(date),)).fetchall()
+
+    def flights(self, start_date, end_date, filters=None, after=None,
+                limit=None):
+        """Returns an iterator over the flights in a date range matching
+        filters, in the order of query.FLIGHT_ORDER. If a page cursor
+        (flightdate, offblock, id) is given as after, the flights after
+        it are returned. Filters are checked before the iterator is
+        returned."""
+        return self._rows(*self._flights_query(start_date, end_date,
+                                               filters, after, limit))
+
+    def _flights_query(self, start_date, end_date, filters=None, after=None,
+                       limit=None):
+        conditions, params = self.conditions(start_date, end_date, filters,
+                                             after)
+        statement = (FLIGHT_COLUMNS + conditions
+                     + f" order by {query.FLIGHT_ORDER}")
+        if limit is not None:
+            statement += " limit ?"
+            params = params + [limit]
+        return statement, params
+
+    def _rows(self, statement, params):
+        # the reader is kept until all rows are read or the iterator is
+        # closed
+        with self.pool.reader() as cn:
+            cur = cn.execute(statement, params)
+            try:
+                yield from cur
+            finally:
+                cur.close()
+
+    def refresh_distances(self):
+        """Computes the missing distances of all flights and returns their
+        number. Called after the airports were refreshed."""
+        if self.read_only:
+            return 0
+        with self.pool.write() as cn:
+            return self._refresh_distances(cn)
+
+    def _refresh_distances(self, cn):
+        from pyflightlog import distances
+
+        with self.airports.pool.reader() as cn_ap:
+            return distances.refresh_distances(cn, cn_ap)
+
+    def update_distances(self):
+        """Computes the missing distances if there are any. The check
+        does not load NumPy. Returns the number of computed flights."""
+        with self.pool.reader() as cn:
+            stale = cn.execute(STALE_DISTANCES_QUERY,
+                               (self.airports.version(),)).fetchone()[0]
+        return self.refresh_distances() if stale else 0
+
+    def totals(self, start_date, end_date, filters=None):
+        """Returns the FlightTotals of times in minutes, landings and
+        distance of the flights in a date range matching filters."""
+        statement, params = self._totals_query(start_date, end_date,
+                                               filters)
+        with self.pool.reader() as cn:
+            row = cn.execute(statement, params).fetchone()
+        return FlightTotals(*(int(value) for value in row[:6]),
+                            float(row[6]))
+
+    def _totals_query(self, start_date, end_date, filters=None):
+        conditions, params = self.conditions(start_date, end_date, filters)
+        return (
+            "select coalesce(sum(blockMinutes), 0), "
+            "coalesce(sum(airMinutes), 0), "
+            "coalesce(sum(nightMinutes), 0), "
+            "coalesce(sum(ifrMinutes), 0), "
+            "coalesce(sum(landingsDay), 0), "
+            "coalesce(sum(landingsNight), 0), "
+            "coalesce(sum(distanceNm), 0) from flights "
+            "left join flightDistances on flightId = flights.id "
+            + conditions,
+            params,
+        )
+
+    def route_stats(self, start_date, end_date, min_distance=50):
+        """Returns the RouteStats of the flights in a date range; longest
+        is the row of the longest leg or None."""
+        start = date_string(start_date)
+        end = date_string(end_date)
+        with self.pool.reader() as cn:
+            legs, known, total, long_legs = cn.execute(
+                ROUTE_STATS_QUERY, (min_distance, start, end)
+            ).fetchone()
+            longest = cn.execute(LONGEST_LEG_QUERY, (start, end)).fetchone()
+        return RouteStats(legs, known, total, long_legs, longest)
+
+    def report(self, groups, start_date, end_date, filters=None):
+        """Returns a list of (keys, ReportTotals) of the flights in a date
+        range matching filters grouped by the given groups (see
+        report.GROUPS)."""
+        conditions, params = self.conditions(start_date, end_date, filters)
+        with self.pool.reader() as cn:
+            return report.group_report(cn, groups, conditions, params)
+
+    def query_plans(self, today=None):
+        """Returns a list of (commands, lines of EXPLAIN QUERY PLAN) of the
+        statements the commands run, built like the commands build them,
+        for the year before today."""
+        from pyflightlog import distances
+        from pyflightlog import night
+
+        today = today or dt.date.today()
+        start = today - dt.timedelta(days=365)
+        start_string, end_string = date_string(start), date_string(today)
+        filters = argparse.Namespace(acft=["DESFM"])
+        conditions, params = self.conditions(start, today, filters)
+        statements = [
+            ("last", LAST_FLIGHTS_QUERY, (5,)),
+            ("ls / export", *self._flights_query(start, today)),
+            ("ls / export -a",
+             *self._flights_query(start, today, filters)),
+            ("ls page", *self._flights_query(
+                start, today, after=(start_string, "10:00", 1),
+                limit=query.PAGE_SIZE)),
+            ("show / delete", FLIGHTS_ON_QUERY, (end_string,)),
+            ("sum", *self._totals_query(start, today)),
+            ("sum -a", *self._totals_query(start, today, filters)),
+            ("open", STALE_DISTANCES_QUERY, (self.airports.version(),)),
+            ("add / import / update-airports (distances)",
+             *distances.missing_distances_query(self.airports.version())),
+            ("route stats", ROUTE_STATS_QUERY,
+             (50, start_string, end_string)),
+            ("route stats (longest leg)", LONGEST_LEG_QUERY,
+             (start_string, end_string)),
+            ("report --group-by year,class -a",
+             report.group_report_query(["year", "class"], conditions),
+             params),
+            ("stat", *stats.currency_matrix_query(today)),
+            ("check (ratings)", currency.RATINGS_QUERY, ()),
+            ("check (landings)", currency.LANDINGS_QUERY, ()),
+            ("night", night.NIGHT_QUERY, (start_string, end_string)),
+        ]
+        with self.pool.reader() as cn:
+            return [
+                (commands, schema.explain_query_plan(cn, statement, params))
+                for commands, statement, params in statements
+            ]
+
+    def currency_matrix(self, today=None):
+        """Returns the landings and times of the currency windows (see
+        stats.currency_matrix)."""
+        with self.pool.reader() as cn:
+            return stats.currency_matrix(cn, today)
+
+    def check(self, date):
+        """Returns a list of CheckResult of all ratings and the 90 day
+        rules on date."""
+        with self.pool.reader() as cn:
+            return currency.check_all(cn, date)
+
+    def compute_night(self, start_date, end_date):
+        """Returns the NightResults of the flights in a date range and
+        the number of flights skipped for unknown airports or times."""
+        from pyflightlog import night
+
+        with self.pool.reader() as cn, self.airports.pool.reader() as cn_ap:
+            return night.compute_night(cn, cn_ap, date_string(start_date),
+                                       date_string(end_date))
+
+    def apply_night(self, results):
+        """Writes computed night times and landings to the logbook."""
+        from pyflightlog import night
+
+        with self.pool.write() as cn:
+            night.apply_night(cn, results)
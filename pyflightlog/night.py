@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Night time from solar geometry.
+
+Night is the time between the end of evening civil twilight and the
+beginning of morning civil twilight, i.e. while the sun is more than 6
+degrees below the horizon. All times of the logbook are taken as UTC.
+
+Dawn and dusk are computed with NumPy for all (airport, date) pairs at
+once and memoized until the airport data changes. The night minutes of
+a leg are counted minute by minute over the block time, with dawn and
+dusk interpolated between departure and destination.
+"""
+
+import datetime as dt
+from collections import namedtuple
+
+import numpy as np
+
+from pyflightlog.airports import airports_version
+from pyflightlog.distances import airport_coordinates
+
+# zenith angle of the sun at the end of civil twilight
+CIVIL_TWILIGHT_ZENITH = 96.0
+
+# twilight times for days without dawn or without night
+ALWAYS = 1e4
+
+# number of legs evaluated at once
+CHUNK_SIZE = 2000
+
+# (airport, date) -> (dawn, dusk) in minutes after midnight UTC
+_twilight_cache = {}
+
+# version of the airport data the cached twilight was computed from
+_twilight_version = None
+
+NightResult = namedtuple(
+    "NightResult",
+    ["flight_id", "flightdate", "departure", "destination",
+     "stored_minutes", "night_minutes", "stored_landings",
+     "night_landings", "landings"],
+)
+
+
+def civil_twilight(lat, lon, day_of_year):
+    """Returns arrays (dawn, dusk) in minutes after midnight UTC for
+    positions in degrees and days of the year. Days without dawn give
+    (ALWAYS, -ALWAYS), days without night (-ALWAYS, ALWAYS)."""
+    gamma = 2 * np.pi / 365 * (day_of_year - 1)
+    eqtime = 229.18 * (
+        0.000075
+        + 0.001868 * np.cos(gamma)
+        - 0.032077 * np.sin(gamma)
+        - 0.014615 * np.cos(2 * gamma)
+        - 0.040849 * np.sin(2 * gamma)
+    )
+    decl = (
+        0.006918
+        - 0.399912 * np.cos(gamma)
+        + 0.070257 * np.sin(gamma)
+        - 0.006758 * np.cos(2 * gamma)
+        + 0.000907 * np.sin(2 * gamma)
+        - 0.002697 * np.cos(3 * gamma)
+        + 0.00148 * np.sin(3 * gamma)
+    )
+    phi = np.radians(lat)
+    cos_ha = (np.cos(np.radians(CIVIL_TWILIGHT_ZENITH))
+              / (np.cos(phi) * np.cos(decl))
+              - np.tan(phi) * np.tan(decl))
+    ha = np.degrees(np.arccos(np.clip(cos_ha, -1, 1)))
+
+    dawn = 720 - 4 * (lon + ha) - eqtime
+    dusk = 720 - 4 * (lon - ha) - eqtime
+
+    # polar night and midnight sun
+    dawn = np.where(cos_ha > 1, ALWAYS, np.where(cos_ha < -1, -ALWAYS, dawn))
+    dusk = np.where(cos_ha > 1, -ALWAYS, np.where(cos_ha < -1, ALWAYS, dusk))
+    return dawn, dusk
+
+
+def twilight(cn_ap, idents, dates):
+    """Returns arrays (dawn, dusk) for pairs of airport identifiers and
+    dates (yyyy-mm-dd). Unknown airports give NaN."""
+    global _twilight_version
+
+    # a refresh of the airports may have moved them
+    version = airports_version(cn_ap)
+    if version != _twilight_version:
+        _twilight_cache.clear()
+        _twilight_version = version
+
+    keys = list(zip(idents, dates))
+    missing = sorted(set(key for key in keys if key not in _twilight_cache),
+                     key=str)
+
+    if missing:
+        airports = sorted(set(key[0] for key in missing), key=str)
+        index = {ident: i for i, ident in enumerate(airports)}
+        lat, lon = airport_coordinates(cn_ap, airports)
+        position = np.array([index[key[0]] for key in missing])
+        day_of_year = np.array(
+            [dt.date.fromisoformat(key[1]).timetuple().tm_yday
+             for key in missing]
+        )
+        dawn, dusk = civil_twilight(lat[position], lon[position],
+                                    day_of_year)
+        for key, dawn_min, dusk_min in zip(missing, dawn, dusk):
+            _twilight_cache[key] = (float(dawn_min), float(dusk_min))
+
+    values = np.array([_twilight_cache[key] for key in keys],
+                      dtype=float).reshape(-1, 2)
+    return values[:, 0], values[:, 1]
+
+
+def parse_minutes(value):
+    """Returns the minutes after midnight of a H:MM or HH:MM string, None
+    for empty or invalid values."""
+    hours, _, minutes = (value or "").partition(":")
+    try:
+        return int(hours) * 60 + int(minutes)
+    except ValueError:
+        return None
+
+
+def to_minutes(times):
+    """Returns an array of minutes after midnight for H:MM or HH:MM
+    strings, NaN for empty or invalid ones."""
+    return np.array([parse_minutes(t) for t in times], dtype=float)
+
+
+def is_night(time, dawn, dusk):
+    """Returns whether times of day are at night. Dawn and dusk may lie
+    outside of 0..1440 for longitudes far from Greenwich, so the day is
+    taken modulo 24 hours."""
+    return (time - dawn) % 1440 >= dusk - dawn
+
+
+def night_minutes(offblock, block, dawn_dep, dusk_dep, dawn_dest,
+                  dusk_dest):
+    """Returns the night minutes of legs given offblock time and block
+    time in minutes and dawn and dusk at both ends."""
+    result = np.zeros(len(block), dtype=int)
+    for start in range(0, len(block), CHUNK_SIZE):
+        part = slice(start, start + CHUNK_SIZE)
+        length = block[part]
+        if len(length) == 0 or length.max() <= 0:
+            continue
+
+        # middle of every minute of the leg and progress of the leg
+        minute = np.arange(length.max()) + 0.5
+        valid = minute[None, :] < length[:, None]
+        fraction = minute[None, :] / np.maximum(length, 1)[:, None]
+        time = (offblock[part][:, None] + minute[None, :]) % 1440
+
+        dawn = dawn_dep[part][:, None] + fraction * (
+            dawn_dest[part] - dawn_dep[part])[:, None]
+        dusk = dusk_dep[part][:, None] + fraction * (
+            dusk_dest[part] - dusk_dep[part])[:, None]
+
+        night = valid & is_night(time, dawn, dusk)
+        result[part] = night.sum(axis=1)
+    return result
+
+
+# flights of a date range with the values needed for night time
+NIGHT_QUERY = (
+    "select id, flightdate, departureId, destinationId, offblock, "
+    "landingTime, blockMinutes, nightMinutes, landingsDay, "
+    "landingsNight from flights "
+    "where flightdate >= ? and flightdate < ? "
+    "order by flightdate, offblock"
+)
+
+
+def compute_night(cn, cn_ap, start_date, end_date):
+    """Computes night time and night landings of all flights in the date
+    range. Returns a list of NightResult and the number of flights
+    skipped for unknown airports or missing times."""
+    rows = cn.execute(NIGHT_QUERY, (start_date, end_date)).fetchall()
+    if not rows:
+        return [], 0
+
+    dates = [row[1] for row in rows]
+    dawn_dep, dusk_dep = twilight(cn_ap, [row[2] for row in rows], dates)
+    dawn_dest, dusk_dest = twilight(cn_ap, [row[3] for row in rows], dates)
+
+    offblock = to_minutes([row[4] for row in rows])
+    landing = to_minutes([row[5] for row in rows])
+    block = np.array([row[6] for row in rows], dtype=float)
+    known = ~(np.isnan(dawn_dep) | np.isnan(dawn_dest) | np.isnan(offblock)
+              | np.isnan(landing) | np.isnan(block))
+
+    night = np.zeros(len(rows), dtype=int)
+    night[known] = night_minutes(
+        offblock[known], block[known].astype(int), dawn_dep[known],
+        dusk_dep[known], dawn_dest[known], dusk_dest[known]
+    )
+
+    # all landings count as night landings if the last one was at night
+    landing_at_night = is_night(landing, dawn_dest, dusk_dest)
+
+    results = []
+    for i, row in enumerate(rows):
+        if not known[i]:
+            continue
+        landings = int(row[8] or 0) + int(row[9] or 0)
+        results.append(NightResult(
+            row[0], row[1], row[2], row[3], int(row[7] or 0),
+            int(night[i]), int(row[9] or 0),
+            landings if landing_at_night[i] else 0, landings,
+        ))
+
+    return results, int((~known).sum())
+
+
+def apply_night(cn, results):
+    """Writes computed night time and landings to the flights table."""
+    values = []
+    for result in results:
+        hrs, mins = divmod(result.night_minutes, 60)
+        values.append((
+            f"{hrs:02d}:{mins:02d}" if result.night_minutes else "",
+            result.landings - result.night_landings,
+            result.night_landings,
+            result.flight_id,
+        ))
+    cn.executemany(
+        "update flights set flightTimeNight = ?, landingsDay = ?, "
+        "landingsNight = ? where id = ?",
+        values,
+    )
+    cn.commit()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Machine-readable output of commands and exit codes of the one-shot mode.
+
+Commands supporting it take --format table|csv|json, or --csv and
+--json for short. CSV and JSON give times in minutes and dates as
+yyyy-mm-dd and are written without styles.
+"""
+
+import csv
+import io
+import json
+
+FORMATS = ("table", "csv", "json")
+
+# fields of ls in csv and json format
+LS_FIELDS = [
+    "id", "flightdate", "type", "registration", "departureId",
+    "destinationId", "offblock", "onblock", "startTime", "landingTime",
+    "landingsDay", "landingsNight", "picName", "pilotFunction",
+    "flightTimeNight", "flightTimeIFR", "flightTimeClass", "studentName",
+    "guests", "remarks", "distanceNm",
+]
+
+# exit codes, the highest one of all commands run is returned
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_WARNING = 2
+EXIT_EXPIRED = 3
+
+
+def add_format_arguments(parser):
+    """Adds the options --format, --csv and --json to a parser."""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="table",
+        dest="format",
+        help="output format, times are given in minutes in csv and json",
+    )
+    group.add_argument(
+        "--csv", action="store_const", const="csv", dest="format",
+        help="same as --format csv"
+    )
+    group.add_argument(
+        "--json", action="store_const", const="json", dest="format",
+        help="same as --format json"
+    )
+
+
+def csv_text(header, rows):
+    """Returns a header and rows in csv format."""
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    if header is not None:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+def json_text(value):
+    """Returns a value in JSON format."""
+    return json.dumps(value, indent=2)
+
+
+def read_script(filename):
+    """Returns the commands of a script file, one per line. Empty lines
+    and lines starting with # are skipped."""
+    with open(filename, encoding="utf-8") as file:
+        return [
+            line.strip() for line in file
+            if line.strip() and not line.strip().startswith("#")
+        ]
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filters on the flights table shared by the commands ls, export and sum.
+
+Filter values are always passed as parameters, so the statement text
+only depends on which filters are given. sqlite3 keeps the compiled
+statements of a connection in a cache keyed by their text and reuses them
+on the next call with other values.
+
+Columns with a single value are compared with '=', which lets SQLite use
+the indexes on registration, pilotFunction and flightTimeClass. Only the
+free text columns holding lists of names or remarks are searched with
+LIKE.
+
+The option --where takes a filter expression (see filterexpr), which is
+compiled to an additional condition.
+
+Long listings are read in pages with keyset pagination: every page
+starts after the (flightdate, offblock, id) of the last flight of the
+previous page, which SQLite finds on the index flights_date_offblock.
+"""
+
+import argparse
+import datetime as dt
+
+from pyflightlog.filterexpr import compile_filter, escape_like
+
+# number of compiled statements kept per connection
+STATEMENT_CACHE_SIZE = 256
+
+# order of flights in listings, matching the keyset of a page cursor
+FLIGHT_ORDER = "flightdate asc, offblock asc, flights.id asc"
+KEYSET_CONDITION = "(flightdate, offblock, flights.id) > (?, ?, ?)"
+
+# flights per page of listings without a page size
+PAGE_SIZE = 500
+
+# (dest, option strings, column, operator, help)
+FLIGHT_FILTERS = (
+    ("apdep", ("-dep", "--departure"), "departureId", "=",
+     "filter airport of departure"),
+    ("apdest", ("-dest", "--destination"), "destinationId", "=",
+     "filter airport of destination"),
+    ("acft", ("-a", "--aircraft"), "registration", "=",
+     "filter aircraft registration"),
+    ("type", ("-t", "--type"), "type", "=", "filter aircraft type"),
+    ("aclass", ("-c", "--class"), "flightTimeClass", "=",
+     "filter aircraft class"),
+    ("pic", ("-p", "--pic"), "picName", "=", "filter PIC"),
+    ("pfct", ("-pf", "--pilot-function"), "pilotFunction", "=",
+     "filter pilot function, i.e. PIC, Dual"),
+    ("stud", ("-s", "--student"), "studentName", "like", "filter student"),
+    ("guests", ("-g", "--guests"), "guests", "like", "filter guests"),
+    ("rmk", ("-r", "--remarks"), "remarks", "like", "filter remarks"),
+)
+
+
+def add_filter_arguments(parser, airport_completer=None,
+                         registration_completer=None, name_completer=None):
+    """Adds the filter options of the flights table to an argument
+    parser."""
+    completers = {
+        "apdep": airport_completer,
+        "apdest": airport_completer,
+        "acft": registration_completer,
+        "pic": name_completer,
+        "stud": name_completer,
+        "guests": name_completer,
+    }
+    for dest, options, _, _, help_text in FLIGHT_FILTERS:
+        kwargs = {}
+        if completers.get(dest) is not None:
+            kwargs["completer"] = completers[dest]
+        parser.add_argument(*options, nargs=1, dest=dest, help=help_text,
+                            **kwargs)
+    parser.add_argument(
+        "-fi",
+        "--flight-instruction",
+        dest="fi",
+        action="store_true",
+        help="filter pilot function to FI",
+    )
+    parser.add_argument(
+        "-w",
+        "--where",
+        dest="where",
+        help="filter expression, e.g. "
+        "\"class in (SEP,TMG) and block > 1:30 and not dep=EDTM\"",
+    )
+
+
+def flight_conditions(args, start_date, end_date, after=None):
+    """Returns a where clause and its parameters for the date range and
+    the filter options in args. If a cursor (flightdate, offblock, id)
+    is given as after, only flights after it are selected. Raises
+    FilterError for an invalid filter expression."""
+    start = start_date.strftime("%Y-%m-%d")
+    end = end_date.strftime("%Y-%m-%d")
+
+    # the keyset replaces the start date, so that it is the only lower
+    # bound and SQLite seeks to it on the index
+    if after is not None and after[0] >= start:
+        conditions = [KEYSET_CONDITION, "flightdate < ?"]
+        params = list(after) + [end]
+    else:
+        conditions = ["flightdate >= ?", "flightdate < ?"]
+        params = [start, end]
+
+    for dest, _, column, operator, _ in FLIGHT_FILTERS:
+        value = getattr(args, dest, None)
+        if not value:
+            continue
+        if operator == "like":
+            conditions.append(f"{column} like ? escape '\\'")
+            params.append(f"%{escape_like(value[0])}%")
+        else:
+            conditions.append(f"{column} = ?")
+            params.append(value[0])
+    if getattr(args, "fi", False):
+        conditions.append("pilotFunction = 'FI'")
+    if getattr(args, "where", None):
+        expression, expression_params = compile_filter(args.where)
+        conditions.append(f"({expression})")
+        params.extend(expression_params)
+
+    return "where " + " and ".join(conditions), params
+
+
+def filter_values(args):
+    """Returns only the filter options of args, e.g. to pass them to
+    another process."""
+    dests = [dest for dest, _, _, _, _ in FLIGHT_FILTERS] + ["fi", "where"]
+    return argparse.Namespace(
+        **{dest: getattr(args, dest, None) for dest in dests}
+    )
+
+
+def format_cursor(flightdate, offblock, flight_id):
+    """Returns the cursor of a page ending with the given flight."""
+    return f"{flightdate},{offblock},{flight_id}"
+
+
+def parse_cursor(text):
+    """Returns the (flightdate, offblock, id) of a cursor. Raises
+    ValueError for invalid cursors."""
+    parts = text.split(",")
+    if len(parts) != 3:
+        raise ValueError(f"invalid cursor: {text}")
+    flightdate, offblock, flight_id = parts
+    dt.date.fromisoformat(flightdate)
+    return flightdate, offblock, int(flight_id)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reports of times and landings grouped by one or more keys, e.g. per
+month and aircraft, computed in a single GROUP BY query.
+"""
+
+import argparse
+from collections import namedtuple
+
+from pyflightlog.output import csv_text, json_text
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+# group name -> SQL expression of the key
+GROUPS = {
+    "year": "substr(flightdate, 1, 4)",
+    "month": "substr(flightdate, 1, 7)",
+    "weekday": "(cast(strftime('%w', flightdate) as integer) + 6) % 7",
+    # offblock times may have single digit hours
+    "hour": "cast(substr(offblock, 1, nullif(instr(offblock, ':'), 0) - 1) "
+            "as integer)",
+    "registration": "registration",
+    "type": "type",
+    "class": "flightTimeClass",
+    "dep": "departureId",
+    "dest": "destinationId",
+    "pilotFunction": "pilotFunction",
+}
+
+ReportTotals = namedtuple(
+    "ReportTotals",
+    ["flights", "blockMinutes", "airMinutes", "nightMinutes", "ifrMinutes",
+     "landingsDay", "landingsNight"],
+)
+
+
+def parse_groups(value):
+    """Returns the list of groups of a comma separated argument."""
+    groups = [group.strip() for group in value.split(",") if group.strip()]
+    for group in groups:
+        if group not in GROUPS:
+            raise argparse.ArgumentTypeError(
+                f"invalid group: {group} (choose from "
+                + ", ".join(GROUPS) + ")"
+            )
+    if not groups:
+        raise argparse.ArgumentTypeError("no group given")
+    return groups
+
+
+def key_label(group, value):
+    """Returns the displayed value of a group key."""
+    if group == "weekday" and value is not None:
+        return WEEKDAYS[int(value)]
+    if group == "hour" and value is not None:
+        return f"{int(value):02d}"
+    return "" if value is None else str(value)
+
+
+def group_report_query(groups, conditions):
+    """Returns the statement of group_report."""
+    keys = [f"{GROUPS[group]} as g{i}" for i, group in enumerate(groups)]
+    order = ", ".join(f"g{i}" for i in range(len(groups)))
+    return (
+        "select " + ", ".join(keys) + ", count(*), "
+        "coalesce(sum(blockMinutes), 0), "
+        "coalesce(sum(airMinutes), 0), "
+        "coalesce(sum(nightMinutes), 0), "
+        "coalesce(sum(ifrMinutes), 0), "
+        "coalesce(sum(landingsDay), 0), "
+        "coalesce(sum(landingsNight), 0) from flights "
+        + conditions
+        + f" group by {order} order by {order}"
+    )
+
+
+def group_report(cn, groups, conditions, params):
+    """Returns a list of (keys, ReportTotals) for all combinations of the
+    group keys of the flights matching conditions, sorted by keys."""
+    cur = cn.execute(group_report_query(groups, conditions), params)
+
+    size = len(groups)
+    return [
+        (tuple(key_label(group, value)
+               for group, value in zip(groups, row[:size])),
+         ReportTotals(*(int(value) for value in row[size:])))
+        for row in cur
+    ]
+
+
+def report_total(rows):
+    """Returns the sum of the totals of all rows."""
+    total = [0] * len(ReportTotals._fields)
+    for _, totals in rows:
+        total = [a + b for a, b in zip(total, totals)]
+    return ReportTotals(*total)
+
+
+def to_csv(groups, rows):
+    """Returns report rows in csv format, times in minutes."""
+    return csv_text(
+        list(groups) + list(ReportTotals._fields),
+        [list(keys) + list(totals) for keys, totals in rows],
+    )
+
+
+def to_json(groups, rows):
+    """Returns report rows as a JSON array of objects, times in
+    minutes."""
+    return json_text(
+        [dict(zip(groups, keys), **totals._asdict()) for keys, totals in rows]
+    )
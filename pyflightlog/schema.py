@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Versioned schema migrations for the logbook and the airport database.
+
+The schema version of a database file is kept in ``PRAGMA user_version``.
+Each migration is a tuple (version, description, steps), where steps is a
+list of SQL statements or callables taking a cursor. Pending migrations are
+applied in ascending order, every migration in its own transaction together
+with the bump of the version number.
+"""
+
+FLIGHTS_INDEXES = [
+    "create index if not exists flights_date_offblock "
+    "on flights (flightdate, offblock)",
+    "create index if not exists flights_function_date "
+    "on flights (pilotFunction, flightdate)",
+    "create index if not exists flights_class_date "
+    "on flights (flightTimeClass, flightdate)",
+    "create index if not exists flights_registration "
+    "on flights (registration)",
+]
+
+
+def _minutes(column):
+    """SQL expression converting a "HH:MM" column to minutes.
+    Empty strings evaluate to 0."""
+    return (
+        f"(cast(substr({column}, 1, instr({column}, ':') - 1) as integer)"
+        f" * 60 + cast(substr({column}, instr({column}, ':') + 1) "
+        "as integer))"
+    )
+
+
+def _duration(start, end):
+    """SQL expression of the minutes from a "HH:MM" column start to a
+    "HH:MM" column end. Times past midnight wrap around, a missing time
+    makes the duration 0."""
+    return (
+        f"(case when coalesce({start}, '') = '' "
+        f"or coalesce({end}, '') = '' then 0 "
+        f"else ({_minutes(end)} - {_minutes(start)} + 1440) % 1440 end)"
+    )
+
+
+FLIGHTS_COLUMNS = (
+    "id, flightdate, type, registration, departureId, destinationId, "
+    "offblock, onblock, startTime, landingTime, landingsDay, "
+    "landingsNight, picName, pilotFunction, flightTimeNight, "
+    "flightTimeIFR, flightTimeClass, studentName, guests, remarks, "
+    "internalMarkers"
+)
+
+
+def _add_minute_columns(cur):
+    """Rebuilds the flights table with stored generated columns holding
+    block, air, night and IFR time in minutes. Stored generated columns
+    cannot be added by ALTER TABLE, hence the copy. Indexes and triggers
+    of the old table are created again."""
+    # landings are counted, not typed in: empty strings become 0
+    cur.execute("update flights set landingsDay = 0 "
+                "where landingsDay = '' or landingsDay is null")
+    cur.execute("update flights set landingsNight = 0 "
+                "where landingsNight = '' or landingsNight is null")
+
+    cur.execute(
+        "create table flights_new (id integer primary key, "
+        "flightdate string, type string, "
+        "registration string, departureId string, destinationId string,"
+        "offblock string, onblock string, "
+        "startTime string, landingTime string,"
+        "landingsDay integer, landingsNight integer, "
+        "picName string, pilotFunction string,"
+        "flightTimeNight integer, flightTimeIFR integer, "
+        "flightTimeClass string, studentName string, "
+        "guests string, remarks string, internalMarkers string, "
+        "blockMinutes integer generated always as "
+        f"({_duration('offblock', 'onblock')}) stored, "
+        "airMinutes integer generated always as "
+        f"({_duration('startTime', 'landingTime')}) stored, "
+        "nightMinutes integer generated always as "
+        f"(coalesce({_minutes('flightTimeNight')}, 0)) stored, "
+        "ifrMinutes integer generated always as "
+        f"(coalesce({_minutes('flightTimeIFR')}, 0)) stored)"
+    )
+    cur.execute(f"insert into flights_new ({FLIGHTS_COLUMNS}) "
+                f"select {FLIGHTS_COLUMNS} from flights")
+    triggers = [row[0] for row in cur.execute(
+        "select sql from sqlite_master "
+        "where type = 'trigger' and tbl_name = 'flights'"
+    )]
+    cur.execute("drop table flights")
+    cur.execute("alter table flights_new rename to flights")
+
+    # indexes and triggers are dropped together with the old table
+    for statement in FLIGHTS_INDEXES + triggers:
+        cur.execute(statement)
+
+
+FLIGHTS_MIGRATIONS = [
+    (
+        1,
+        "indexes on flights matching the access paths of the commands",
+        FLIGHTS_INDEXES,
+    ),
+    (
+        2,
+        "durations as integer minutes in generated columns",
+        [_add_minute_columns],
+    ),
+    (
+        3,
+        "cache of great circle distances per flight",
+        [
+            "create table flightDistances (flightId integer primary key, "
+            "airportsVersion integer, distanceNm real)",
+            # changed or deleted flights drop out of the cache
+            "create trigger flights_distance_update "
+            "after update of departureId, destinationId on flights "
+            "begin delete from flightDistances where flightId = old.id; end",
+            "create trigger flights_distance_delete after delete on flights "
+            "begin delete from flightDistances where flightId = old.id; end",
+        ],
+    ),
+    (
+        4,
+        "version of the logbook data and cache of the dashboard",
+        [
+            # single row looked up by rowid, cheap enough for bulk imports
+            "create table dataVersion (id integer primary key, "
+            "version integer)",
+            "insert into dataVersion values (1, 0)",
+            # every change of flights or ratings counts up the version
+            "create trigger flights_version_insert after insert on flights "
+            "begin update dataVersion set version = version + 1 "
+            "where id = 1; end",
+            "create trigger flights_version_update after update on flights "
+            "begin update dataVersion set version = version + 1 "
+            "where id = 1; end",
+            "create trigger flights_version_delete after delete on flights "
+            "begin update dataVersion set version = version + 1 "
+            "where id = 1; end",
+            "create trigger ratings_version_insert after insert on ratings "
+            "begin update dataVersion set version = version + 1 "
+            "where id = 1; end",
+            "create trigger ratings_version_update after update on ratings "
+            "begin update dataVersion set version = version + 1 "
+            "where id = 1; end",
+            "create trigger ratings_version_delete after delete on ratings "
+            "begin update dataVersion set version = version + 1 "
+            "where id = 1; end",
+            "create table dashboardCache (command string primary key, "
+            "dataVersion integer, evaluationDate string, output string)",
+        ],
+    ),
+    (
+        5,
+        "durations of flights with a missing time as 0",
+        [
+            _add_minute_columns,
+            # cached dashboards show the old durations
+            "update dataVersion set version = version + 1 where id = 1",
+        ],
+    ),
+]
+
+# columns of the airports from the csv file keyed on their identifier,
+# used for the staging table of a refresh; identifiers are text, as
+# string has numeric affinity and would store identifiers like 0001 as
+# integers
+AIRPORTS_COLUMNS = (
+    "(icaoId text primary key, name string, lat real, "
+    "long real, elev real, municipality string, rowHash integer)"
+)
+
+# current definition of the airports table; the full-text and spatial
+# indexes refer to the integer id, which VACUUM keeps unlike an implicit
+# rowid
+AIRPORTS_TABLE = (
+    "(id integer primary key, icaoId text not null unique, name string, "
+    "lat real, long real, elev real, municipality string, rowHash integer)"
+)
+
+# tables of the runways and radio frequencies of the airports, keyed on
+# the ids of OurAirports and indexed on the identifier of the airport;
+# runway designators are text to keep leading zeros like in 09
+RUNWAYS_COLUMNS = (
+    "(id integer primary key, airportIdent text, lengthFt integer, "
+    "widthFt integer, surface string, lighted integer, closed integer, "
+    "leIdent text, leHeading real, heIdent text, heHeading real, "
+    "rowHash integer)"
+)
+FREQUENCIES_COLUMNS = (
+    "(id integer primary key, airportIdent text, type string, "
+    "description string, frequencyMhz real, rowHash integer)"
+)
+
+
+def _type_airport_columns(cur):
+    """Rebuilds the airports table with numeric coordinates and
+    elevation and fills the spatial index."""
+    cur.execute(
+        "create table airports_typed (icaoId text primary key, "
+        "name string, lat real, long real, elev real, municipality string)"
+    )
+    cur.execute(
+        "insert into airports_typed select icaoId, name, "
+        "cast(nullif(lat, '') as real), cast(nullif(long, '') as real), "
+        "cast(nullif(elev, '') as real), municipality from airports"
+    )
+    cur.execute("drop table airports")
+    cur.execute("alter table airports_typed rename to airports")
+    cur.execute("create index airports_name on airports (name)")
+    cur.execute("insert into airports_fts(airports_fts) values ('rebuild')")
+    cur.execute(
+        "create virtual table airports_rtree using rtree("
+        "id, minLat, maxLat, minLon, maxLon)"
+    )
+    cur.execute(
+        "insert into airports_rtree select rowid, lat, lat, long, long "
+        "from airports where lat is not null and long is not null"
+    )
+
+
+def _text_airport_idents(cur):
+    """Rebuilds the airports, runways and frequencies tables with text
+    identifiers. The rowids stay the same, so the spatial index remains
+    valid. Identifiers with leading zeros were stored as integers, so
+    the download state is reset and the next refresh imports all files
+    again, which restores them."""
+    tables = [
+        ("airports", AIRPORTS_COLUMNS, "icaoId",
+         "rowid, icaoId, name, lat, long, elev, municipality, rowHash",
+         "create index airports_name on airports (name)"),
+        ("runways", RUNWAYS_COLUMNS, "airportIdent",
+         "id, airportIdent, lengthFt, widthFt, surface, lighted, closed, "
+         "leIdent, leHeading, heIdent, heHeading, rowHash",
+         "create index runways_airport on runways (airportIdent)"),
+        ("frequencies", FREQUENCIES_COLUMNS, "airportIdent",
+         "id, airportIdent, type, description, frequencyMhz, rowHash",
+         "create index frequencies_airport on frequencies (airportIdent)"),
+    ]
+    for table, columns, ident, names, index in tables:
+        values = names.replace(ident, f"cast({ident} as text)", 1)
+        cur.execute(f"create table {table}_text {columns}")
+        cur.execute(f"insert into {table}_text ({names}) "
+                    f"select {values} from {table}")
+        cur.execute(f"drop table {table}")
+        cur.execute(f"alter table {table}_text rename to {table}")
+        cur.execute(index)
+    cur.execute("insert into airports_fts(airports_fts) values ('rebuild')")
+    cur.execute("delete from airportsMeta where key != 'version'")
+
+
+def _integer_airport_ids(cur):
+    """Rebuilds the airports table with an integer primary key holding
+    the former rowids and the full-text index on it."""
+    names = "icaoId, name, lat, long, elev, municipality, rowHash"
+    cur.execute(f"create table airports_ids {AIRPORTS_TABLE}")
+    cur.execute(f"insert into airports_ids (id, {names}) "
+                f"select rowid, {names} from airports")
+    cur.execute("drop table airports")
+    cur.execute("alter table airports_ids rename to airports")
+    cur.execute("create index airports_name on airports (name)")
+    cur.execute("drop table airports_fts")
+    cur.execute(
+        "create virtual table airports_fts using fts5("
+        "icaoId, name, municipality, content='airports', "
+        "content_rowid='id', prefix='2 3')"
+    )
+    cur.execute("insert into airports_fts(airports_fts) values ('rebuild')")
+
+
+AIRPORTS_MIGRATIONS = [
+    (
+        1,
+        "index on airport names",
+        ["create index if not exists airports_name on airports (name)"],
+    ),
+    (
+        2,
+        "municipality and full-text index for the airport search",
+        [
+            "alter table airports add column municipality string",
+            # external content table, tokens of the airports rows
+            "create virtual table airports_fts using fts5("
+            "icaoId, name, municipality, content='airports', "
+            "content_rowid='rowid', prefix='2 3')",
+            "insert into airports_fts(airports_fts) values ('rebuild')",
+        ],
+    ),
+    (
+        3,
+        "typed coordinates and R*Tree index on airport positions",
+        [_type_airport_columns],
+    ),
+    (
+        4,
+        "version of the airport data",
+        [
+            "create table airportsMeta (key string primary key, "
+            "value string)",
+            "insert into airportsMeta values ('version', 1)",
+        ],
+    ),
+    (
+        5,
+        "row hashes for incremental airport refreshes",
+        [
+            # rows without hash are updated once by the next refresh
+            "alter table airports add column rowHash integer",
+        ],
+    ),
+    (
+        6,
+        "runways and radio frequencies of the airports",
+        [
+            f"create table runways {RUNWAYS_COLUMNS}",
+            "create index runways_airport on runways (airportIdent)",
+            f"create table frequencies {FREQUENCIES_COLUMNS}",
+            "create index frequencies_airport on frequencies (airportIdent)",
+        ],
+    ),
+    (
+        7,
+        "text identifiers of airports",
+        [_text_airport_idents],
+    ),
+    (
+        8,
+        "integer ids of airports for the full-text index",
+        [_integer_airport_ids],
+    ),
+    (
+        9,
+        "spatial index on the integer ids of airports",
+        [
+            # entries may refer to rowids renumbered by an earlier VACUUM
+            "delete from airports_rtree",
+            "insert into airports_rtree select id, lat, lat, long, long "
+            "from airports where lat is not null and long is not null",
+        ],
+    ),
+]
+
+
+def schema_version(cn):
+    """Returns the schema version stored in the database."""
+    return cn.execute("pragma user_version").fetchone()[0]
+
+
+def latest_version(migrations):
+    """Returns the schema version after all migrations."""
+    return max(version for version, _, _ in migrations)
+
+
+def migrate(cn, migrations):
+    """Applies all pending migrations. Returns the list of applied
+    versions."""
+    applied = []
+    current = schema_version(cn)
+
+    # finish any transaction left open by the caller
+    cn.commit()
+
+    for version, description, steps in sorted(migrations,
+                                              key=lambda m: m[0]):
+        if version <= current:
+            continue
+
+        cur = cn.cursor()
+        try:
+            cur.execute("begin")
+            for step in steps:
+                if callable(step):
+                    step(cur)
+                else:
+                    cur.execute(step)
+            # pragma arguments cannot be bound as parameters
+            cur.execute(f"pragma user_version = {int(version)}")
+            cur.execute("commit")
+        except Exception as err:
+            cn.rollback()
+            raise RuntimeError(
+                f"Migration to schema version {version} "
+                f"({description}) failed."
+            ) from err
+
+        current = version
+        applied.append(version)
+
+    return applied
+
+
+def explain_query_plan(cn, query, params=()):
+    """Returns the lines of EXPLAIN QUERY PLAN for the given query."""
+    cur = cn.execute("explain query plan " + query, params)
+    return [row[3] for row in cur]
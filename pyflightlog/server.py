@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local HTTP server answering GET requests with the results of ls, sum,
+stat and check and with airport searches as JSON, e.g.
+
+    /sum?start=2023-01-01&end=2024-01-01&where=class=SEP
+    /ls?start=2023-01-01&limit=100&after=2023-03-01,10:00,1234
+    /stat
+    /check?date=2024-05-01
+    /airports?q=mannheim&limit=10
+
+Dates are given as yyyy-mm-dd, end dates are exclusive and default to
+tomorrow. where takes a filter expression (see filterexpr), after the
+cursor returned as next by the previous page of ls.
+
+The queries run in a thread pool on the reader connections of the
+logbook and the airport database; requests never write. The distances
+of the flights are computed by the changes of flights and airports and
+count up the data version of the logbook. Responses are cached until
+the data version of the logbook, the airport database or the date
+changes; concurrent requests for the same response wait for a single
+query.
+"""
+
+import asyncio
+import concurrent.futures
+import datetime as dt
+import json
+import urllib.parse
+
+from pyflightlog import filterexpr
+from pyflightlog import output
+from pyflightlog import query
+from pyflightlog import stats
+
+HOST = "127.0.0.1"
+PORT = 8400
+
+# cached responses, the cache is cleared when it grows beyond this
+CACHE_SIZE = 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class RequestError(ValueError):
+    """Raised for invalid request parameters."""
+
+
+def date_param(params, name, default=None):
+    """Returns a yyyy-mm-dd parameter as date."""
+    value = params.get(name)
+    if value is None:
+        if default is None:
+            raise RequestError(f"missing parameter: {name}")
+        return default
+    try:
+        return dt.date.fromisoformat(value)
+    except ValueError:
+        raise RequestError(f"invalid date: {name}={value}") from None
+
+
+def int_param(params, name, default, maximum):
+    """Returns a positive number parameter up to maximum."""
+    value = params.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise RequestError(f"invalid number: {name}={value}") from None
+    if not 0 < number <= maximum:
+        raise RequestError(f"{name} must be between 1 and {maximum}")
+    return number
+
+
+def date_range(params):
+    """Returns the start and end date of a request."""
+    tomorrow = dt.date.today() + dt.timedelta(days=1)
+    return date_param(params, "start"), date_param(params, "end", tomorrow)
+
+
+class Server:
+    """JSON API over a FlightLog and its AirportDB."""
+
+    def __init__(self, flightlog, workers=None):
+        self.log = flightlog
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            workers or max(flightlog.pool.max_readers, 1)
+        )
+        # key -> future of the response body
+        self.cache = {}
+        self.routes = {
+            "/ls": (self.flights, True),
+            "/sum": (self.totals, True),
+            "/stat": (self.stat, True),
+            "/check": (self.check, True),
+            "/airports": (self.airports, False),
+        }
+
+    def flights(self, params):
+        start_date, end_date = date_range(params)
+        limit = int_param(params, "limit", query.PAGE_SIZE, query.PAGE_SIZE)
+        after = params.get("after")
+        if after:
+            try:
+                after = query.parse_cursor(after)
+            except ValueError:
+                raise RequestError(f"invalid cursor: {after}") from None
+        else:
+            after = None
+
+        # one more row than needed tells whether there is another page
+        rows = list(self.log.flights(start_date, end_date,
+                                     params.get("where"), after, limit + 1))
+        cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            cursor = query.format_cursor(last["flightdate"],
+                                         last["offblock"], last["id"])
+        return {
+            "flights": [{field: row[field] for field in output.LS_FIELDS}
+                        for row in rows],
+            "next": cursor,
+        }
+
+    def totals(self, params):
+        start_date, end_date = date_range(params)
+        totals = self.log.totals(start_date, end_date, params.get("where"))
+        return dict(totals._asdict(), distanceNm=round(totals.distanceNm, 1))
+
+    def stat(self, params):
+        matrix = self.log.currency_matrix(dt.date.today())
+        return [
+            {"group": group, "window": window,
+             "landings": totals.landings, "minutes": totals.minutes}
+            for group in stats.GROUPS
+            for window, totals in matrix[group].items()
+        ]
+
+    def check(self, params):
+        date = date_param(params, "date", dt.date.today())
+        return [
+            {"title": result.title, "status": result.status,
+             "expirationDate": None if result.expiration is None
+             else result.expiration.strftime("%Y-%m-%d")}
+            for result in self.log.check(date)
+        ]
+
+    def airports(self, params):
+        if not params.get("q"):
+            raise RequestError("missing parameter: q")
+        limit = int_param(params, "limit", 25, 500)
+        ids_only = params.get("ids", "").lower() in ("1", "true", "yes")
+        return [
+            {"icaoId": row["icaoId"], "name": row["name"],
+             "municipality": row["municipality"]}
+            for row in self.log.airports.search(params["q"], ids_only, limit)
+        ]
+
+    def run_handler(self, handler, params):
+        """Runs a handler in a worker thread and returns the status and
+        the JSON body."""
+        try:
+            value = handler(params)
+        except (RequestError, filterexpr.FilterError) as err:
+            return 400, json.dumps({"error": str(err)}).encode()
+        return 200, json.dumps(value).encode()
+
+    def data_version(self, logbook_data):
+        if logbook_data:
+            return self.log.data_version(), self.log.airports.version()
+        return self.log.airports.version()
+
+    async def response(self, path, params):
+        """Returns the status and the body of the response to a GET
+        request, from the cache if possible."""
+        if path not in self.routes:
+            return 404, json.dumps({"error": f"unknown path: {path}"}
+                                   ).encode()
+        handler, logbook_data = self.routes[path]
+
+        loop = asyncio.get_running_loop()
+        version = await loop.run_in_executor(self.executor,
+                                             self.data_version, logbook_data)
+        key = (path, tuple(sorted(params.items())), logbook_data, version,
+               dt.date.today())
+        future = self.cache.get(key)
+        if future is None:
+            if len(self.cache) >= CACHE_SIZE:
+                self.cache.clear()
+            future = loop.run_in_executor(self.executor, self.run_handler,
+                                          handler, params)
+            self.cache[key] = future
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            # errors are not cached
+            self.cache.pop(key, None)
+            raise
+
+    async def handle_client(self, reader, writer):
+        """Answers the requests of a connection until it is closed."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode("latin-1").split()
+                keep_alive = (
+                    len(parts) == 3 and parts[2] == "HTTP/1.1"
+                    and headers.get("connection", "").lower() != "close"
+                )
+                if len(parts) != 3:
+                    status, body = 400, b'{"error": "invalid request"}'
+                elif parts[0] != "GET":
+                    status, body = 405, b'{"error": "only GET is allowed"}'
+                else:
+                    url = urllib.parse.urlsplit(parts[1])
+                    params = dict(urllib.parse.parse_qsl(url.query))
+                    try:
+                        status, body = await self.response(url.path, params)
+                    except Exception as err:
+                        status = 500
+                        body = json.dumps({"error": str(err)}).encode()
+
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}"
+                    "\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT, ready=None):
+        """Serves requests until cancelled. ready is called with the
+        listening socket addresses."""
+        server = await asyncio.start_server(self.handle_client, host, port,
+                                            backlog=1024)
+        if ready is not None:
+            ready([sock.getsockname() for sock in server.sockets])
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Currency statistics: landings and block time per time window and
+pilot function, computed in a single pass over the flights table.
+"""
+
+import datetime as dt
+from collections import namedtuple
+
+from dateutil.relativedelta import relativedelta
+
+# time windows, all of them end today (inclusive)
+WINDOWS = ("90d", "6m", "ytd", "12m")
+
+# groups of pilot functions
+GROUPS = ("PIC", "FI", "PIC+FI", "Dual", "All")
+
+Totals = namedtuple("Totals", ["landings", "minutes"])
+
+
+def window_starts(today):
+    """Returns a dict with the first day of every window."""
+    return {
+        "90d": today + relativedelta(days=-90),
+        "6m": today + relativedelta(months=-6),
+        "ytd": today.replace(month=1, day=1),
+        "12m": today + relativedelta(years=-1),
+    }
+
+
+def currency_matrix_query(today):
+    """Returns the statement and parameters of currency_matrix."""
+    starts = {
+        window: start.strftime("%Y-%m-%d")
+        for window, start in window_starts(today).items()
+    }
+
+    # one conditional sum per window, grouped by pilot function
+    columns = []
+    params = []
+    for window in WINDOWS:
+        columns.append(
+            "coalesce(sum(case when flightdate >= ? "
+            "then landingsDay+landingsNight end), 0)"
+        )
+        columns.append(
+            "coalesce(sum(case when flightdate >= ? "
+            "then blockMinutes end), 0)"
+        )
+        params += [starts[window], starts[window]]
+
+    return (
+        "select pilotFunction, " + ", ".join(columns) + " from flights "
+        "where flightdate >= ? and flightdate <= ? group by pilotFunction",
+        params + [min(starts.values()), today.strftime("%Y-%m-%d")],
+    )
+
+
+def currency_matrix(cn, today=None):
+    """Returns landings and block minutes as a nested dict
+    matrix[group][window] -> Totals for all groups and windows."""
+    if today is None:
+        today = dt.date.today()
+
+    cur = cn.execute(*currency_matrix_query(today))
+
+    matrix = {
+        group: {window: Totals(0, 0) for window in WINDOWS}
+        for group in GROUPS
+    }
+
+    for row in cur:
+        function = row[0]
+        groups = ["All"]
+        if function in ("PIC", "FI", "Dual"):
+            groups.append(function)
+        if function in ("PIC", "FI"):
+            groups.append("PIC+FI")
+
+        for i, window in enumerate(WINDOWS):
+            landings = int(row[1 + 2 * i])
+            minutes = int(row[2 + 2 * i])
+            for group in groups:
+                totals = matrix[group][window]
+                matrix[group][window] = Totals(
+                    totals.landings + landings, totals.minutes + minutes
+                )
+
+    return matrix
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fixtures shared by the tests.
+"""
+
+import http.server
+import threading
+
+import pytest
+
+from pyflightlog import logbook
+
+
+@pytest.fixture
+def serve():
+    """Returns a function that starts a local HTTP server with a request
+    handler class and returns its URL. The servers are stopped after the
+    test."""
+    servers = []
+
+    def start(handler):
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def airport_db(tmp_path):
+    """Returns an empty AirportDB in a temporary directory."""
+    with logbook.AirportDB(str(tmp_path / "airports.db")) as db:
+        yield db
+
+
+@pytest.fixture
+def flight_log(tmp_path, airport_db):
+    """Returns an empty FlightLog in a temporary directory."""
+    with logbook.FlightLog(str(tmp_path / "logbook.db"), airport_db) as log:
+        yield log
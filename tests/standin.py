@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stand-in for the OurAirports.com download of airports.csv, shared by the
+tests and benchmarks/download.py.
+
+The server sends the file with ETag and Last-Modified and answers
+conditional requests with 304 and range requests with 206, or 416 if
+the range starts beyond the end of the file.
+"""
+
+import email.utils
+import http.server
+
+HEADER = ("id,ident,type,name,latitude_deg,longitude_deg,elevation_ft,"
+          "continent,iso_country,iso_region,municipality\n")
+
+
+def airports_csv(numbers, renamed=()):
+    """Returns an airports.csv with an airport for each of the numbers,
+    the ones in renamed with another name."""
+    lines = [HEADER]
+    for i in numbers:
+        name = f"Airfield {i}" + (" Nord" if i in renamed else "")
+        lines.append(f"{i},X{i:06d},small_airport,{name},"
+                     f"{i % 180 - 90}.5,{i % 360 - 180}.25,{i % 3000},EU,DE,"
+                     f"DE-BW,Town {i}\n")
+    return "".join(lines).encode()
+
+
+class StandIn:
+    """State of the stand-in server: the file, its validators, the
+    headers of the requests and the statuses and bytes sent."""
+
+    def __init__(self, body):
+        self.set_file(body, 1)
+        self.reset()
+        # bytes of the body sent before the connection is dropped
+        self.cut_after = None
+
+    def set_file(self, body, etag):
+        self.body = body
+        self.etag = f'"{etag}"'
+        self.last_modified = email.utils.formatdate(usegmt=True)
+
+    def reset(self):
+        """Forgets the requests and responses so far."""
+        self.requests = []
+        self.statuses = []
+        self.sent = 0
+
+
+def make_handler(state):
+    """Returns a request handler class serving the file of a StandIn."""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def send(self, status, body=b"", headers=()):
+            state.statuses.append(status)
+            self.send_response(status)
+            self.send_header("ETag", state.etag)
+            self.send_header("Last-Modified", state.last_modified)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if state.cut_after is not None:
+                body = body[:state.cut_after]
+                state.cut_after = None
+                self.close_connection = True
+            self.wfile.write(body)
+            state.sent += len(body)
+
+        def do_GET(self):
+            state.requests.append(dict(self.headers))
+            if self.headers.get("If-None-Match") == state.etag:
+                self.send(304)
+                return
+            byte_range = self.headers.get("Range")
+            if_range = self.headers.get("If-Range")
+            if byte_range and if_range in (state.etag, state.last_modified):
+                start = int(byte_range.split("=")[1].rstrip("-"))
+                if start >= len(state.body):
+                    self.send(416)
+                    return
+                self.send(206, state.body[start:], [(
+                    "Content-Range",
+                    f"bytes {start}-{len(state.body) - 1}/{len(state.body)}",
+                )])
+                return
+            self.send(200, state.body)
+
+    return Handler
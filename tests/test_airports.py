@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the streaming refresh of the airports from a local stand-in of
+OurAirports.com serving tests/fixtures/airports.csv.
+"""
+
+import csv
+import functools
+import http.server
+import io
+import os
+import shutil
+import sqlite3
+import time
+
+import pytest
+
+from pyflightlog import airports
+from pyflightlog import schema
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "fixtures")
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def www(tmp_path, serve):
+    """Returns the directory served by a local HTTP server with a copy of
+    the fixture airports.csv and the URL of the file."""
+    directory = tmp_path / "www"
+    directory.mkdir()
+    shutil.copy(os.path.join(FIXTURES, "airports.csv"), directory)
+    url = serve(functools.partial(QuietHandler, directory=str(directory)))
+    return directory, url + "/airports.csv"
+
+
+def airport_rows(cn):
+    return [tuple(row) for row in cn.execute(
+        "select icaoId, name, lat, long, elev, municipality from airports "
+        "order by icaoId"
+    )]
+
+
+def fts_match(cn, query):
+    return sorted(row[0] for row in cn.execute(
+        "select icaoId from airports_fts where airports_fts match ?",
+        (query,),
+    ))
+
+
+def rtree_idents(cn):
+    return sorted(row[0] for row in cn.execute(
+        "select icaoId from airports_rtree r "
+        "join airports a on a.id = r.id"
+    ))
+
+
+def check_indexes(cn):
+    cn.execute("insert into airports_fts(airports_fts) "
+               "values ('integrity-check')")
+    assert cn.execute("pragma integrity_check").fetchone()[0] == "ok"
+
+
+def test_refresh(airport_db, www):
+    _, url = www
+    cn = airport_db.con
+    version = airport_db.version()
+    changes = airports.refresh_datasets(cn, airport_db.filename,
+                                        {"airports": url}, batch_size=2)
+
+    assert changes == {"airports": airports.Changes(6, 0, 0, 0)}
+    assert airport_rows(cn) == [
+        ("0012", 'Roanoke Strip, "Old Field"', None, None, 450.0,
+         "Roanoke"),
+        ("12", "Saint Joseph's Hospital Heliport", 34.0, -84.0, 1050.0,
+         "Atlanta"),
+        ("EDDF", "Frankfurt am Main Airport", 50.036249, 8.559294, 364.0,
+         "Frankfurt am Main"),
+        ("EDFE", "Frankfurt-Egelsbach Airport", 49.959999, 8.645833, 384.0,
+         "Egelsbach"),
+        ("EDFM", "Mannheim-City Airport", 49.473057, 8.514167, 308.0,
+         "Mannheim"),
+        ("EDRY", "Speyer/Ludwigshafen Airport", 49.304722, 8.451389, 312.0,
+         "Speyer"),
+    ]
+    assert airport_db.version() == version + 1
+    assert not os.path.exists(airports.part_file_name(airport_db.filename))
+
+    # identifiers are text, also the ones that look like numbers
+    assert cn.execute("select count(*) from airports "
+                      "where typeof(icaoId) != 'text'").fetchone()[0] == 0
+    check_indexes(cn)
+    assert fts_match(cn, "frankfurt") == ["EDDF", "EDFE"]
+    assert fts_match(cn, "mannh*") == ["EDFM"]
+    # airports without a position aren't in the spatial index
+    assert rtree_idents(cn) == ["12", "EDDF", "EDFE", "EDFM", "EDRY"]
+    assert [row["icaoId"] for row in airport_db.search("12")] == ["12"]
+    assert airport_db.nearest(49.47, 8.51)[0][1] == "EDFM"
+
+
+def test_refresh_changes(airport_db, www):
+    directory, url = www
+    cn = airport_db.con
+    airports.refresh_datasets(cn, airport_db.filename, {"airports": url})
+    ids = dict(cn.execute("select icaoId, id from airports"))
+    version = airport_db.version()
+
+    # EDFE removed, EDFM renamed and moved, EDFZ added
+    with open(directory / "airports.csv", encoding="utf-8") as f:
+        lines = [line for line in f if '"EDFE"' not in line]
+    lines = [line.replace("Mannheim-City Airport", "City Airport Mannheim")
+                 .replace("49.473057", "49.5") for line in lines]
+    lines.append('2240,"EDFZ","small_airport","Mainz-Finthen Airport",'
+                 '49.967499,8.147222,760,"EU","DE","DE-RP","Mainz","no",'
+                 '"EDFZ","","","","",""\n')
+    with open(directory / "airports.csv", "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    # newer than the Last-Modified date of the first download
+    later = time.time() + 10
+    os.utime(directory / "airports.csv", (later, later))
+
+    changes = airports.refresh_datasets(cn, airport_db.filename,
+                                        {"airports": url})
+
+    assert changes == {"airports": airports.Changes(1, 1, 1, 4)}
+    assert airport_db.version() == version + 1
+    idents = [row[0] for row in airport_rows(cn)]
+    assert idents == ["0012", "12", "EDDF", "EDFM", "EDFZ", "EDRY"]
+    # the updated airport keeps its id, which the indexes refer to
+    assert cn.execute("select id from airports where icaoId = 'EDFM'"
+                      ).fetchone()[0] == ids["EDFM"]
+    assert cn.execute("select lat from airports where icaoId = 'EDFM'"
+                      ).fetchone()[0] == 49.5
+
+    check_indexes(cn)
+    assert fts_match(cn, "egelsbach") == []
+    assert fts_match(cn, "frankfurt") == ["EDDF"]
+    assert fts_match(cn, "city") == ["EDFM"]
+    assert fts_match(cn, "mainz") == ["EDFZ"]
+    assert rtree_idents(cn) == ["12", "EDDF", "EDFM", "EDFZ", "EDRY"]
+    assert cn.execute(
+        "select minLat from airports_rtree where id = ?", (ids["EDFM"],)
+    ).fetchone()[0] == pytest.approx(49.5)
+
+
+def test_refresh_unchanged(airport_db, www):
+    _, url = www
+    airports.refresh_datasets(airport_db.con, airport_db.filename,
+                              {"airports": url})
+    version = airport_db.version()
+
+    # answered with 304 Not Modified to If-Modified-Since
+    changes = airports.refresh_datasets(airport_db.con, airport_db.filename,
+                                        {"airports": url})
+
+    assert changes == {"airports": None}
+    assert airport_db.version() == version
+
+
+def test_vacuum_keeps_search(airport_db, www):
+    directory, url = www
+    cn = airport_db.con
+    # gaps in the ids
+    with open(directory / "airports.csv", encoding="utf-8") as f:
+        lines = [line for line in f
+                 if '"EDDF"' not in line and '"EDFE"' not in line]
+    with open(directory / "airports.csv", "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    airports.refresh_datasets(cn, airport_db.filename, {"airports": url})
+
+    cn.execute("vacuum")
+
+    check_indexes(cn)
+    assert [row["icaoId"] for row in airport_db.search("mannheim")] == [
+        "EDFM"]
+    assert [row["icaoId"] for row in airport_db.search("speyer")] == [
+        "EDRY"]
+    assert [ident for _, ident, _ in airport_db.nearest(49.3, 8.45, 2)] == [
+        "EDRY", "EDFM"]
+
+
+def test_integer_ids_migration(tmp_path):
+    cn = sqlite3.connect(str(tmp_path / "airports.db"))
+    cn.execute("create table airports (icaoId string primary key, "
+               "name string, lat string, long string, elev string)")
+    schema.migrate(cn, schema.AIRPORTS_MIGRATIONS[:7])
+    cn.executemany(
+        "insert into airports (rowid, icaoId, name, lat, long, "
+        "municipality) values (?, ?, ?, ?, ?, ?)",
+        [(3, "EDFM", "Mannheim-City Airport", 49.47, 8.51, "Mannheim"),
+         (7, "EDRY", "Speyer/Ludwigshafen Airport", 49.3, 8.45, "Speyer")],
+    )
+    cn.execute("insert into airports_fts(airports_fts) values ('rebuild')")
+    # a spatial index entry of a renumbered rowid
+    cn.execute("insert into airports_rtree values (5, 49.47, 49.47, 8.51, "
+               "8.51)")
+    cn.commit()
+
+    schema.migrate(cn, schema.AIRPORTS_MIGRATIONS)
+
+    assert schema.schema_version(cn) == schema.latest_version(
+        schema.AIRPORTS_MIGRATIONS)
+    assert list(cn.execute("select id, icaoId from airports order by id")
+                ) == [(3, "EDFM"), (7, "EDRY")]
+    check_indexes(cn)
+    assert [row[0] for row in airports.search_airports(cn, "speyer")] == [
+        "EDRY"]
+    rtree = list(cn.execute("select id, minLat from airports_rtree "
+                            "order by id"))
+    assert [row[0] for row in rtree] == [3, 7]
+    assert [row[1] for row in rtree] == pytest.approx([49.47, 49.3])
+
+
+def test_stream_rows_by_header():
+    text = ("name,ident,type,latitude_deg\n"
+            "Alpha,X1,small_airport,1.5\n"
+            "short row\n"
+            "Bravo,X2,heliport,\n")
+    fields = [("ident", str), ("latitude_deg", airports.to_float)]
+
+    rows = airports.stream_rows(csv.reader(io.StringIO(text)), fields)
+
+    assert list(rows) == [("X1", 1.5), ("X2", None)]
+
+
+def test_load_staging_in_batches(airport_db):
+    cn = airport_db.con
+    rows = [(f"X{i}", f"Airfield {i}", 1.0, 2.0, 3.0, "Town")
+            for i in range(7)]
+    # the last row of an identifier wins
+    rows.append(("X0", "Airfield Zero", 1.0, 2.0, 3.0, "Town"))
+    progress = []
+
+    count = airports.load_staging(cn, iter(rows),
+                                  airports.DATASETS["airports"],
+                                  batch_size=3, progress=progress.append)
+
+    assert count == 8
+    assert progress == [3, 6, 8]
+    staging = airports.staging_table("airports")
+    assert cn.execute(f"select count(*) from {staging}").fetchone()[0] == 7
+    assert cn.execute(f"select name from {staging} where icaoId = 'X0'"
+                      ).fetchone()[0] == "Airfield Zero"
+    assert cn.execute(f"select rowHash from {staging} where icaoId = 'X1'"
+                      ).fetchone()[0] == airports.row_hash(rows[1])
+
+
+def test_readers_see_complete_table(airport_db, www):
+    _, url = www
+    cn = airport_db.con
+    airports.refresh_datasets(cn, airport_db.filename, {"airports": url})
+    seen = []
+
+    def count_airports(_):
+        with airport_db.pool.reader() as reader:
+            seen.append(reader.execute("select count(*) from airports"
+                                       ).fetchone()[0])
+
+    rows = [(f"X{i:04d}", f"Airfield {i}", 1.0, 2.0, 3.0, "Town")
+            for i in range(10)]
+    airports.load_staging(cn, iter(rows), airports.DATASETS["airports"],
+                          batch_size=4, progress=count_airports)
+    airports.apply_airports_staging(cn)
+    count_airports(None)
+
+    # the old table while loading, then the new one at once
+    assert seen == [6, 6, 6, 10]
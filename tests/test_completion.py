@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the tab completion indexes following changes of the logbook.
+"""
+
+
+def test_add_and_delete_flight(flight_log):
+    flight_log.add_aircraft("DEABC", "C172", "SEP")
+    completion = flight_log.completion
+    assert completion.complete("names", "Mei") == []
+    assert completion.complete("airports", "XZ") == []
+
+    flight_id = flight_log.add_flight(
+        "10:00", "10:05", "10:55", "11:00", "2024-01-15", "DEABC",
+        "XZAA", "XZAB", pic="Meier", stud="Schulz",
+    )
+    assert completion.complete("names", "Mei") == ["Meier"]
+    assert completion.complete("names", "sch") == ["Schulz"]
+    assert completion.complete("airports", "XZ") == ["XZAA", "XZAB"]
+
+    flight_log.delete_flight(flight_id)
+
+    assert completion.complete("names", "Mei") == []
+    assert completion.complete("names", "sch") == []
+    assert completion.complete("airports", "XZ") == []
+    assert completion.complete("registrations", "DEA") == ["DEABC"]
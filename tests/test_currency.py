@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the 90 day rule computed from the per-day landing series.
+"""
+
+import datetime as dt
+
+import pytest
+
+from pyflightlog import currency
+
+D = dt.date
+
+INSERT_FLIGHT = (
+    "insert into flights (flightdate, offblock, onblock, startTime, "
+    "landingTime, landingsDay, landingsNight, flightTimeClass) "
+    "values (?, '10:00', '11:00', '10:05', '10:55', ?, ?, ?)"
+)
+
+
+@pytest.mark.parametrize("series", [
+    [],
+    [(D(2024, 1, 10), 1)],
+    [(D(2024, 1, 10), 1), (D(2024, 2, 10), 1)],
+])
+def test_fewer_than_three_landings(series):
+    assert currency.ninety_day_expiry(series, D(2024, 3, 1)) is None
+    assert currency.ninety_day_status(series, D(2024, 3, 1)) == (
+        "expired", None)
+
+
+@pytest.mark.parametrize("series, expiry", [
+    # three landings on one day
+    ([(D(2024, 1, 10), 3)], D(2024, 4, 9)),
+    ([(D(2024, 1, 10), 5)], D(2024, 4, 9)),
+    # the third most recent landing counts
+    ([(D(2024, 1, 1), 1), (D(2024, 2, 1), 1), (D(2024, 3, 1), 1),
+      (D(2024, 3, 10), 1)], D(2024, 5, 1)),
+    ([(D(2024, 1, 1), 2), (D(2024, 3, 1), 2)], D(2024, 3, 31)),
+    ([(D(2024, 1, 1), 1), (D(2024, 3, 1), 2)], D(2024, 3, 31)),
+])
+def test_expiry(series, expiry):
+    assert currency.ninety_day_expiry(series, D(2024, 3, 15)) == expiry
+
+
+def test_landings_after_the_date_do_not_count():
+    series = [(D(2024, 1, 1), 1), (D(2024, 2, 1), 1), (D(2024, 3, 1), 1),
+              (D(2024, 3, 20), 3)]
+
+    assert currency.ninety_day_expiry(series, D(2024, 2, 15)) is None
+    assert currency.ninety_day_expiry(series, D(2024, 3, 19)) == D(
+        2024, 3, 31)
+    # landings on the day itself count
+    assert currency.ninety_day_expiry(series, D(2024, 3, 20)) == D(
+        2024, 6, 18)
+    assert currency.ninety_day_expiry(
+        series, dt.datetime(2024, 3, 20, 8, 0)) == D(2024, 6, 18)
+
+
+@pytest.mark.parametrize("date, status", [
+    (D(2024, 3, 29), "valid"),
+    (D(2024, 3, 30), "warning"),
+    (D(2024, 4, 9), "warning"),
+    (D(2024, 4, 10), "expired"),
+])
+def test_status(date, status):
+    series = [(D(2024, 1, 10), 3)]
+    assert currency.ninety_day_status(series, date) == (status,
+                                                        D(2024, 4, 9))
+
+
+def test_landing_series(flight_log):
+    flight_log.con.executemany(INSERT_FLIGHT, [
+        ("2024-01-10", 1, 0, "SEP"),
+        ("2024-01-10", 1, 1, "SEP"),
+        ("2024-01-12", 0, 0, "SEP"),
+        ("2024-01-11", 2, 0, "TMG"),
+        ("2024-01-09", 1, 0, "SEP"),
+    ])
+    flight_log.con.commit()
+
+    series = currency.landing_series(flight_log.con)
+
+    # landings of a day summed up, days without landings left out
+    assert series == {
+        "SEP": [(D(2024, 1, 9), 1), (D(2024, 1, 10), 3)],
+        "TMG": [(D(2024, 1, 11), 2)],
+    }
+    assert currency.ninety_day_expiry(series["SEP"], D(2024, 1, 10)) == D(
+        2024, 4, 9)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the cached dashboard output shown at startup.
+"""
+
+import io
+
+from pyflightlog.flightlog import CmdApp
+
+
+def cache_rows(flight_log):
+    with flight_log.pool.reader() as cn:
+        return [tuple(row) for row in cn.execute(
+            "select command, dataVersion, output from dashboardCache"
+        )]
+
+
+def test_show_cached(flight_log, monkeypatch):
+    app = CmdApp(flight_log, dashboard=False)
+    app.stdout = io.StringIO()
+    commands = []
+
+    def onecmd(command, add_to_history=True):
+        commands.append(command)
+        app.poutput(f"output of {command}")
+
+    monkeypatch.setattr(app, "onecmd", onecmd)
+
+    app.show_cached("stat")
+    # committed, so readers see it
+    version = flight_log.data_version()
+    assert cache_rows(flight_log) == [("stat", version, "output of stat\n")]
+    assert not flight_log.con.in_transaction
+
+    app.show_cached("stat")
+    assert commands == ["stat"]
+
+    # run again after a change
+    flight_log.con.execute("insert into flights (flightdate) "
+                           "values ('2024-01-01')")
+    flight_log.con.commit()
+    app.show_cached("stat")
+
+    assert commands == ["stat", "stat"]
+    assert app.stdout.getvalue() == "output of stat\n" * 3
+    assert cache_rows(flight_log) == [
+        ("stat", version + 1, "output of stat\n")]
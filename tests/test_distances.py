@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the distances of flights, computed when flights or airports
+change, and of reads that never write.
+"""
+
+import datetime as dt
+
+import pytest
+
+from pyflightlog import airports
+from pyflightlog import logbook
+
+# one degree of latitude is 60 nm
+AIRPORTS = [
+    ("XA", "Alpha", 50.0, 8.0, 100.0, "A"),
+    ("XB", "Bravo", 51.0, 8.0, 100.0, "B"),
+]
+
+START = dt.date(2024, 1, 1)
+END = dt.date(2025, 1, 1)
+
+
+def set_airports(airport_db, rows):
+    cn = airport_db.con
+    airports.load_staging(cn, iter(rows), airports.DATASETS["airports"])
+    airports.apply_airports_staging(cn)
+
+
+def add_flight(flight_log, apdep="XA", apdest="XB"):
+    return flight_log.add_flight("10:00", "10:05", "10:55", "11:00",
+                                 "2024-01-15", "DEABC", apdep, apdest)
+
+
+def cached_distances(flight_log):
+    with flight_log.pool.reader() as cn:
+        return [tuple(row) for row in cn.execute(
+            "select flightId, airportsVersion, distanceNm "
+            "from flightDistances order by flightId"
+        )]
+
+
+@pytest.fixture
+def log(flight_log, airport_db):
+    set_airports(airport_db, AIRPORTS)
+    flight_log.add_aircraft("DEABC", "C172", "SEP")
+    return flight_log
+
+
+def test_add_flight(log, airport_db):
+    version = airport_db.version()
+
+    flight_id = add_flight(log)
+    unknown_id = add_flight(log, "XA", "XZ")
+
+    assert cached_distances(log) == [
+        (flight_id, version, pytest.approx(60.0, abs=0.1)),
+        (unknown_id, version, None),
+    ]
+    assert log.totals(START, END).distanceNm == pytest.approx(60.0, abs=0.1)
+
+
+def test_reads_do_not_write(log):
+    add_flight(log)
+    version = log.data_version()
+    # a flight without distance, as if added by an older version
+    log.con.execute("delete from flightDistances")
+    log.con.commit()
+
+    log.totals(START, END)
+    log.route_stats(START, END)
+    list(log.flights(START, END))
+    log.last_flights()
+
+    assert cached_distances(log) == []
+    assert log.data_version() == version
+    assert not log.con.in_transaction
+
+
+def test_refreshed_airports(log, airport_db):
+    flight_id = add_flight(log)
+    version = log.data_version()
+
+    moved = [AIRPORTS[0], ("XB", "Bravo", 52.0, 8.0, 100.0, "B")]
+    set_airports(airport_db, moved)
+    assert log.refresh_distances() == 1
+
+    assert cached_distances(log) == [
+        (flight_id, airport_db.version(), pytest.approx(120.0, abs=0.1))]
+    # cached responses are dropped
+    assert log.data_version() == version + 1
+    assert log.refresh_distances() == 0
+
+
+def test_open_computes_stale_distances(log, airport_db, tmp_path):
+    flight_id = add_flight(log)
+    log.close()
+    # refreshed while the logbook was closed
+    set_airports(airport_db, [AIRPORTS[0],
+                              ("XB", "Bravo", 52.0, 8.0, 100.0, "B")])
+    filename = str(tmp_path / "logbook.db")
+
+    with logbook.FlightLog(filename, airport_db, read_only=True) as log:
+        assert cached_distances(log)[0][1] == airport_db.version() - 1
+
+    with logbook.FlightLog(filename, airport_db) as log:
+        assert cached_distances(log) == [
+            (flight_id, airport_db.version(),
+             pytest.approx(120.0, abs=0.1))]
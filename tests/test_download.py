@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the conditional and resumed downloads of the airport refresh
+against a local stand-in server that answers with 304, 206 and 416.
+"""
+
+import os
+
+import pytest
+import urllib3
+
+import standin
+from pyflightlog import airports
+
+# enough airports for a download of several chunks
+AIRPORTS = 3000
+
+
+@pytest.fixture
+def stand_in(serve):
+    """Returns the state of a stand-in server with a first airports.csv
+    and the URL of the file."""
+    state = standin.StandIn(standin.airports_csv(range(AIRPORTS)))
+    return state, serve(standin.make_handler(state)) + "/airports.csv"
+
+
+def refresh(airport_db, url, state):
+    """Returns the Changes of a refresh of the airports."""
+    state.reset()
+    return airports.refresh_datasets(airport_db.con, airport_db.filename,
+                                     {"airports": url})["airports"]
+
+
+def airport_count(airport_db):
+    return airport_db.con.execute("select count(*) from airports"
+                                  ).fetchone()[0]
+
+
+def test_unchanged(airport_db, stand_in):
+    state, url = stand_in
+    assert refresh(airport_db, url, state) == airports.Changes(
+        AIRPORTS, 0, 0, 0)
+    version = airport_db.version()
+
+    assert refresh(airport_db, url, state) is None
+    assert state.statuses == [304]
+    assert state.requests[0]["If-None-Match"] == '"1"'
+    assert state.sent == 0
+    assert airport_db.version() == version
+
+
+def test_new_etag_same_content(airport_db, stand_in):
+    state, url = stand_in
+    refresh(airport_db, url, state)
+    version = airport_db.version()
+    state.set_file(state.body, 2)
+
+    # downloaded again, but not imported since the hash is the same
+    assert refresh(airport_db, url, state) is None
+    assert state.statuses == [200]
+    assert airport_db.version() == version
+    assert airports.read_meta(airport_db.con)["etag"] == '"2"'
+
+    assert refresh(airport_db, url, state) is None
+    assert state.statuses == [304]
+
+
+def test_interrupted_and_resumed(airport_db, stand_in):
+    state, url = stand_in
+    refresh(airport_db, url, state)
+    version = airport_db.version()
+    renamed = set(range(0, AIRPORTS, 100))
+    state.set_file(standin.airports_csv(range(AIRPORTS), renamed), 3)
+    state.cut_after = len(state.body) // 2
+
+    with pytest.raises(urllib3.exceptions.ProtocolError):
+        refresh(airport_db, url, state)
+    part_file = airports.part_file_name(airport_db.filename)
+    offset = os.path.getsize(part_file)
+    assert 0 < offset <= len(state.body) // 2
+    assert airport_db.version() == version
+    assert airports.read_meta(airport_db.con)["partEtag"] == '"3"'
+
+    changes = refresh(airport_db, url, state)
+    assert changes == airports.Changes(0, len(renamed), 0,
+                                       AIRPORTS - len(renamed))
+    assert state.statuses == [206]
+    assert state.requests[0]["Range"] == f"bytes={offset}-"
+    assert state.requests[0]["If-Range"] == '"3"'
+    assert state.sent == len(state.body) - offset
+    assert airport_db.version() == version + 1
+    assert not os.path.exists(part_file)
+    assert airport_db.con.execute(
+        "select name from airports where icaoId = 'X000100'"
+    ).fetchone()[0] == "Airfield 100 Nord"
+
+    meta = airports.read_meta(airport_db.con)
+    assert meta["etag"] == '"3"'
+    assert "partEtag" not in meta
+
+
+def test_range_not_satisfiable(airport_db, stand_in):
+    state, url = stand_in
+    refresh(airport_db, url, state)
+    state.set_file(standin.airports_csv(range(AIRPORTS), {1, 2}), 4)
+    # a partial download of the same file that is longer than the file
+    part_file = airports.part_file_name(airport_db.filename)
+    with open(part_file, "wb") as f:
+        f.write(state.body + b"garbage")
+    airports.write_meta(airport_db.con, partEtag='"4"')
+    airport_db.con.commit()
+
+    # the partial file is dropped and the whole file downloaded
+    changes = refresh(airport_db, url, state)
+    assert changes == airports.Changes(0, 2, 0, AIRPORTS - 2)
+    assert state.statuses == [416, 200]
+    assert "Range" not in state.requests[1]
+    assert airport_count(airport_db) == AIRPORTS
+    assert not os.path.exists(part_file)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the filter expressions compiled to SQL conditions.
+"""
+
+import re
+
+import pytest
+
+from pyflightlog import filterexpr
+
+INSERT_FLIGHT = (
+    "insert into flights (flightdate, registration, departureId, "
+    "destinationId, offblock, onblock, startTime, landingTime, "
+    "landingsDay, landingsNight, flightTimeClass, remarks) "
+    "values (?, ?, ?, ?, '10:00', ?, '10:05', '10:55', ?, 0, ?, ?)"
+)
+
+# id: date, registration, departure, destination, onblock, landings,
+# class, remarks
+FLIGHTS = [
+    ("2024-01-10", "DESFM", "EDFM", "EDFE", "11:00", 1, "SEP", ""),
+    ("2024-02-10", "DESFM", "EDFE", "EDFM", "11:30", 2, "SEP",
+     "50% off_peak"),
+    ("2024-03-10", "DKTMG", "EDFM", "EDFM", "12:00", 3, "TMG", "500 off"),
+    ("2024-04-10", "DMUL", "EDRY", "EDFM", "10:45", 1, "UL", "x_y"),
+]
+
+
+@pytest.fixture
+def log(flight_log):
+    flight_log.con.executemany(INSERT_FLIGHT, FLIGHTS)
+    flight_log.con.commit()
+    return flight_log
+
+
+def matching(log, text):
+    """Returns the ids of the flights matching an expression."""
+    sql, params = filterexpr.compile_filter(text)
+    return [row[0] for row in log.con.execute(
+        f"select id from flights where {sql} order by id", params)]
+
+
+@pytest.mark.parametrize("text, ids", [
+    # and binds tighter than or
+    ("class = TMG or class = SEP and dep = EDFE", [2, 3]),
+    ("(class = TMG or class = SEP) and dep = EDFE", [2]),
+    ("dep = EDFE and class = SEP or class = UL", [2, 4]),
+    # not binds tighter than and
+    ("not dep = EDFM and dest = EDFM", [2, 4]),
+    ("not (dep = EDFM and dest = EDFM)", [1, 2, 4]),
+    ("not not class = UL", [4]),
+    ("CLASS = sep AND Not dep = EDFM", []),
+    ("class = SEP AND Not dep = EDFM", [2]),
+])
+def test_precedence(log, text, ids):
+    assert matching(log, text) == ids
+
+
+def test_compiled_precedence():
+    assert filterexpr.compile_filter(
+        "reg = 1 or dep = 2 and not dest = 3") == (
+        "(registration = ? or departureId = ? and not (destinationId = ?))",
+        ("1", "2", "3"),
+    )
+
+
+@pytest.mark.parametrize("text, ids", [
+    ("class in (SEP, TMG)", [1, 2, 3]),
+    ("class not in (SEP,TMG)", [4]),
+    ("reg in ('DMUL')", [4]),
+    ("ldg in (2, 3)", [2, 3]),
+])
+def test_in(log, text, ids):
+    assert matching(log, text) == ids
+
+
+@pytest.mark.parametrize("text, ids", [
+    ("remarks ~ off", [2, 3]),
+    # wildcards of LIKE are matched literally
+    ("remarks ~ '50%'", [2]),
+    ("remarks ~ _", [2, 4]),
+    ("remarks ~ x_y", [4]),
+    ("remarks ~ 'f_p'", [2]),
+    ("remarks ~ \"0 o\"", [3]),
+    ("remarks ~ '%'", [2]),
+])
+def test_contains(log, text, ids):
+    assert matching(log, text) == ids
+
+
+def test_contains_escapes():
+    assert filterexpr.compile_filter(r"remarks ~ 'a%b_c\d'") == (
+        "remarks like ? escape '\\'", (r"%a\%b\_c\\d%",))
+
+
+@pytest.mark.parametrize("text, ids", [
+    ("block > 1:00", [2, 3]),
+    ("block >= 1:30", [2, 3]),
+    ("block = 2h", [3]),
+    ("block < 1.5h", [1, 4]),
+    ("block <= 60", [1, 4]),
+    ("block != 45min", [1, 2, 3]),
+    ("air = 50", [1, 2, 3, 4]),
+])
+def test_durations(log, text, ids):
+    assert matching(log, text) == ids
+
+
+@pytest.mark.parametrize("value, minutes", [
+    ("1:30", 90), ("0:05", 5), ("12:00", 720), ("2h", 120), ("1.5h", 90),
+    ("0.25h", 15), ("90", 90), ("45min", 45),
+])
+def test_parse_duration(value, minutes):
+    assert filterexpr.parse_duration(value) == minutes
+
+
+@pytest.mark.parametrize("text, ids", [
+    ("date >= 10.02.2024", [2, 3, 4]),
+    ("date < 2024-03-10", [1, 2]),
+    ("date >= 01.02.2024 and date < 2024-04-01", [2, 3]),
+    ("date = 10.04.2024", [4]),
+])
+def test_dates(log, text, ids):
+    assert matching(log, text) == ids
+
+
+@pytest.mark.parametrize("text, message", [
+    ("", "expected one of the fields"),
+    ("wings = 2", "expected one of the fields"),
+    ("class SEP", "expected an operator at 7, found 'SEP'"),
+    ("class == SEP", "expected a value at 8, found '='"),
+    ("class = SEP and", "found end of expression"),
+    ("class = SEP dep = EDFM", "expected 'and' or 'or' at 13"),
+    ("(class = SEP", "expected ')'"),
+    ("class = SEP)", "expected 'and' or 'or'"),
+    ("class in SEP", "expected '('"),
+    ("class in (SEP,)", "expected a value"),
+    ("class not = SEP", "expected 'in'"),
+    ("block ~ 1", "'~' can only be used on text fields"),
+    ("block > 1:60", "invalid duration: 1:60"),
+    ("block > abc", "invalid duration: abc"),
+    ("date = 31.02.2024", "invalid date: 31.02.2024"),
+    ("date = 2024/01/01", "invalid date: 2024/01/01"),
+    ("ldg = two", "invalid number: two"),
+    ("remarks = 'open", "unexpected character at 11"),
+    ("class = SEP; drop table flights",
+     "expected 'and' or 'or' at 14, found 'drop'"),
+])
+def test_rejected(text, message):
+    with pytest.raises(filterexpr.FilterError, match=re.escape(message)):
+        filterexpr.compile_filter(text)
+
+
+def test_values_are_parameters(log):
+    sql, params = filterexpr.compile_filter(
+        "remarks = \"x' or '1'='1\"")
+    assert "'1'" not in sql
+    assert params == ("x' or '1'='1",)
+    assert matching(log, "remarks = \"x' or '1'='1\"") == []
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the reports over many logbooks.
+"""
+
+import datetime as dt
+
+from pyflightlog import fleet
+from pyflightlog import logbook
+
+
+def create_logbook(filename, expiration_date):
+    with logbook.FlightLog(filename, logbook.AirportDB(":memory:")) as log:
+        log.con.execute("update ratings set expirationDate = ?",
+                        (expiration_date,))
+        log.con.commit()
+
+
+def test_errors_per_logbook(tmp_path):
+    good = str(tmp_path / "good.db")
+    broken = str(tmp_path / "broken.db")
+    create_logbook(good, "2030-01-01")
+    create_logbook(broken, "31.12.2030")
+    missing = str(tmp_path / "missing.db")
+
+    results = fleet.run([broken, good, missing], "check",
+                        (dt.date(2024, 1, 1),), jobs=1)
+
+    assert [result.filename for result in results] == [broken, good,
+                                                         missing]
+    assert results[0].value is None
+    assert "31.12.2030" in results[0].error
+    assert results[1].error is None
+    assert results[1].value[0].expiration == dt.date(2030, 1, 1)
+    assert results[2].value is None
+    assert results[2].error
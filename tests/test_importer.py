@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the bulk csv import.
+"""
+
+import csv
+import io
+
+import pytest
+
+from pyflightlog import importer
+
+SETTINGS = {"default_PIC": "Bühler"}
+AIRCRAFTS = {"DESFM": ("C172", "SEP")}
+
+
+def convert(text):
+    rejected = []
+    rows = list(importer.convert_rows(csv.reader(io.StringIO(text)),
+                                      SETTINGS, AIRCRAFTS, rejected))
+    return rows, rejected
+
+
+@pytest.mark.parametrize("value, time", [
+    ("09:48", "09:48"), ("9:48", "09:48"), ("0948", "09:48"),
+    ("948", "09:48"), (" 23:59 ", "23:59"), ("0:00", "00:00"),
+])
+def test_parse_time(value, time):
+    assert importer.parse_time(value) == time
+
+
+@pytest.mark.parametrize("value", [
+    "", "24:00", "12:60", "9:5", "12345", "123:45", "ab:cd", "9.48",
+])
+def test_parse_time_invalid(value):
+    with pytest.raises(ValueError):
+        importer.parse_time(value)
+
+
+def test_parse_time_optional():
+    assert importer.parse_time(" ", optional=True) == ""
+
+
+def test_convert_rows():
+    rows, rejected = convert(
+        "01.02.23,,DESFM,EDFM,9:48,955,EDFE,10:30,1025,*,,,1,,,,,,,\n"
+        "02.02.23,,DESFM,EDFE,1000,1005,EDFM,1100,1055,Meier,*,2,,1,,,FI,"
+        "0:30,,Nachtflug\n"
+    )
+
+    assert rejected == []
+    assert rows == [
+        ("2023-02-01", "C172", "DESFM", "EDFM", "EDFE", "09:48", "10:30",
+         "09:55", "10:25", 1, 0, "Bühler", "", "", "", "SEP", "", "", ""),
+        ("2023-02-02", "C172", "DESFM", "EDFE", "EDFM", "10:00", "11:00",
+         "10:05", "10:55", 0, 1, "Meier", "FI", "00:30", "", "SEP",
+         "Bühler", "2", "Nachtflug"),
+    ]
+
+
+def test_convert_rows_rejected():
+    rows, rejected = convert(
+        "01.02.23,,DEXXX,EDFM,0948,0955,EDFE,1030,1025,*,,,1,,,,,,,\n"
+        "31.02.23,,DESFM,EDFM,0948,0955,EDFE,1030,1025,*,,,1,,,,,,,\n"
+        "01.03.23,,DESFM,EDFM,0948,0955,EDFE,25:30,1025,*,,,1,,,,,,,\n"
+        "01.03.23,,DESFM,EDFM\n"
+    )
+
+    assert rows == []
+    assert rejected == [
+        (1, "aircraft not found: DEXXX"),
+        (2, "invalid date '31.02.23'"),
+        (3, "invalid time '25:30'"),
+        (4, "expected 20 columns, got 4"),
+    ]
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the night time computed from solar geometry.
+"""
+
+import datetime as dt
+
+import pytest
+
+from pyflightlog import night
+
+INSERT_FLIGHT = (
+    "insert into flights (flightdate, departureId, destinationId, "
+    "offblock, onblock, startTime, landingTime, landingsDay, "
+    "landingsNight) values (?, 'EDFM', 'EDFM', ?, ?, ?, ?, 1, 0)"
+)
+
+
+@pytest.fixture
+def log(flight_log):
+    flight_log.airports.con.execute(
+        "insert into airports (icaoId, name, lat, long) "
+        "values ('EDFM', 'Mannheim-City Airport', 49.473057, 8.514167)"
+    )
+    flight_log.airports.con.commit()
+    return flight_log
+
+
+@pytest.mark.parametrize("value, minutes", [
+    ("09:48", 588), ("9:48", 588), ("0:05", 5), ("23:59", 1439),
+    ("", None), (None, None), ("9", None), ("x:48", None),
+])
+def test_parse_minutes(value, minutes):
+    assert night.parse_minutes(value) == minutes
+
+
+def test_single_digit_hour(log):
+    # civil dawn in Mannheim is about 06:40 UTC in mid January
+    log.con.execute(INSERT_FLIGHT,
+                    ("2024-01-15", "6:00", "7:00", "6:05", "6:55"))
+    log.con.execute(INSERT_FLIGHT,
+                    ("2024-01-15", "10:00", "11:00", "10:05", "10:55"))
+    log.con.commit()
+
+    results, skipped = log.compute_night(dt.date(2024, 1, 15),
+                                         dt.date(2024, 1, 16))
+
+    assert skipped == 0
+    # "6:00" sorts after "10:00" as text
+    early, late = sorted(results, key=lambda result: result.flight_id)
+    assert 30 <= early.night_minutes <= 50
+    assert early.night_landings == 0
+    assert late.night_minutes == 0
+
+
+def test_missing_times_are_skipped(log):
+    log.con.execute(INSERT_FLIGHT,
+                    ("2024-01-15", "10:00", "11:00", "10:05", ""))
+    log.con.execute(INSERT_FLIGHT,
+                    ("2024-01-15", "", "", "", ""))
+    log.con.execute(INSERT_FLIGHT,
+                    ("2024-01-15", "17:00", "18:00", "17:05", "17:55"))
+    log.con.commit()
+
+    results, skipped = log.compute_night(dt.date(2024, 1, 15),
+                                         dt.date(2024, 1, 16))
+
+    assert skipped == 2
+    assert len(results) == 1
+    assert results[0].night_minutes == 60
+    assert results[0].night_landings == 1
+
+
+def test_twilight_follows_airport_refresh(log):
+    cn_ap = log.airports.con
+    dawn, _ = night.twilight(cn_ap, ["EDFM"], ["2024-01-15"])
+
+    # the airport moved by a refresh, which counts up the version
+    cn_ap.execute("update airports set long = 38.514167 "
+                  "where icaoId = 'EDFM'")
+    cn_ap.execute("update airportsMeta set value = value + 1 "
+                  "where key = 'version'")
+    cn_ap.commit()
+    moved, _ = night.twilight(cn_ap, ["EDFM"], ["2024-01-15"])
+
+    # 30 degrees further east is two hours earlier
+    assert dawn[0] - moved[0] == pytest.approx(120, abs=1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the reports of times and landings grouped by one or more keys and
+of their csv and JSON output.
+"""
+
+import argparse
+import csv
+import io
+import json
+
+import pytest
+
+from pyflightlog import report
+
+INSERT_FLIGHT = (
+    "insert into flights (flightdate, type, registration, departureId, "
+    "destinationId, offblock, onblock, startTime, landingTime, landingsDay, "
+    "landingsNight, pilotFunction, flightTimeNight, flightTimeIFR, "
+    "flightTimeClass) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+FLIGHTS = [
+    # Monday
+    ("2024-01-15", "C172", "DEABC", "EDFM", "EDFE", "9:48", "10:48",
+     "9:53", "10:43", 1, 0, "PIC", "", "", "SEP"),
+    ("2024-01-15", "C172", "DEABC", "EDFE", "EDFM", "11:00", "11:45",
+     "11:05", "11:40", 2, 0, "PIC", "", "0:20", "SEP"),
+    # Saturday
+    ("2024-02-03", "DA40", "DEXYZ", "EDFM", "EDRY", "16:30", "17:30",
+     "16:35", "17:25", 0, 1, "DUAL", "0:30", "", "SEP"),
+    # past midnight
+    ("2023-12-31", "SF25", "DKFAA", "EDRY", "EDRY", "23:30", "0:40",
+     "23:35", "0:35", 1, 0, "PIC", "1:10", "", "TMG"),
+]
+
+
+@pytest.fixture
+def cn(flight_log):
+    flight_log.con.executemany(INSERT_FLIGHT, FLIGHTS)
+    flight_log.con.commit()
+    return flight_log.con
+
+
+def keys(rows):
+    return [row_keys for row_keys, _ in rows]
+
+
+@pytest.mark.parametrize("group, expected", [
+    ("year", [("2023",), ("2024",)]),
+    ("month", [("2023-12",), ("2024-01",), ("2024-02",)]),
+    ("weekday", [("Mon",), ("Sat",), ("Sun",)]),
+    ("hour", [("09",), ("11",), ("16",), ("23",)]),
+    ("registration", [("DEABC",), ("DEXYZ",), ("DKFAA",)]),
+    ("type", [("C172",), ("DA40",), ("SF25",)]),
+    ("class", [("SEP",), ("TMG",)]),
+    ("dep", [("EDFE",), ("EDFM",), ("EDRY",)]),
+    ("dest", [("EDFE",), ("EDFM",), ("EDRY",)]),
+    ("pilotFunction", [("DUAL",), ("PIC",)]),
+])
+def test_groups(cn, group, expected):
+    rows = report.group_report(cn, [group], "", ())
+
+    assert keys(rows) == expected
+    assert report.report_total(rows).flights == len(FLIGHTS)
+
+
+def test_totals(cn):
+    rows = report.group_report(cn, ["class", "registration"], "", ())
+
+    assert rows == [
+        (("SEP", "DEABC"), report.ReportTotals(2, 105, 85, 0, 20, 3, 0)),
+        (("SEP", "DEXYZ"), report.ReportTotals(1, 60, 50, 30, 0, 0, 1)),
+        (("TMG", "DKFAA"), report.ReportTotals(1, 70, 60, 70, 0, 1, 0)),
+    ]
+    assert report.report_total(rows) == report.ReportTotals(
+        4, 235, 195, 100, 20, 4, 1)
+
+
+def test_conditions(flight_log, cn):
+    filters = argparse.Namespace(where="class = SEP")
+
+    rows = flight_log.report(["month"], "2024-01-01", "2024-12-31", filters)
+
+    assert rows == [
+        (("2024-01",), report.ReportTotals(2, 105, 85, 0, 20, 3, 0)),
+        (("2024-02",), report.ReportTotals(1, 60, 50, 30, 0, 0, 1)),
+    ]
+
+
+def test_empty(flight_log):
+    rows = report.group_report(flight_log.con, ["month"], "", ())
+
+    assert rows == []
+    assert report.report_total(rows) == report.ReportTotals(
+        0, 0, 0, 0, 0, 0, 0)
+
+
+def test_missing_keys(cn):
+    cn.execute("insert into flights (flightdate, offblock, onblock, "
+               "startTime, landingTime, landingsDay, landingsNight) "
+               "values ('2024-03-01', '', '', '', '', 0, 0)")
+
+    rows = report.group_report(cn, ["hour", "registration"], "", ())
+
+    assert keys(rows)[0] == ("", "")
+
+
+def test_csv(cn):
+    groups = ["year", "type"]
+    rows = report.group_report(cn, groups, "", ())
+
+    lines = list(csv.reader(io.StringIO(report.to_csv(groups, rows))))
+
+    assert lines == [
+        ["year", "type", "flights", "blockMinutes", "airMinutes",
+         "nightMinutes", "ifrMinutes", "landingsDay", "landingsNight"],
+        ["2023", "SF25", "1", "70", "60", "70", "0", "1", "0"],
+        ["2024", "C172", "2", "105", "85", "0", "20", "3", "0"],
+        ["2024", "DA40", "1", "60", "50", "30", "0", "0", "1"],
+    ]
+
+
+def test_json(cn):
+    groups = ["weekday"]
+    rows = report.group_report(cn, groups, "", ())
+
+    assert json.loads(report.to_json(groups, rows)) == [
+        {"weekday": "Mon", "flights": 2, "blockMinutes": 105,
+         "airMinutes": 85, "nightMinutes": 0, "ifrMinutes": 20,
+         "landingsDay": 3, "landingsNight": 0},
+        {"weekday": "Sat", "flights": 1, "blockMinutes": 60,
+         "airMinutes": 50, "nightMinutes": 30, "ifrMinutes": 0,
+         "landingsDay": 0, "landingsNight": 1},
+        {"weekday": "Sun", "flights": 1, "blockMinutes": 70,
+         "airMinutes": 60, "nightMinutes": 70, "ifrMinutes": 0,
+         "landingsDay": 1, "landingsNight": 0},
+    ]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("month", ["month"]),
+    ("year, type", ["year", "type"]),
+    ("dep,dest,", ["dep", "dest"]),
+])
+def test_parse_groups(value, expected):
+    assert report.parse_groups(value) == expected
+
+
+@pytest.mark.parametrize("value, message", [
+    ("day", "invalid group: day"),
+    (" , ", "no group given"),
+])
+def test_parse_groups_rejected(value, message):
+    with pytest.raises(argparse.ArgumentTypeError, match=message):
+        report.parse_groups(value)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the migration of a logbook in the format before the schema
+versions to the current schema.
+"""
+
+import sqlite3
+
+import pytest
+
+from pyflightlog import schema
+
+# flights table of a logbook before the schema versions
+BASELINE_FLIGHTS = (
+    "create table flights (id integer primary key, "
+    "flightdate string, type string, "
+    "registration string, departureId string, "
+    "destinationId string,"
+    "offblock string, onblock string, "
+    "startTime string, landingTime string,"
+    "landingsDay integer, landingsNight integer, "
+    "picName string, pilotFunction string,"
+    "flightTimeNight integer, flightTimeIFR integer, "
+    "flightTimeClass string, studentName string, "
+    "guests string, remarks string, internalMarkers string)"
+)
+
+INSERT_FLIGHT = (
+    "insert into flights (id, flightdate, offblock, onblock, startTime, "
+    "landingTime, landingsDay, landingsNight, flightTimeNight, "
+    "flightTimeIFR) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+FLIGHTS = [
+    (1, "2021-01-22", "11:28", "12:04", "11:33", "12:02", "1", "", "", ""),
+    # past midnight
+    (2, "2021-12-31", "23:30", "00:40", "23:35", "00:35", "", "2", "1:10",
+     "0:20"),
+    # single digit hours
+    (3, "2021-02-04", "9:48", "10:26", "9:54", "10:25", "1", "", "", ""),
+    # no landing time
+    (4, "2021-02-05", "10:00", "11:00", "10:05", "", "", "", "", ""),
+    (5, "2021-02-06", "", "", "", "", None, None, None, None),
+]
+
+MINUTES_QUERY = (
+    "select id, blockMinutes, airMinutes, nightMinutes, ifrMinutes, "
+    "landingsDay, landingsNight from flights order by id"
+)
+
+EXPECTED = [
+    (1, 36, 29, 0, 0, 1, 0),
+    (2, 70, 60, 70, 20, 0, 2),
+    (3, 38, 31, 0, 0, 1, 0),
+    (4, 60, 0, 0, 0, 0, 0),
+    (5, 0, 0, 0, 0, 0, 0),
+]
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    cn = sqlite3.connect(str(tmp_path / "logbook.db"))
+    cn.execute(BASELINE_FLIGHTS)
+    cn.execute("create table ratings (id integer primary key, "
+               "title string, expirationDate string, "
+               "warningPeriod string, renewalConditions string, "
+               "type string)")
+    cn.executemany(INSERT_FLIGHT, FLIGHTS)
+    cn.commit()
+    yield cn
+    cn.close()
+
+
+def test_migrate_baseline(baseline):
+    applied = schema.migrate(baseline, schema.FLIGHTS_MIGRATIONS)
+
+    assert applied == [version
+                       for version, _, _ in schema.FLIGHTS_MIGRATIONS]
+    assert list(baseline.execute(MINUTES_QUERY)) == EXPECTED
+    assert baseline.execute(
+        "select count(*) from flights where typeof(landingsDay) != 'integer' "
+        "or typeof(landingsNight) != 'integer'"
+    ).fetchone()[0] == 0
+    assert baseline.execute("pragma integrity_check").fetchone()[0] == "ok"
+
+
+def test_rebuild_keeps_indexes_and_triggers(baseline):
+    schema.migrate(baseline, schema.FLIGHTS_MIGRATIONS)
+    objects = list(baseline.execute(
+        "select type, name from sqlite_master where tbl_name = 'flights' "
+        "order by type, name"
+    ))
+    # durations of an older version of the generated columns
+    baseline.execute("pragma user_version = 4")
+    baseline.execute("insert into flightDistances values (4, 1, 12.5)")
+    baseline.commit()
+    version = baseline.execute("select version from dataVersion"
+                               ).fetchone()[0]
+
+    assert schema.migrate(baseline, schema.FLIGHTS_MIGRATIONS) == [5]
+
+    assert list(baseline.execute(
+        "select type, name from sqlite_master where tbl_name = 'flights' "
+        "order by type, name"
+    )) == objects
+    assert list(baseline.execute(MINUTES_QUERY)) == EXPECTED
+    assert baseline.execute("select version from dataVersion"
+                            ).fetchone()[0] == version + 1
+
+    # the triggers work on the new table
+    baseline.execute("update flights set destinationId = 'EDFM' "
+                     "where id = 4")
+    assert baseline.execute("select count(*) from flightDistances"
+                            ).fetchone()[0] == 0
+    assert baseline.execute("select version from dataVersion"
+                            ).fetchone()[0] == version + 2